@@ -0,0 +1,173 @@
+import numpy as np
+
+# Upper bounds (seconds) of the holding time buckets, the last one is open ended
+HOLDING_EDGES = (15 * 60, 60 * 60, 4 * 3600, 24 * 3600, 3 * 86400)
+HOLDING_LABELS = ("< 15m", "15m-1h", "1h-4h", "4h-1d", "1d-3d", "> 3d")
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# Trading session of each hour of the day the trade was opened in
+SESSIONS = ("Asia", "London", "New York")
+SESSION_OF_HOUR = np.array([0] * 7 + [1] * 6 + [2] * 9 + [0] * 2)
+
+# Width of the R multiple histogram bins
+R_BIN_WIDTH = 0.5
+
+
+def r_bins(r, width=R_BIN_WIDTH):
+    """Number of R multiples per histogram bin, {bin index: count}"""
+    bins, counts = np.unique(np.floor(np.asarray(r, dtype=float) / width), return_counts=True)
+    return {int(b): int(c) for b, c in zip(bins, counts)}
+
+
+def _open_keys(opened):
+    """Weekday x hour and weekday x session grid index of datetime64 open times"""
+    # datetime64 days start on a Thursday (1970-01-01)
+    days = opened.astype('datetime64[D]')
+    weekday = (days.astype(np.int64) + 3) % 7
+    hour = (opened - days).astype('timedelta64[h]').astype(np.int64)
+    return weekday * 24 + hour, weekday * len(SESSIONS) + SESSION_OF_HOUR[hour]
+
+
+class DurationStats:
+    """Sums behind duration_stats, updated one trade at a time
+
+    Count, P&L and wins of the closed trades per holding time bucket and
+    per weekday x hour/session they were opened in, plus the number of
+    trades per minute held for the median. Sums of several sets of trades
+    add up, so the archive keeps the sums of its trades in its manifest.
+    """
+    SIZES = {'holding': len(HOLDING_LABELS), 'hours': 7 * 24, 'sessions': 7 * len(SESSIONS)}
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Rows of each grid: count, P&L, wins
+        self.sums = {grid: np.zeros((3, size)) for grid, size in self.SIZES.items()}
+        self.held = {}  # minutes held -> trades
+
+    @classmethod
+    def from_trades(cls, trades):
+        stats = cls()
+        stats.rebuild(trades)
+        return stats
+
+    def copy(self):
+        stats = DurationStats()
+        stats.merge(self)
+        return stats
+
+    def _add(self, opened, pnl, held, sign):
+        """Add (sign=1) or remove (sign=-1) closed trades
+
+        opened holds their datetime64 open times, held the seconds they were
+        held, NaN for trades without a recorded close time.
+        """
+        wins = (pnl > 0).astype(float)
+        timed = ~np.isnan(held)
+        hours, sessions = _open_keys(opened)
+        buckets = np.searchsorted(HOLDING_EDGES, held[timed], side='right')
+        for grid, keys, rows in (('holding', buckets, timed), ('hours', hours, slice(None)),
+                                 ('sessions', sessions, slice(None))):
+            size = self.SIZES[grid]
+            self.sums[grid] += sign * np.array([np.bincount(keys, minlength=size),
+                                                np.bincount(keys, weights=pnl[rows], minlength=size),
+                                                np.bincount(keys, weights=wins[rows], minlength=size)])
+        minutes, counts = np.unique(held[timed] // 60, return_counts=True)
+        self._add_held(zip(minutes.astype(np.int64).tolist(), counts.tolist()), sign)
+
+    def _add_held(self, items, sign):
+        for minute, count in items:
+            total = self.held.get(minute, 0) + sign * count
+            if total:
+                self.held[minute] = total
+            else:
+                self.held.pop(minute, None)
+
+    def rebuild(self, trades):
+        """Recompute the sums from a TradeColumns store"""
+        self.reset()
+        closed_at = trades.column('closed_at')
+        opened = trades.column('date')
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(closed_at) & ~np.isnat(opened)
+        opened = opened[closed]
+        closed_time = trades.column('closed_time')[closed]
+        timed = ~np.isnat(closed_time)
+        held = np.full(len(opened), np.nan)
+        held[timed] = (closed_time[timed] - opened[timed]).astype('timedelta64[s]').astype(np.int64)
+        self._add(opened, closed_at[closed], held, 1)
+
+    def apply(self, before, after):
+        """Account for a trade going from `before` to `after` (either may be None)"""
+        for trade, sign in ((before, -1), (after, 1)):
+            if trade is None or trade.status != 'CLOSED' or trade.closed_at is None or trade.date is None:
+                continue
+            opened = np.array([trade.date], dtype='datetime64[us]')
+            held = np.nan
+            if trade.closed_time is not None:
+                held = (np.datetime64(trade.closed_time, 'us') - opened[0]).astype('timedelta64[s]').astype(np.int64)
+            self._add(opened, np.array([trade.closed_at], dtype=float), np.array([held], dtype=float), sign)
+
+    def merge(self, other, sign=1):
+        """Add (sign=1) or remove (sign=-1) the sums of another DurationStats"""
+        for grid in self.SIZES:
+            self.sums[grid] += sign * other.sums[grid]
+        self._add_held(other.held.items(), sign)
+
+    def to_dict(self):
+        return {'sums': {grid: sums.tolist() for grid, sums in self.sums.items()},
+                'held': {str(minute): count for minute, count in self.held.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for grid, sums in data['sums'].items():
+            stats.sums[grid] = np.array(sums, dtype=float)
+        stats.held = {int(minute): count for minute, count in data['held'].items()}
+        return stats
+
+    def _median_hold(self):
+        if not self.held:
+            return None
+        minutes = np.array(sorted(self.held))
+        seen = np.cumsum([self.held[minute] for minute in minutes])
+        # Middle trade(s) of the held times in sorted order
+        lower = minutes[np.searchsorted(seen, (seen[-1] - 1) // 2, side='right')]
+        upper = minutes[np.searchsorted(seen, seen[-1] // 2, side='right')]
+        return float(lower + upper) * 30
+
+    def stats(self):
+        """Count, P&L and winrate grids in the format of duration_stats"""
+        result = {}
+        for grid, (count, pnl, won) in self.sums.items():
+            count = np.rint(count).astype(np.int64)
+            winrate = np.divide(won * 100, count, out=np.zeros(len(count)), where=count > 0)
+            result[grid] = {'count': count, 'pnl': pnl.copy(), 'winrate': winrate}
+        result['holding']['median_hold'] = self._median_hold()
+        for grid, columns in (('hours', 24), ('sessions', len(SESSIONS))):
+            result[grid] = {key: values.reshape(7, columns) for key, values in result[grid].items()}
+        return result
+
+
+def duration_stats(trades):
+    """Holding time and time of day aggregates of the closed trades of a TradeColumns store
+
+    Returns {'holding': ..., 'hours': ..., 'sessions': ...}, each a dict of
+    'count', 'pnl' and 'winrate' arrays. 'holding' has one entry per
+    HOLDING_LABELS bucket and only counts trades with a recorded close time;
+    its 'median_hold' is in seconds, to the minute. 'hours' (7 x 24) and
+    'sessions' (7 x 3) are indexed by the weekday and the hour or session
+    the trade was opened in.
+    """
+    return DurationStats.from_trades(trades).stats()
+
+
+def account_duration_stats(profile):
+    """duration_stats of an account, its archive included
+
+    Adds up the sums the profile keeps up to date trade by trade and those
+    of the archive, without reading the trades.
+    """
+    stats = profile.durations.copy()
+    stats.merge(profile.archive.durations)
+    return stats.stats()
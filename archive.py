@@ -0,0 +1,274 @@
+import os
+import shutil
+import zipfile
+import argparse
+import datetime
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from trade import TradeColumns
+from rollups import PnLRollups, PERIODS
+from analytics import DurationStats, r_bins
+import vault
+
+ARCHIVE_ROOT = "./database/archive"
+# Closed trades older than this are moved out of the account workbook
+DEFAULT_AGE_DAYS = 90
+
+
+class TradeArchive:
+    """Cold storage of the old closed trades of an account
+
+    Each archive run writes one segment: a compressed pickle of the trades
+    and a zip pack of their screenshots, both encrypted like the rest of the
+    account. The manifest keeps, per segment, the trade ids, the close date
+    range and the screenshots it holds, plus the counters, P&L rollups, tag
+    and duration sums and R histogram of everything archived, so account
+    statistics and charts stay exact without reading the segments. Segments are only read when a trade in them is asked for,
+    and the last few are kept in memory.
+    """
+
+    def __init__(self, name, cache_size=2):
+        self.name = name
+        self.dir = os.path.join(ARCHIVE_ROOT, name)
+        self.cache_size = cache_size
+        self.reset()
+
+    def reset(self):
+        self.segments = []
+        self.totals = {'closed': 0, 'wins': 0, 'losses': 0, 'pnl': 0.0}
+        self.rollups = PnLRollups()
+        self.durations = DurationStats()
+        self.tag_sums = {}  # tag -> TradeTags.sums of the archived trades
+        self.r_counts = {}  # R histogram bin -> archived trades
+        # False for manifests written before the tag and duration sums were kept
+        self.summarized = True
+        self.version = 0  # history version written by the last archive run
+        self.segment_of = {}  # trade_id -> segment index
+        self.image_segment = {}  # screenshot file name -> segment index
+        self.cache = OrderedDict()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.dir, "manifest.json")
+
+    def __len__(self):
+        return len(self.segment_of)
+
+    def __contains__(self, trade_id):
+        return int(trade_id) in self.segment_of
+
+    def load(self):
+        """Read the manifest, an empty archive when there is none"""
+        self.reset()
+        if not os.path.exists(self.manifest_path):
+            return False
+        try:
+            data = vault.read_json(self.manifest_path, vault.key_for(self.name))
+        except Exception as e:
+            print(f"Error loading archive manifest: {e}")
+            return False
+        self.segments = data["segments"]
+        self.totals = data["totals"]
+        self.version = data.get("version", 0)
+        self.rollups.buckets = {period: {key: tuple(value) for key, value in data["rollups"][period].items()}
+                                for period in PERIODS}
+        if "durations" in data:
+            self.durations = DurationStats.from_dict(data["durations"])
+            self.tag_sums = data["tags"]
+            self.r_counts = {int(b): count for b, count in data["r_counts"].items()}
+        else:
+            self.summarized = not self.segments
+        self._index()
+        return True
+
+    def _index(self):
+        self.segment_of = {trade_id: i for i, segment in enumerate(self.segments) for trade_id in segment["ids"]}
+        self.image_segment = {image: i for i, segment in enumerate(self.segments) for image in segment["images"]}
+
+    def save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        temp = self.manifest_path + ".tmp"
+        vault.write_json({"segments": self.segments, "totals": self.totals, "version": self.version,
+                          "rollups": self.rollups.buckets, "durations": self.durations.to_dict(),
+                          "tags": self.tag_sums, "r_counts": {str(b): count for b, count in self.r_counts.items()}},
+                         temp, vault.key_for(self.name))
+        os.replace(temp, self.manifest_path)
+
+    def next_trade_id(self):
+        return max(self.segment_of, default=0) + 1
+
+    def _path(self, filename):
+        return os.path.join(self.dir, filename)
+
+    def archive(self, trades, cutoff, tags=None):
+        """Move the trades closed before cutoff into a new segment
+
+        trades is the TradeColumns store of the account and tags its
+        TradeTags, whose sums over the moved trades go to the manifest. The
+        screenshots of the moved trades are packed and removed from the
+        assets folder.
+        Returns the mask of the rows that were archived (none when nothing
+        is old enough).
+        """
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(trades.column('closed_at'))
+        old = closed & (trades.close_dates() < np.datetime64(cutoff, 'us'))
+        if not old.any():
+            return old
+        moved = trades.select(old)
+        key = vault.key_for(self.name)
+        index = len(self.segments)
+        os.makedirs(self.dir, exist_ok=True)
+
+        images = [path for col in ('before', 'after') for path in moved.column(col)
+                  if path is not None and os.path.exists(path)]
+        pack = f"assets_{index:04d}.zip"
+        with vault.open_write(self._path(pack), key) as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zf:
+            for path in images:
+                # Stored decrypted, the pack itself is encrypted as a whole
+                zf.writestr(os.path.basename(path), vault.read_bytes(path, key))
+        segment_file = f"segment_{index:04d}.pkl.gz"
+        with vault.open_write(self._path(segment_file), key) as f:
+            moved.to_frame().to_pickle(f, compression="gzip")
+
+        pnl = moved.column('closed_at')
+        wins, losses = moved.win_loss()
+        dates = moved.close_dates()
+        self.segments.append({
+            "file": segment_file,
+            "pack": pack,
+            "ids": moved.column('trade_id').tolist(),
+            "images": [os.path.basename(path) for path in images],
+            "start": str(dates.min()),
+            "end": str(dates.max()),
+        })
+        self.totals = {
+            'closed': self.totals['closed'] + len(moved),
+            'wins': self.totals['wins'] + wins,
+            'losses': self.totals['losses'] + losses,
+            'pnl': self.totals['pnl'] + float(pnl.sum()),
+        }
+        segment_rollups = PnLRollups()
+        segment_rollups.rebuild(moved)
+        self.rollups.merge(segment_rollups.buckets)
+        self._summarize(moved, tags)
+        self._index()
+        self.save()
+        # The screenshots only live in the pack once the manifest points to it
+        for path in images:
+            os.remove(path)
+        return old
+
+    def segment(self, index):
+        """TradeColumns store of a segment, read on first use"""
+        if index in self.cache:
+            self.cache.move_to_end(index)
+            return self.cache[index]
+        with vault.open_read(self._path(self.segments[index]["file"]), vault.key_for(self.name)) as f:
+            trades = TradeColumns.from_frame(pd.read_pickle(f, compression="gzip"))
+        self.cache[index] = trades
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return trades
+
+    def _summarize(self, moved, tags):
+        """Add the tag and duration sums and R multiples of archived trades"""
+        self.durations.merge(DurationStats.from_trades(moved))
+        if tags is not None:
+            tags.merge_sums(self.tag_sums, tags.sums(moved))
+        risk = moved.column('risk')
+        r = np.divide(moved.column('closed_at'), risk, out=np.zeros(len(risk)), where=risk > 0)
+        for b, count in r_bins(r).items():
+            self.r_counts[b] = self.r_counts.get(b, 0) + count
+
+    def summarize(self, tags):
+        """Compute the sums missing from a manifest written by an older version, reading every segment once"""
+        self.durations = DurationStats()
+        self.tag_sums = {}
+        self.r_counts = {}
+        for index in range(len(self.segments)):
+            self._summarize(self.segment(index), tags)
+        self.summarized = True
+        self.save()
+
+    def trades(self):
+        """Every archived trade in one TradeColumns store
+
+        Reads every segment: for analyses run on demand, the statistics shown
+        with the account come from the manifest.
+        """
+        return TradeColumns.concat([self.segment(index) for index in range(len(self.segments))])
+
+    def equity(self, start):
+        """(x, balance) daily points of the archived trades, from the day rollups
+
+        x is the day in seconds and balance the balance at the end of that
+        day, starting from `start`, the balance before the first archived trade.
+        """
+        days = sorted(self.rollups.buckets['day'].items())
+        x = np.array([day for day, _ in days], dtype='datetime64[s]').astype(float)
+        balance = start + np.cumsum([pnl for _, (pnl, _, _) in days])
+        return x, balance
+
+    def get(self, trade_id):
+        """An archived Trade, None if the trade is not in the archive"""
+        index = self.segment_of.get(int(trade_id))
+        return None if index is None else self.segment(index).get(trade_id)
+
+    def pages(self):
+        """Segment indexes, most recent first, for views paging back in time"""
+        return list(range(len(self.segments) - 1, -1, -1))
+
+    def trades_between(self, start=None, end=None):
+        """Archived trades closed between two dates, reading only the segments in range"""
+        start = np.datetime64(start, 'us') if start is not None else None
+        end = np.datetime64(end, 'us') if end is not None else None
+        found = []
+        for index, segment in enumerate(self.segments):
+            if (start is not None and np.datetime64(segment["end"]) < start) or \
+                    (end is not None and np.datetime64(segment["start"]) > end):
+                continue
+            trades = self.segment(index)
+            dates = trades.close_dates()
+            rows = np.ones(len(trades), dtype=bool)
+            if start is not None:
+                rows &= dates >= start
+            if end is not None:
+                rows &= dates <= end
+            found += [trades.trade_at(row) for row in np.flatnonzero(rows)]
+        return found
+
+    def image_bytes(self, path):
+        """Content of an archived screenshot, None if it was not archived"""
+        name = os.path.basename(path)
+        index = self.image_segment.get(name)
+        if index is None:
+            return None
+        with vault.open_read(self._path(self.segments[index]["pack"]), vault.key_for(self.name)) as f, \
+                zipfile.ZipFile(f) as zf:
+            return zf.read(name)
+
+    def files(self):
+        """Manifest, segment and pack files of the archive"""
+        paths = [self._path(segment[kind]) for segment in self.segments for kind in ("file", "pack")]
+        return paths + [self.manifest_path] if os.path.exists(self.manifest_path) else paths
+
+    def delete(self):
+        if os.path.exists(self.dir):
+            shutil.rmtree(self.dir)
+        self.reset()
+
+
+if __name__ == "__main__":
+    from model import TradingProfile
+
+    parser = argparse.ArgumentParser(description="Move old closed trades of an account to cold storage")
+    parser.add_argument("name")
+    parser.add_argument("--days", type=int, default=DEFAULT_AGE_DAYS, help="archive trades closed before this age")
+    args = parser.parse_args()
+
+    profile = TradingProfile()
+    if not profile.load_account(args.name):
+        parser.exit(1, f"Could not load {args.name}\n")
+    count = profile.archive_trades(datetime.datetime.now() - datetime.timedelta(days=args.days))
+    print(f"{count} trades archived, {len(profile.archive)} in the archive, {len(profile.trades)} kept")
@@ -0,0 +1,453 @@
+import numpy as np
+import datetime
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QCalendarWidget, QLabel,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QTabWidget)
+from PyQt5.QtGui import QPainter, QPen, QColor, QBrush, QPolygonF, QTextCharFormat
+from PyQt5.QtCore import Qt, QPointF, QRectF, QDate
+from analytics import HOLDING_LABELS, WEEKDAYS, SESSIONS, R_BIN_WIDTH, r_bins
+
+
+def minmax_downsample(x, y, x0, x1, buckets):
+    """Reduce the points of [x0, x1] to the min and max of each pixel bucket
+
+    x must be sorted. Returns the (x, y) points to draw, at most 2 per bucket,
+    so a line drawn through them looks the same as the full series.
+    """
+    start = np.searchsorted(x, x0, side='left')
+    end = np.searchsorted(x, x1, side='right')
+    # Keep one point on each side so the line reaches the borders
+    start = max(start - 1, 0)
+    end = min(end + 1, len(x))
+    x, y = x[start:end], y[start:end]
+    if len(x) <= 2 * buckets:
+        return x, y
+
+    edges = np.linspace(x[0], x[-1], buckets + 1)
+    bounds = np.unique(np.searchsorted(x, edges[:-1], side='left'))
+    lows = np.minimum.reduceat(y, bounds)
+    highs = np.maximum.reduceat(y, bounds)
+    centers = np.minimum.reduceat(x, bounds)
+    out_x = np.repeat(centers, 2)
+    out_y = np.empty(2 * len(bounds))
+    out_y[0::2] = lows
+    out_y[1::2] = highs
+    return out_x, out_y
+
+
+class LineChart(QWidget):
+    """Line chart with min/max downsampling, wheel zoom and drag to pan"""
+
+    def __init__(self, title, color, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.color = QColor(color)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.view = None  # (x0, x1) or None to show everything
+        self.drag_start = None
+        self.setMinimumHeight(120)
+
+    def set_data(self, x, y):
+        order = np.argsort(x, kind='stable')
+        self.x = np.asarray(x, dtype=float)[order]
+        self.y = np.asarray(y, dtype=float)[order]
+        self.update()
+
+    def insert_point(self, x, y):
+        """Add a single point, keeping the series sorted"""
+        index = np.searchsorted(self.x, x, side='right')
+        if index == len(self.x):
+            self.x = np.append(self.x, x)
+            self.y = np.append(self.y, y)
+        else:
+            self.x = np.insert(self.x, index, x)
+            self.y = np.insert(self.y, index, y)
+        self.update()
+        return index
+
+    def x_range(self):
+        if self.view is not None:
+            return self.view
+        if len(self.x) == 0:
+            return 0.0, 1.0
+        if self.x[0] == self.x[-1]:
+            return self.x[0] - 1, self.x[-1] + 1
+        return self.x[0], self.x[-1]
+
+    def plot_rect(self):
+        return QRectF(60, 20, max(self.width() - 70, 1), max(self.height() - 30, 1))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#ffffff"))
+        rect = self.plot_rect()
+        painter.setPen(QColor("#9f9f9f"))
+        painter.drawText(QRectF(0, 0, self.width(), 20), Qt.AlignCenter, self.title)
+        if len(self.x) == 0:
+            painter.drawText(rect, Qt.AlignCenter, "No data")
+            return
+
+        x0, x1 = self.x_range()
+        xs, ys = minmax_downsample(self.x, self.y, x0, x1, int(rect.width()))
+        y0, y1 = float(ys.min()), float(ys.max())
+        if y0 == y1:
+            y0, y1 = y0 - 1, y1 + 1
+
+        painter.drawText(QRectF(0, rect.top() - 8, 55, 16), Qt.AlignRight, f"{y1:.0f}")
+        painter.drawText(QRectF(0, rect.bottom() - 8, 55, 16), Qt.AlignRight, f"{y0:.0f}")
+        painter.drawRect(rect)
+
+        px = rect.left() + (xs - x0) / (x1 - x0) * rect.width()
+        py = rect.bottom() - (ys - y0) / (y1 - y0) * rect.height()
+        painter.setClipRect(rect)
+        painter.setPen(QPen(self.color, 1.5))
+        painter.drawPolyline(QPolygonF([QPointF(a, b) for a, b in zip(px, py)]))
+
+    def wheelEvent(self, event):
+        x0, x1 = self.x_range()
+        rect = self.plot_rect()
+        ratio = min(max((event.pos().x() - rect.left()) / rect.width(), 0.0), 1.0)
+        anchor = x0 + ratio * (x1 - x0)
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        self.view = (anchor - (anchor - x0) * factor, anchor + (x1 - anchor) * factor)
+        self.update()
+
+    def mousePressEvent(self, event):
+        self.drag_start = (event.pos().x(), self.x_range())
+
+    def mouseMoveEvent(self, event):
+        if self.drag_start is None:
+            return
+        start, (x0, x1) = self.drag_start
+        shift = (start - event.pos().x()) / self.plot_rect().width() * (x1 - x0)
+        self.view = (x0 + shift, x1 + shift)
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.drag_start = None
+
+    def mouseDoubleClickEvent(self, event):
+        """Reset zoom and pan"""
+        self.view = None
+        self.update()
+
+
+class HistogramChart(QWidget):
+    """Histogram of R multiples, updated one value at a time"""
+
+    def __init__(self, title, bin_width=R_BIN_WIDTH, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.bin_width = bin_width
+        self.counts = {}
+        self.setMinimumHeight(120)
+
+    def set_values(self, values, counts=None):
+        """Show values, plus counts already binned at R_BIN_WIDTH ({bin: count})"""
+        self.counts = r_bins(values, self.bin_width)
+        for b, count in (counts or {}).items():
+            self.counts[b] = self.counts.get(b, 0) + count
+        self.update()
+
+    def add_value(self, value):
+        key = int(np.floor(value / self.bin_width))
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#ffffff"))
+        painter.setPen(QColor("#9f9f9f"))
+        painter.drawText(QRectF(0, 0, self.width(), 20), Qt.AlignCenter, self.title)
+        rect = QRectF(10, 20, max(self.width() - 20, 1), max(self.height() - 40, 1))
+        if not self.counts:
+            painter.drawText(rect, Qt.AlignCenter, "No data")
+            return
+
+        first, last = min(self.counts), max(self.counts)
+        n_bins = last - first + 1
+        highest = max(self.counts.values())
+        bar_width = rect.width() / n_bins
+        for key, count in self.counts.items():
+            height = count / highest * rect.height()
+            color = "#bcf0b9" if key >= 0 else "#f0bcb9"
+            painter.fillRect(QRectF(rect.left() + (key - first) * bar_width, rect.bottom() - height,
+                                    max(bar_width - 1, 1), height), QBrush(QColor(color)))
+        painter.drawText(QRectF(rect.left(), rect.bottom(), 60, 20), Qt.AlignLeft,
+                         f"{first * self.bin_width:.1f}R")
+        painter.drawText(QRectF(rect.right() - 60, rect.bottom(), 60, 20), Qt.AlignRight,
+                         f"{(last + 1) * self.bin_width:.1f}R")
+
+
+def _pnl_color(pnl, largest):
+    strength = int(60 + 140 * abs(pnl) / (largest or 1))
+    return QColor(0, 160, 0, strength) if pnl >= 0 else QColor(200, 0, 0, strength)
+
+
+class BarChart(QWidget):
+    """P&L bars of labelled buckets, with trade count and winrate under each bar"""
+
+    def __init__(self, title, labels, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.labels = labels
+        self.stats = None
+        self.setMinimumHeight(120)
+
+    def set_data(self, stats):
+        """stats holds 'count', 'pnl' and 'winrate' arrays, one value per label"""
+        self.stats = stats
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#ffffff"))
+        painter.setPen(QColor("#9f9f9f"))
+        painter.drawText(QRectF(0, 0, self.width(), 20), Qt.AlignCenter, self.title)
+        rect = QRectF(10, 20, max(self.width() - 20, 1), max(self.height() - 60, 1))
+        if self.stats is None or not self.stats['count'].any():
+            painter.drawText(rect, Qt.AlignCenter, "No data")
+            return
+
+        pnl = self.stats['pnl']
+        largest = float(np.abs(pnl).max()) or 1
+        middle = rect.top() + rect.height() / 2
+        bar_width = rect.width() / len(self.labels)
+        painter.drawLine(QPointF(rect.left(), middle), QPointF(rect.right(), middle))
+        for i, label in enumerate(self.labels):
+            left = rect.left() + i * bar_width
+            height = pnl[i] / largest * rect.height() / 2
+            painter.fillRect(QRectF(left + 2, min(middle, middle - height), max(bar_width - 4, 1), abs(height)),
+                             QBrush(QColor("#bcf0b9" if pnl[i] >= 0 else "#f0bcb9")))
+            painter.drawText(QRectF(left, rect.bottom(), bar_width, 20), Qt.AlignCenter, label)
+            painter.drawText(QRectF(left, rect.bottom() + 18, bar_width, 20), Qt.AlignCenter,
+                             f"{int(self.stats['count'][i])} / {self.stats['winrate'][i]:.0f}%")
+
+
+class Heatmap(QWidget):
+    """Grid of cells colored by P&L, the trade count and winrate in the tooltip"""
+
+    def __init__(self, title, rows, columns, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.rows = rows
+        self.columns = columns
+        self.stats = None
+        self.setMinimumHeight(120)
+        self.setMouseTracking(True)
+
+    def set_data(self, stats):
+        """stats holds 'count', 'pnl' and 'winrate' arrays of shape (rows, columns)"""
+        self.stats = stats
+        self.update()
+
+    def grid_rect(self):
+        return QRectF(40, 20, max(self.width() - 50, 1), max(self.height() - 40, 1))
+
+    def cell_at(self, pos):
+        rect = self.grid_rect()
+        if not rect.contains(QPointF(pos)):
+            return None
+        row = int((pos.y() - rect.top()) / rect.height() * len(self.rows))
+        col = int((pos.x() - rect.left()) / rect.width() * len(self.columns))
+        return min(row, len(self.rows) - 1), min(col, len(self.columns) - 1)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#ffffff"))
+        painter.setPen(QColor("#9f9f9f"))
+        painter.drawText(QRectF(0, 0, self.width(), 20), Qt.AlignCenter, self.title)
+        rect = self.grid_rect()
+        if self.stats is None or not self.stats['count'].any():
+            painter.drawText(rect, Qt.AlignCenter, "No data")
+            return
+
+        pnl = self.stats['pnl']
+        count = self.stats['count']
+        largest = float(np.abs(pnl).max())
+        cell_width = rect.width() / len(self.columns)
+        cell_height = rect.height() / len(self.rows)
+        for row, name in enumerate(self.rows):
+            top = rect.top() + row * cell_height
+            painter.drawText(QRectF(0, top, 36, cell_height), Qt.AlignRight | Qt.AlignVCenter, name)
+            for col in range(len(self.columns)):
+                if count[row, col]:
+                    painter.fillRect(QRectF(rect.left() + col * cell_width, top, cell_width - 1, cell_height - 1),
+                                     _pnl_color(pnl[row, col], largest))
+        step = max(1, int(np.ceil(40 / cell_width)))
+        for col in range(0, len(self.columns), step):
+            painter.drawText(QRectF(rect.left() + col * cell_width, rect.bottom(), cell_width * step, 20),
+                             Qt.AlignLeft, self.columns[col])
+
+    def mouseMoveEvent(self, event):
+        cell = self.cell_at(event.pos())
+        if cell is None or self.stats is None:
+            self.setToolTip("")
+            return
+        row, col = cell
+        self.setToolTip(f"{self.rows[row]} {self.columns[col]}: ${self.stats['pnl'][row, col]:.2f}, "
+                        f"{int(self.stats['count'][row, col])} trades, {self.stats['winrate'][row, col]:.0f}% won")
+
+
+class ChartPanel(QWidget):
+    """Equity curve, drawdown and R multiple histogram of an account"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.equity_chart = LineChart("Equity", "#1a73e8")
+        self.drawdown_chart = LineChart("Drawdown", "#d93025")
+        self.r_histogram = HistogramChart("R multiples")
+        self.equity_peak = None
+        layout.addWidget(self.equity_chart, 2)
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.drawdown_chart)
+        bottom.addWidget(self.r_histogram)
+        layout.addLayout(bottom, 1)
+        self.calendar = PnLCalendar()
+        self.tag_stats = TagStatsTable()
+        stats = QHBoxLayout()
+        stats.addWidget(self.calendar)
+        stats.addWidget(self.tag_stats)
+        layout.addLayout(stats, 1)
+        self.holding_chart = BarChart("P&L by holding time", HOLDING_LABELS)
+        self.hour_heatmap = Heatmap("P&L by weekday and hour opened", WEEKDAYS, [str(h) for h in range(24)])
+        self.session_heatmap = Heatmap("P&L by weekday and session", WEEKDAYS, SESSIONS)
+        durations = QTabWidget()
+        durations.addTab(self.holding_chart, "Holding time")
+        durations.addTab(self.hour_heatmap, "Time of day")
+        durations.addTab(self.session_heatmap, "Sessions")
+        layout.addWidget(durations, 1)
+
+    def set_duration_stats(self, stats):
+        """Show the output of analytics.duration_stats"""
+        self.holding_chart.set_data(stats['holding'])
+        self.hour_heatmap.set_data(stats['hours'])
+        self.session_heatmap.set_data(stats['sessions'])
+
+    @staticmethod
+    def _closed_points(trades):
+        """x (date in seconds), balance and R of the closed trades of a TradeColumns store"""
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(trades.column('balance'))
+        dates = trades.close_dates()[closed]
+        x = dates.astype('datetime64[s]').astype(float)
+        risk = trades.column('risk')[closed]
+        r = np.divide(trades.column('closed_at')[closed], risk, out=np.zeros(len(risk)), where=risk > 0)
+        return x, trades.column('balance')[closed], r
+
+    def set_trades(self, trades, archived=None):
+        """Rebuild every chart from a TradeColumns store
+
+        archived is the (x, balance, R histogram counts) of the archived
+        trades, see TradingProfile.archived_points.
+        """
+        x, balance, r = self._closed_points(trades)
+        counts = None
+        if archived is not None:
+            archived_x, archived_balance, counts = archived
+            x, balance = np.concatenate([archived_x, x]), np.concatenate([archived_balance, balance])
+        self.equity_chart.set_data(x, balance)
+        self.drawdown_chart.set_data(self.equity_chart.x, self._drawdown(self.equity_chart.y))
+        self.r_histogram.set_values(r, counts)
+        self.equity_peak = float(self.equity_chart.y.max()) if len(balance) else None
+
+    @staticmethod
+    def _drawdown(equity):
+        if len(equity) == 0:
+            return equity
+        return np.maximum.accumulate(equity) - equity
+
+    def add_closed_trade(self, trade):
+        """Add the point of a newly closed trade without redrawing from scratch"""
+        if trade.balance is None or trade.close_date is None:
+            return
+        x = np.datetime64(trade.close_date, 's').astype(float)
+        index = self.equity_chart.insert_point(x, trade.balance)
+        equity = self.equity_chart.y
+        if index == len(equity) - 1:
+            self.equity_peak = max(self.equity_peak if self.equity_peak is not None else trade.balance,
+                                   trade.balance)
+            self.drawdown_chart.insert_point(x, self.equity_peak - trade.balance)
+        else:
+            # Out of order point: the running peak changes from there on
+            self.drawdown_chart.set_data(self.equity_chart.x, self._drawdown(equity))
+            self.equity_peak = float(equity.max())
+        if trade.risk > 0:
+            self.r_histogram.add_value(trade.closed_at / trade.risk)
+
+
+class PnLCalendar(QWidget):
+    """Month calendar colored by daily P&L, drawn from the account rollups"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.calendar = QCalendarWidget()
+        self.calendar.setGridVisible(True)
+        self.calendar.setVerticalHeaderFormat(QCalendarWidget.NoVerticalHeader)
+        self.summary = QLabel()
+        layout.addWidget(self.calendar)
+        layout.addWidget(self.summary)
+        self.rollups = None
+        self.colored = []
+        self.calendar.currentPageChanged.connect(lambda year, month: self.refresh())
+
+    def set_rollups(self, rollups):
+        self.rollups = rollups
+        self.refresh()
+
+    def refresh(self):
+        """Color the days of the month shown"""
+        for date in self.colored:
+            self.calendar.setDateTextFormat(date, QTextCharFormat())
+        self.colored = []
+        if self.rollups is None:
+            return
+
+        first = datetime.date(self.calendar.yearShown(), self.calendar.monthShown(), 1)
+        last = (first + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+        days = self.rollups.query('day', first, last)
+        largest = max((abs(pnl) for _, pnl, _, _ in days), default=0)
+        for day, pnl, count, winrate in days:
+            text_format = QTextCharFormat()
+            text_format.setBackground(_pnl_color(pnl, largest))
+            text_format.setToolTip(f"${pnl:.2f}, {count} trades, {winrate:.0f}% won")
+            date = QDate(day.year, day.month, day.day)
+            self.calendar.setDateTextFormat(date, text_format)
+            self.colored.append(date)
+
+        months = self.rollups.query('month', first, last)
+        if months:
+            _, pnl, count, winrate = months[0]
+            self.summary.setText(f"{first:%B %Y}: ${pnl:.2f}, {count} trades, {winrate:.0f}% won")
+        else:
+            self.summary.setText(f"{first:%B %Y}: no closed trades")
+
+
+class TagStatsTable(QTableWidget):
+    """Closed trades, winrate, P&L and average R per tag"""
+    HEADERS = ("Tag", "Trades", "Winrate", "P&L", "Avg R")
+
+    def __init__(self, parent=None):
+        super().__init__(0, len(self.HEADERS), parent)
+        self.setHorizontalHeaderLabels(self.HEADERS)
+        self.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.verticalHeader().setVisible(False)
+        self.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.setSortingEnabled(True)
+
+    def set_stats(self, stats):
+        """Show the output of TradeTags.stats"""
+        self.setSortingEnabled(False)
+        self.setRowCount(len(stats))
+        for row, (tag, values) in enumerate(sorted(stats.items())):
+            cells = (tag, values['closed'], round(values['winrate'], 1),
+                     round(values['pnl'], 2), round(values['avg_r'], 2))
+            for col, value in enumerate(cells):
+                item = QTableWidgetItem()
+                item.setData(Qt.DisplayRole, value)
+                self.setItem(row, col, item)
+        self.setSortingEnabled(True)
@@ -2,8 +2,14 @@ import sys
 from PyQt5.QtWidgets import (QApplication, QWidget, QLabel, QVBoxLayout, 
                              QPushButton, QHBoxLayout, QFileDialog, QShortcut, 
                              QFrame, QSplitter)
-from PyQt5.QtGui import QPixmap, QTransform, QKeySequence
+from PyQt5.QtGui import QPixmap, QTransform, QKeySequence, QImage
 from PyQt5.QtCore import Qt, pyqtSignal, QEvent
+from images import ImagePolicy, store_image, load_image
+from memory import governor
+
+# Largest pixmap kept for display, bigger images are previewed scaled down
+PREVIEW_WIDTH = 1920
+PREVIEW_HEIGHT = 1080
 
 # def saveImage(self):
 #     """Enregistre l'image affichée sous forme de fichier JPG."""
@@ -23,6 +29,12 @@ class ScalableImageLabel(QLabel):
         super().__init__(parent)
         self.setMinimumSize(300, 200)
         self.original_pixmap : QPixmap = None
+        # Full resolution image kept for saving when the pixmap is only a preview
+        self.original_image : QImage = None
+        # Reads the shown image again after the memory governor dropped its pixmap,
+        # None for a pasted image that exists nowhere else
+        self.source = None
+        self.released = False
         self.current_rotation = 0
         self.setScaledContents(False)
         self.setText("Glissez une image ici, utilisez Ctrl+V ou cliquez sur 'Importer une image'")
@@ -37,7 +49,57 @@ class ScalableImageLabel(QLabel):
         
     def setPixmap(self, pixmap):
         self.original_pixmap = pixmap
+        self.original_image = None
+        self.updatePixmap()
+        self.register_image()
+
+    def set_image(self, image : QImage):
+        """Show a quick preview of an image, the full image is kept for saving"""
+        preview = image
+        if image.width() > PREVIEW_WIDTH or image.height() > PREVIEW_HEIGHT:
+            preview = image.scaled(PREVIEW_WIDTH, PREVIEW_HEIGHT, Qt.KeepAspectRatio, Qt.FastTransformation)
+        self.original_pixmap = QPixmap.fromImage(preview)
+        self.original_image = image
+        self.source = None
         self.updatePixmap()
+        self.register_image()
+
+    def register_image(self):
+        """Report the decoded image held by the label to the memory governor"""
+        self.released = False
+        pixmap = self.original_pixmap
+        cost = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        if self.original_image is not None:
+            cost += self.original_image.sizeInBytes()
+        governor.add(("images", id(self), ""), cost, self.release_image)
+
+    def release_image(self):
+        """Drop the decoded image of a label out of view, returns False when it cannot be read again"""
+        if self.source is None or self.isVisible():
+            return False
+        self.original_pixmap = None
+        self.original_image = None
+        super().setPixmap(QPixmap())
+        self.released = True
+        return True
+
+    def showEvent(self, event):
+        if self.released and self.source is not None:
+            pixmap = QPixmap.fromImage(self.source())
+            if not pixmap.isNull():
+                # Same image and rotation as before it was released
+                self.original_pixmap = pixmap
+                self.updatePixmap()
+                self.register_image()
+        super().showEvent(event)
+
+    def full_image(self):
+        """Image to save, at full resolution"""
+        if self.original_image is not None:
+            return self.original_image
+        if self.original_pixmap is not None:
+            return self.original_pixmap.toImage()
+        return None
         
     def resizeEvent(self, event):
         if self.original_pixmap:
@@ -80,24 +142,33 @@ class ScalableImageLabel(QLabel):
             file_path = urls[0].toLocalFile()
             self.load_image_from_file(file_path)
             
-    def load_image_from_file(self, file_path):
-        pixmap = QPixmap(file_path)
+    def load_image_from_file(self, file_path, encryption_key=None):
+        return self.show_image(load_image(file_path, encryption_key),
+                               source=lambda: load_image(file_path, encryption_key))
+
+    def show_image(self, image : QImage, source=None):
+        """Show an image, source() reads it again if the governor releases it"""
+        pixmap = QPixmap.fromImage(image)
         if not pixmap.isNull():
             self.current_rotation = 0  # Réinitialiser la rotation
+            self.source = source
             self.setPixmap(pixmap)
             return True
         return False
     
-    def save_image(self,file_path):
+    def save_image(self,file_path,policy=None):
         success= False
         if not self.original_pixmap == None:
-            self.original_pixmap.save(file_path,"PNG")
-            success = True
+            success = store_image(self.full_image(), file_path, policy or ImagePolicy.load())
         return success
 
     def removeImage(self):
         """Supprime l'image actuellement affichée."""
         self.original_pixmap = None
+        self.original_image = None
+        self.source = None
+        self.released = False
+        governor.discard(("images", id(self), ""))
         self.current_rotation = 0
         self.clear()  # Efface l'affichage de QLabel
         self.setText("Glissez une image ici, utilisez Ctrl+V ou cliquez sur 'Importer une image'")
@@ -175,13 +246,18 @@ class ZoneContainer(QWidget):
         # signaler que l'on a inserer une image
         self.image_inserted.emit()
 
-    def load_image_from_file(self,file_path):
+    def load_image_from_file(self,file_path, encryption_key=None):
         if file_path:
-            if self.image_label.load_image_from_file(file_path):
-                self.rotate_left_button.setEnabled(self.is_selected)
-                self.rotate_right_button.setEnabled(self.is_selected)
-            else:
-                self.image_label.setText("Erreur: Impossible de charger l'image")
+            self.show_image(load_image(file_path, encryption_key),
+                            source=lambda: load_image(file_path, encryption_key))
+
+    def show_image(self, image : QImage, source=None):
+        """Show an image already read, e.g. from the trade archive"""
+        if self.image_label.show_image(image, source):
+            self.rotate_left_button.setEnabled(self.is_selected)
+            self.rotate_right_button.setEnabled(self.is_selected)
+        else:
+            self.image_label.setText("Erreur: Impossible de charger l'image")
 
     def rotateLeft(self):
         if self.is_selected:
@@ -201,11 +277,11 @@ class ZoneContainer(QWidget):
         # Vérifier si le presse-papiers contient une image
         if mime_data.hasImage():
             image = clipboard.image()
-            pixmap = QPixmap.fromImage(image)
 
-            if not pixmap.isNull():
+            if not image.isNull():
                 self.image_label.current_rotation = 0  # Réinitialiser la rotation
-                self.image_label.setPixmap(pixmap)
+                # Aperçu immédiat, l'image complète est enregistrée en arrière-plan
+                self.image_label.set_image(image)
                 self.rotate_left_button.setEnabled(True)
                 self.rotate_right_button.setEnabled(True)
 
@@ -0,0 +1,157 @@
+from collections import deque
+from model import TradingProfile
+from trade import Trade
+
+
+def _unchanged(stored, expected):
+    """True when a trade row is still as a command left it (screenshots aside)"""
+    if stored is None or expected is None:
+        return False
+    current = stored.to_dict()
+    target = expected.to_dict()
+    for key in ('before', 'after'):
+        current.pop(key)
+        target.pop(key)
+    return current == target
+
+
+class Command:
+    """A trade operation that can be undone and redone
+
+    do() and undo() apply targeted row updates through the TradingProfile and
+    return the (added, removed, changed) trades for the views, or None when
+    the operation could not be applied.
+    """
+    label = ""
+
+    def do(self, profile : TradingProfile):
+        raise NotImplementedError
+
+    def undo(self, profile : TradingProfile):
+        raise NotImplementedError
+
+
+class PlaceTradeCommand(Command):
+    label = "place trade"
+
+    def __init__(self, pair, position, risk, reward, date, background=False):
+        self.args = (pair, position, risk, reward, date)
+        # Write the workbook on the writer thread (quick entry)
+        self.background = background
+        self.trade = None
+
+    def do(self, profile):
+        if self.trade is None:
+            self.trade = profile.place_trade(profile.current_trade_id, *self.args, background=self.background)
+        elif not profile.restore_trade(self.trade):
+            return None
+        return [self.trade], [], []
+
+    def undo(self, profile):
+        if not _unchanged(profile.get_trade(self.trade.trade_id), self.trade):
+            return None
+        if not profile.delete_trade(self.trade.trade_id):
+            return None
+        return [], [self.trade], []
+
+
+class CloseTradeCommand(Command):
+    label = "close trade"
+
+    def __init__(self, trade : Trade):
+        self.request = trade
+        self.closed = None
+
+    def do(self, profile):
+        if not profile.close_trade(self.closed or self.request):
+            return None
+        self.closed = profile.get_trade(self.request.trade_id)
+        return [], [], [self.closed]
+
+    def undo(self, profile):
+        if not _unchanged(profile.get_trade(self.closed.trade_id), self.closed):
+            return None
+        reopened = profile.reopen_trade(self.closed.trade_id)
+        if reopened is None:
+            return None
+        return [], [], [reopened]
+
+
+class DeleteTradeCommand(Command):
+    label = "delete trade"
+
+    def __init__(self, trade_id):
+        self.trade_id = trade_id
+        self.trade = None
+        self.tags = []
+        self.note = ""
+
+    def do(self, profile):
+        trade = profile.get_trade(self.trade_id)
+        if trade is None:
+            return None
+        # Tags and note are dropped with the trade, keep them for undo
+        self.tags = profile.tags.tags_of(self.trade_id)
+        self.note = profile.tags.note_of(self.trade_id)
+        if not profile.delete_trade(self.trade_id):
+            return None
+        self.trade = trade
+        return [], [trade], []
+
+    def undo(self, profile):
+        if not profile.restore_trade(self.trade):
+            return None
+        if self.tags or self.note:
+            profile.set_trade_metadata(self.trade_id, self.tags, self.note)
+        return [self.trade], [], []
+
+
+class CommandLog:
+    """Bounded undo and redo stacks of the commands run on an account
+
+    Undo and redo pop one command and apply its inverse or itself again, so
+    both are O(1) in the number of recorded commands. The oldest commands are
+    dropped once `limit` is reached.
+    """
+
+    def __init__(self, limit=100):
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def execute(self, command : Command, profile : TradingProfile):
+        """Run a new command, returns its view changes or None"""
+        changes = command.do(profile)
+        if changes is not None:
+            self.undo_stack.append(command)
+            self.redo_stack.clear()
+        return changes
+
+    def undo(self, profile : TradingProfile):
+        """Revert the last command, returns (command, view changes)
+
+        A command whose trade was changed since (e.g. from another view) can
+        no longer be undone and is dropped; changes is None in that case.
+        """
+        if not self.undo_stack:
+            return None, None
+        command = self.undo_stack.pop()
+        changes = command.undo(profile)
+        if changes is not None:
+            self.redo_stack.append(command)
+        return command, changes
+
+    def redo(self, profile : TradingProfile):
+        """Run the last undone command again, returns (command, view changes)"""
+        if not self.redo_stack:
+            return None, None
+        command = self.redo_stack.pop()
+        changes = command.do(profile)
+        if changes is not None:
+            self.undo_stack.append(command)
+        else:
+            self.redo_stack.clear()
+        return command, changes
@@ -1,160 +1,341 @@
 from PyQt5.QtWidgets import QMainWindow, QApplication, QMessageBox, QListWidgetItem
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QImage
 import os
 from model import TradingProfile
 from ui import TradingUI
+from trade import Trade
+from session import AccountSessions, AccountSession
+from commands import CommandLog, PlaceTradeCommand, CloseTradeCommand, DeleteTradeCommand
+from analytics import account_duration_stats
+from quick_entry import SymbolIndex
+import vault
 import datetime
-import pandas as pd
 
 class TradingController:
     """Controller that manages communication between model and views"""
     
-    def __init__(self, profile_model : TradingProfile, trading_ui : TradingUI) -> None:
-        self.profile = profile_model
+    def __init__(self, sessions : AccountSessions, trading_ui : TradingUI, load_batch_size=50) -> None:
+        self.sessions = sessions
+        self.session : AccountSession = None
+        self.profile : TradingProfile = None
         self.ui = trading_ui
+        # Number of trades added to the list per event loop iteration when opening an account
+        self.load_batch_size = load_batch_size
+        self.load_generation = 0
+        self.loading = False
+        # Archive segments not shown yet, most recent first
+        self.archive_pages = []
+        # Trade operations of this view that can be undone
+        self.commands = CommandLog()
         self.return_signal = self.ui.quit_button.clicked
         
         # Connect UI signals to controller methods
         self.ui.place_trade_signal.connect(self.handle_place_trade)
+        self.ui.quick_trade_signal.connect(self.handle_quick_trade)
         self.ui.close_trade_signal.connect(self.handle_close_trade)
         self.ui.delete_trade_signal.connect(self.handle_delete_trade)
         self.ui.on_selected_signal.connect(self.on_selected_item)
-        self.ui.image_view.zone1.image_inserted.connect(self.save_image)
-        self.ui.image_view.zone2.image_inserted.connect(self.save_image)
+        self.ui.metadata_signal.connect(self.handle_metadata)
+        self.ui.limits_signal.connect(self.handle_limits)
+        self.ui.undo_signal.connect(self.undo)
+        self.ui.redo_signal.connect(self.redo)
+        self.ui.image_view.zone1.image_inserted.connect(lambda: self.save_image("before"))
+        self.ui.image_view.zone2.image_inserted.connect(lambda: self.save_image("after"))
+        self.ui.image_saver.finished.connect(self.on_image_saved)
+        self.ui.list_trades.verticalScrollBar().valueChanged.connect(self.on_list_scrolled)
 
-    def save_image(self):
+    def save_image(self, zone_name):
+        """Save the image inserted in a zone in the background"""
         item : QListWidgetItem = self.ui.selected_item
-        trade_id = self.ui.list_trades.itemWidget(item).trade_id
-        before,after = self.ui.set_images(trade_id)
-        df = pd.read_excel(self.profile.database_path)
-        df["before"] = df["before"].astype(str)
-        df["after"] = df["after"].astype(str)
-        df.loc[df["trade_id"] == trade_id,"before"] = before
-        df.loc[df["trade_id"] == trade_id,"after"] = after
-        df.to_excel(self.profile.database_path,index = False)
+        if item is None:
+            return
+        trade_id = self.ui.trade_of(item).trade_id
+        self.ui.save_zone_image(trade_id, zone_name)
+
+    def on_image_saved(self, key, path):
+        """Store the path of a screenshot once the worker has written it"""
+        trade_id, zone_name = key
+        if not path or self.profile is None:
+            return
+        self.session.sync_external_changes()
+        trade = self.profile.get_trade(trade_id)
+        if trade is None:
+            return
+        before = path if zone_name == "before" else trade.before
+        after = path if zone_name == "after" else trade.after
+        # Pasting again over a saved screenshot rewrites the same file
+        if (before, after) == (trade.before, trade.after):
+            return
+        if self.profile.set_trade_images(trade_id, before, after):
+            self.session.trades_changed.emit([], [], [self.profile.get_trade(trade_id)])
 
 
 
     def on_selected_item(self,trade_id):
-        df = pd.read_excel(self.profile.database_path)
-        row = df[df["trade_id"] ==  trade_id].iloc[0]
-        path_before = str(row["before"]) if pd.notna(row["before"]) else ""
-        path_after = str(row["after"]) if pd.notna(row["after"]) else ""
+        trade = self.profile.get_trade(trade_id)
+        archived = trade is None
+        if archived:
+            trade = self.profile.archive.get(trade_id)
+        if trade is None:
+            return
+        self.ui.show_metadata(self.profile.tags.tags_of(trade_id), self.profile.tags.note_of(trade_id))
+        self.show_trade_image(self.ui.image_view.zone1, trade.before or "", "before", archived)
+        self.show_trade_image(self.ui.image_view.zone2, trade.after or "", "after", archived)
 
+    def show_trade_image(self, zone, path, zone_name, archived=False):
+        """Load a screenshot from the assets folder or from the account archive"""
+        # Screenshots of an encrypted account are decrypted only when shown
+        key = vault.key_for(self.profile.name)
         # Vérifie que les fichiers existent avant de les charger
-        if path_before and os.path.exists(path_before):
-            self.ui.image_view.zone1.load_image_from_file(path_before)
-        else:
-            print(f"Image 'before' introuvable: {path_before}")
-
-        if path_after and os.path.exists(path_after):
-            self.ui.image_view.zone2.load_image_from_file(path_after)
+        # Archived screenshots are read from the pack: after a rename their old path may belong to another account
+        if path and not archived and os.path.exists(path):
+            zone.load_image_from_file(path, key)
+            return
+        data = self.profile.archive.image_bytes(path) if path else None
+        if data is not None:
+            # The pack bytes are kept to show the screenshot again if its pixmap is evicted
+            zone.show_image(QImage.fromData(data), source=lambda: QImage.fromData(data))
         else:
-            print(f"Image 'after' introuvable: {path_after}")
+            print(f"Image '{zone_name}' introuvable: {path}")
     
     def setup_account(self, account_name):
         """Set up account - load or create if needed"""
-        # Create account if it doesn't exist
-        account_path = f"./database/{account_name}.xlsx"
-        if not os.path.exists("./database"):
-            os.makedirs("./database")
+        session = self.sessions.acquire(account_name)
+        if session is None:
+            QMessageBox.warning(None, "Error", f"Could not load account: {account_name}")
+            return False
+
+        self.close()
+        self.session = session
+        self.profile = session.profile
+        self.ui.image_saver.encryption_key = vault.key_for(account_name)
+        # Every view of the account follows the changes made from any of them
+        session.trades_changed.connect(self.on_trades_changed)
+        session.trade_closed.connect(self.on_trade_closed)
+        session.reloaded.connect(self.on_reloaded)
+        session.profile_changed.connect(self.update_ui)
+        self.on_reloaded()
+        return True
+
+    def close(self):
+        """Stop showing the current account"""
+        if self.session is None:
+            return
+        self.load_generation += 1
+        self.session.trades_changed.disconnect(self.on_trades_changed)
+        self.session.trade_closed.disconnect(self.on_trade_closed)
+        self.session.reloaded.disconnect(self.on_reloaded)
+        self.session.profile_changed.disconnect(self.update_ui)
+        self.sessions.release(self.session)
+        self.ui.release_memory()
+        self.session = None
+        self.profile = None
             
-        if not os.path.exists(account_path):
-            self.profile.create_account(account_name)
-        
-        # Load the account
-        success = self.profile.load_account(account_name)
-        if success:
-            # Update UI with account info
-            self.update_ui()
-            # Load trades
-            self.load_trades()
+    def restore_version(self, version):
+        """Restore the open account to a recorded version and refresh the views"""
+        if self.profile.restore_version(version):
+            self.session.reloaded.emit()
             return True
+        QMessageBox.warning(None, "Error", f"Could not restore version {version}")
+        return False
+
+    def on_reloaded(self):
+        """Show the whole account again"""
+        # Recorded commands refer to rows that may no longer exist
+        self.commands.clear()
+        self.ui.set_symbols(SymbolIndex.from_trades(self.profile.trades))
+        self.update_ui()
+        self.load_trades()
+
+    def on_trades_changed(self, added, removed, changed):
+        """Apply trades added, removed or edited from another view or process"""
+        for trade in removed:
+            self.ui.remove_trade(trade.trade_id)
+        for trade in changed:
+            self.ui.update_trade(trade)
+        for trade in added:
+            self.ui.insert_trade(trade)
+            self.ui.symbols.add(trade.pair)
+        if removed or changed or any(not trade.is_open for trade in added):
+            self.ui.charts.set_trades(self.profile.trades, self.profile.archived_points())
+            self.update_ui()
         else:
-            QMessageBox.warning(None, "Error", f"Could not load account: {account_name}")
-            return False
+            # Open trades only move the open risk, the statistics cover closed trades
+            self.update_account_info()
+
+    def on_trade_closed(self, trade : Trade):
+        self.ui.update_trade(trade)
+        self.ui.charts.add_closed_trade(trade)
+        self.update_ui()
             
     def update_ui(self):
         """Update UI with current account information"""
+        self.ui.charts.calendar.set_rollups(self.profile.rollups)
+        self.ui.charts.tag_stats.set_stats(self.profile.tag_stats())
+        self.ui.charts.set_duration_stats(account_duration_stats(self.profile))
+        self.update_account_info()
+
+    def update_account_info(self):
+        """Update the balance, winrate and open risk shown for the account"""
         self.ui.update_profile_display(
             self.profile.name,
             self.profile.balance,
-            self.profile.average_winrate
+            self.profile.average_winrate,
+            self.profile.exposure,
+            self.profile.currency
         )
     
     def load_trades(self):
-        """Load trades from the account database and update UI"""
+        """Load trades from the account database and update UI
+
+        Trades are added in batches, newest first, returning to the event loop
+        between batches. Starting a new load cancels the one in progress.
+        """
+        self.load_generation += 1
         try:
             self.ui.clear_trades()
-            df = self.profile.get_trades()
-            
-            if not df.empty:
-                for _, trade in df.iterrows():
-                    status = trade['status']
-                    if status == 'CLOSED' and trade['result'] is not None:
-                        status = f"CLOSED ({trade['result']})"
-                    
-                    self.ui.add_trade(
-                        trade['trade_id'],
-                        trade['pair'],
-                        trade['position'],
-                        status,
-                        trade['risk'],
-                        trade['reward'],
-                        trade["date"]
-                    )
+            self.ui.charts.set_trades(self.profile.trades, self.profile.archived_points())
+            self.archive_pages = self.profile.archive.pages()
+            self.loading = True
+            trade_ids = self.profile.trades.column('trade_id')[::-1].tolist()
+            self.load_trades_batch(self.load_generation, self.profile.trades, trade_ids, 0)
+        except Exception as e:
+            QMessageBox.warning(None, "Error", f"Could not load trades: {str(e)}")
+
+    def load_trades_batch(self, generation, trades, trade_ids, start, archived=False):
+        """Add the next batch of trades to the list"""
+        if generation != self.load_generation or (trades is not self.profile.trades and not archived):
+            return  # another account or version was loaded meanwhile
+        try:
+            end = start + self.load_batch_size
+            # Trades deleted since the load started are skipped
+            batch = [trade for trade in map(trades.get, trade_ids[start:end]) if trade is not None]
+            self.ui.prepend_trades(batch)
+            if end < len(trade_ids):
+                QTimer.singleShot(0, lambda: self.load_trades_batch(generation, trades, trade_ids, end, archived))
+                return
+            self.loading = False
+            # Nothing to scroll: the older trades are already in view
+            if self.ui.list_trades.verticalScrollBar().maximum() == 0:
+                self.load_archive_page()
         except Exception as e:
             QMessageBox.warning(None, "Error", f"Could not load trades: {str(e)}")
+
+    def on_list_scrolled(self, value):
+        if value == self.ui.list_trades.verticalScrollBar().minimum():
+            self.load_archive_page()
+
+    def load_archive_page(self):
+        """Show the next archive segment above the listed trades, reading it from disk now"""
+        if self.loading or not self.archive_pages or self.profile is None:
+            return
+        try:
+            trades = self.profile.archive.segment(self.archive_pages.pop(0))
+        except Exception as e:
+            QMessageBox.warning(None, "Error", f"Could not read archived trades: {str(e)}")
+            return
+        self.loading = True
+        trade_ids = trades.column('trade_id')[::-1].tolist()
+        self.load_trades_batch(self.load_generation, trades, trade_ids, 0, archived=True)
     
-    def handle_place_trade(self, pair, risk, reward, position):
+    def handle_quick_trade(self, pair, risk, reward, position):
+        """Place a trade typed in the quick entry line, writing the workbook in the background"""
+        self.handle_place_trade(pair, risk, reward, position, background=True)
+
+    def handle_place_trade(self, pair, risk, reward, position, background=False):
         """Handle place trade request from UI"""
-        try:
-            trade = self.profile.place_trade(
-                self.profile.current_trade_id,
-                pair,
-                position,
-                risk,
-                reward,
-                datetime.datetime.now()
+        self.session.sync_external_changes()
+        warnings = self.profile.exposure.check(pair, position, risk)
+        if warnings:
+            reply = QMessageBox.question(
+                None,
+                "Risk limit",
+                "\n".join(warnings) + "\n\nPlace the trade anyway?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
             )
+            if reply != QMessageBox.Yes:
+                return
+        try:
+            command = PlaceTradeCommand(pair, position, risk, reward, datetime.datetime.now(), background)
+            changes = self.commands.execute(command, self.profile)
             
-            # Add trade to UI
-            self.ui.add_trade(
-                trade['trade_id'],
-                trade['pair'],
-                trade['position'],
-                trade['status'],
-                trade['risk'],
-                trade['reward'],
-                trade["date"]
-            )
+            # Add trade to every view of the account
+            self.session.trades_changed.emit(*changes)
         except Exception as e:
             QMessageBox.warning(None, "Error", f"Could not place trade: {str(e)}")
     
-    def handle_close_trade(self,trade : dict):
+    def handle_close_trade(self,trade : Trade):
         """Handle close trade request from UI"""
+        self.session.sync_external_changes()
+        # The screenshot paths are only kept once the files exist
+        self.ui.image_saver.wait()
         try:
-            success = self.profile.close_trade(trade)
-            if success:
-                # Update the trade in UI
-                status = f"CLOSED ({trade['result']})"
-                self.ui.update_trade_status(trade["trade_id"], status)
-                # Update account info
-                self.update_ui()
+            changes = self.commands.execute(CloseTradeCommand(trade), self.profile)
+            if changes is not None:
+                # Update the trade and account info in every view
+                self.session.trade_closed.emit(changes[2][0])
             else:
-                QMessageBox.warning(None, "Error", f"Could not close trade {trade['trade_id']}")
+                QMessageBox.warning(None, "Error", f"Could not close trade {trade.trade_id}")
         except Exception as e:
             QMessageBox.warning(None, "Error", f"Error closing trade: {str(e)}")
     
+    def handle_metadata(self, trade_id, tags, note):
+        """Handle tags and note edited on the selected trade"""
+        try:
+            if self.profile.set_trade_metadata(trade_id, tags, note):
+                # Per tag statistics of every view
+                self.session.profile_changed.emit()
+            else:
+                QMessageBox.warning(None, "Error", f"Could not save the tags of trade {trade_id}")
+        except Exception as e:
+            QMessageBox.warning(None, "Error", f"Error saving tags: {str(e)}")
+
+    def handle_limits(self, limits):
+        """Handle the open risk limits edited for the account"""
+        if self.profile.set_risk_limits(**limits):
+            self.session.profile_changed.emit()
+        else:
+            QMessageBox.warning(None, "Error", "Could not save the risk limits")
+
     def handle_delete_trade(self, trade_id):
         """Handle delete trade request from UI"""
+        self.session.sync_external_changes()
         try:
-            success = self.profile.delete_trade(trade_id)
-            if success:
-                # Remove the trade from UI
-                self.ui.remove_trade(trade_id)
+            changes = self.commands.execute(DeleteTradeCommand(trade_id), self.profile)
+            if changes is not None:
+                # Remove the trade from every view
+                self.session.trades_changed.emit(*changes)
             else:
                 QMessageBox.warning(None, "Error", f"Could not delete trade {trade_id}")
         except Exception as e:
             QMessageBox.warning(None, "Error", f"Error deleting trade: {str(e)}")
 
+    def undo(self):
+        """Revert the last trade operation made from this view"""
+        self.session.sync_external_changes()
+        try:
+            command, changes = self.commands.undo(self.profile)
+            if command is None:
+                return
+            if changes is None:
+                QMessageBox.warning(None, "Undo", f"Cannot undo {command.label}: the trade was changed since")
+                return
+            self.session.trades_changed.emit(*changes)
+        except Exception as e:
+            QMessageBox.warning(None, "Error", f"Error undoing: {str(e)}")
 
+    def redo(self):
+        """Apply the last undone trade operation again"""
+        self.session.sync_external_changes()
+        try:
+            command, changes = self.commands.redo(self.profile)
+            if command is None:
+                return
+            if changes is None:
+                QMessageBox.warning(None, "Redo", f"Cannot redo {command.label}: the trade was changed since")
+                return
+            self.session.trades_changed.emit(*changes)
+        except Exception as e:
+            QMessageBox.warning(None, "Error", f"Error redoing: {str(e)}")
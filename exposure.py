@@ -0,0 +1,148 @@
+import os
+import json
+from collections import defaultdict
+import numpy as np
+
+# Open risk limits of every account, by account name
+LIMITS_PATH = "./database/users/risk_limits.json"
+LIMIT_NAMES = ("max_total", "max_per_pair", "max_per_direction")
+
+
+def read_limits(path=LIMITS_PATH):
+    """{account name: {limit name: amount}} saved in path"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading risk limits: {e}")
+        return {}
+
+
+def write_limits(limits, path=LIMITS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(limits, f, indent=4)
+
+
+def rename_limits(old_name, new_name, path=LIMITS_PATH):
+    """Move the limits of a renamed account"""
+    limits = read_limits(path)
+    if old_name in limits:
+        limits[new_name] = limits.pop(old_name)
+        write_limits(limits, path)
+
+
+def forget_limits(name, path=LIMITS_PATH):
+    """Drop the limits of a deleted account"""
+    limits = read_limits(path)
+    if limits.pop(name, None) is not None:
+        write_limits(limits, path)
+
+
+class ExposureMonitor:
+    """Open risk per pair, per direction and in total
+
+    The sums are kept up to date from single trade changes, so placing,
+    closing or deleting a trade costs O(1) instead of a scan of the account.
+    Limits set to None are not checked.
+    """
+
+    def __init__(self, max_total=None, max_per_pair=None, max_per_direction=None):
+        self.max_total = max_total
+        self.max_per_pair = max_per_pair
+        self.max_per_direction = max_per_direction
+        self.reset()
+
+    def reset(self):
+        self.total = 0.0
+        self.per_pair = defaultdict(float)
+        self.per_direction = defaultdict(float)
+        self.open_trades = 0
+
+    def set_limits(self, max_total=None, max_per_pair=None, max_per_direction=None):
+        self.max_total = max_total
+        self.max_per_pair = max_per_pair
+        self.max_per_direction = max_per_direction
+
+    def limits(self):
+        return {name: getattr(self, name) for name in LIMIT_NAMES}
+
+    def load_limits(self, name, path=LIMITS_PATH):
+        """Use the limits saved for an account, none when it has no entry"""
+        limits = read_limits(path).get(name, {})
+        self.set_limits(**{key: limits.get(key) for key in LIMIT_NAMES})
+
+    def save_limits(self, name, path=LIMITS_PATH):
+        """Save the limits of an account, returns False on failure"""
+        try:
+            limits = read_limits(path)
+            limits[name] = self.limits()
+            write_limits(limits, path)
+            return True
+        except Exception as e:
+            print(f"Error saving risk limits: {e}")
+            return False
+
+    def _add(self, pair, position, risk, sign):
+        self.total += sign * risk
+        self.per_pair[pair] += sign * risk
+        self.per_direction[position] += sign * risk
+        self.open_trades += sign
+        # Drop buckets that went back to zero
+        if abs(self.per_pair[pair]) < 1e-9:
+            del self.per_pair[pair]
+        if abs(self.per_direction[position]) < 1e-9:
+            del self.per_direction[position]
+        if self.open_trades == 0:
+            self.total = 0.0
+
+    def apply(self, before, after):
+        """Account for a trade going from `before` to `after` (either may be None)"""
+        if before is not None and before.is_open:
+            self._add(before.pair, before.position, before.risk, -1)
+        if after is not None and after.is_open:
+            self._add(after.pair, after.position, after.risk, 1)
+
+    def rebuild(self, trades):
+        """Recompute every sum from a TradeColumns store"""
+        self.reset()
+        status = trades.column('status')
+        is_open = status == 'OPEN'
+        if not is_open.any():
+            return
+        risk = trades.column('risk')[is_open]
+        pairs = trades.column('pair')[is_open]
+        positions = trades.column('position')[is_open]
+        self.total = float(risk.sum())
+        self.open_trades = int(is_open.sum())
+        for keys, sums in ((pairs, self.per_pair), (positions, self.per_direction)):
+            # Missing values stay None, the key apply() uses for the same trades
+            missing = np.array([key is None for key in keys], dtype=bool)
+            labels, inverse = np.unique(np.where(missing, '', keys).astype(str), return_inverse=True)
+            for label, value in zip(labels, np.bincount(inverse, weights=risk)):
+                sums[str(label) if label else None] = float(value)
+
+    def check(self, pair, position, risk):
+        """Warnings for the limits a new trade would breach"""
+        warnings = []
+        if self.max_total is not None and self.total + risk > self.max_total:
+            warnings.append(f"Total open risk would reach ${self.total + risk:.2f} "
+                            f"(limit ${self.max_total:.2f})")
+        pair_risk = self.per_pair.get(pair, 0.0) + risk
+        if self.max_per_pair is not None and pair_risk > self.max_per_pair:
+            warnings.append(f"Open risk on {pair} would reach ${pair_risk:.2f} "
+                            f"(limit ${self.max_per_pair:.2f})")
+        direction_risk = self.per_direction.get(position, 0.0) + risk
+        if self.max_per_direction is not None and direction_risk > self.max_per_direction:
+            warnings.append(f"Open {position} risk would reach ${direction_risk:.2f} "
+                            f"(limit ${self.max_per_direction:.2f})")
+        return warnings
+
+    def summary(self):
+        """Per pair breakdown, largest exposure first"""
+        lines = [f"{pair}: ${value:.2f}" for pair, value in
+                 sorted(self.per_pair.items(), key=lambda item: -item[1])]
+        lines += [f"{position}: ${value:.2f}" for position, value in sorted(self.per_direction.items())]
+        return "\n".join(lines)
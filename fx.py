@@ -0,0 +1,170 @@
+import os
+import numpy as np
+import pandas as pd
+
+RATES_PATH = "./database/users/fx_rates.csv"
+# Currency every rate in the rates file is quoted in
+PIVOT = "USD"
+DEFAULT_CURRENCY = "USD"
+SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥"}
+
+
+def normalize_currency(code):
+    """ISO code of a currency, the default one for empty cells"""
+    if code is None or (isinstance(code, float) and np.isnan(code)):
+        return DEFAULT_CURRENCY
+    code = str(code).strip().upper()
+    return code or DEFAULT_CURRENCY
+
+
+def format_amount(amount, currency=DEFAULT_CURRENCY):
+    """Amount for display, '$1000.00' or '1000.00 CHF'"""
+    currency = normalize_currency(currency)
+    symbol = SYMBOLS.get(currency)
+    return f"{symbol}{amount:.2f}" if symbol else f"{amount:.2f} {currency}"
+
+
+class FXRates:
+    """Daily FX rates read from a local file, converted without any network access
+
+    The file has a date column and one column per currency holding the value
+    of one unit of that currency in PIVOT, e.g.
+
+        date,EUR,GBP,JPY
+        2024-01-02,1.0945,1.2620,0.00703
+
+    CSV and Parquet files are supported (Parquet needs pyarrow). Missing days
+    are linearly interpolated; each currency is expanded once into a dense
+    daily table kept in memory, so converting an array of dates is an index
+    lookup.
+    """
+
+    def __init__(self, path=RATES_PATH):
+        self.path = path
+        self.days = np.empty(0, dtype=np.int64)  # known days, as days since 1970-01-01
+        self.quotes = {}  # currency -> rate of each known day (NaN where missing)
+        self.tables = {}  # currency -> dense daily rates from days[0] to days[-1]
+
+    @classmethod
+    def load(cls, path=RATES_PATH):
+        """Rates of a file, an empty table when it does not exist or cannot be read"""
+        rates = cls(path)
+        if not os.path.exists(path):
+            return rates
+        try:
+            if path.endswith(".parquet"):
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_csv(path)
+        except Exception as e:
+            print(f"Error loading FX rates: {e}")
+            return rates
+        rates.set_frame(df)
+        return rates
+
+    def set_frame(self, df):
+        """Replace the rates with a DataFrame in the file layout"""
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        df = df[dates.notna()].assign(date=dates[dates.notna()]).sort_values('date')
+        self.days = df['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        self.quotes = {normalize_currency(col): pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+                       for col in df.columns if col != 'date'}
+        self.tables = {}
+
+    @property
+    def currencies(self):
+        return sorted(set(self.quotes) | {PIVOT})
+
+    def _table(self, currency):
+        table = self.tables.get(currency)
+        if table is None:
+            quotes = self.quotes.get(currency)
+            if quotes is None:
+                raise KeyError(f"No FX rates for {currency}")
+            known = ~np.isnan(quotes) & (quotes > 0)
+            if not known.any():
+                raise KeyError(f"No FX rates for {currency}")
+            every_day = np.arange(self.days[0], self.days[-1] + 1)
+            table = np.interp(every_day, self.days[known], quotes[known])
+            self.tables[currency] = table
+        return table
+
+    def rate(self, currency, dates=None):
+        """Value of one unit of currency in PIVOT on each date
+
+        dates is a datetime64 array, a single date, or None for the latest
+        rate. Dates outside the file use the first or last known rate.
+        """
+        currency = normalize_currency(currency)
+        if currency == PIVOT:
+            return np.ones(np.shape(dates)) if dates is not None else 1.0
+        table = self._table(currency)
+        if dates is None:
+            return float(table[-1])
+        days = np.asarray(dates, dtype='datetime64[D]')
+        # Undated values are converted at the latest rate
+        index = np.where(np.isnat(days), len(table) - 1,
+                         np.clip(days.astype(np.int64) - self.days[0], 0, len(table) - 1))
+        return table[index]
+
+    def convert(self, amounts, source, target, dates=None):
+        """Amounts in source currency expressed in target, at the rate of each date"""
+        source = normalize_currency(source)
+        target = normalize_currency(target)
+        amounts = np.asarray(amounts, dtype=float)
+        if source == target:
+            return amounts
+        return amounts * self.rate(source, dates) / self.rate(target, dates)
+
+
+def convert_pnl(trades, currency, target, rates):
+    """P&L of every trade of a TradeColumns store in target, at the rate of its close date"""
+    return rates.convert(trades.column('closed_at'), currency, target, trades.close_dates())
+
+
+def portfolio_summary(accounts, target, rates):
+    """Totals of several accounts converted to one currency
+
+    accounts is a list of (currency, balance, TradeColumns) tuples. Balances
+    are converted at the latest rate and the P&L of each trade at the rate of
+    the day it was closed. Returns {'balance', 'pnl', 'closed', 'wins',
+    'winrate', 'by_currency': {currency: balance in target}}.
+    """
+    summary = {'balance': 0.0, 'pnl': 0.0, 'closed': 0, 'wins': 0, 'by_currency': {}}
+    for currency, balance, trades in accounts:
+        currency = normalize_currency(currency)
+        converted = float(rates.convert(balance, currency, target))
+        summary['balance'] += converted
+        summary['by_currency'][currency] = summary['by_currency'].get(currency, 0.0) + converted
+        if trades is None:
+            continue
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(trades.column('closed_at'))
+        pnl = convert_pnl(trades, currency, target, rates)[closed]
+        summary['pnl'] += float(pnl.sum())
+        summary['closed'] += int(closed.sum())
+        summary['wins'] += int((pnl > 0).sum())
+    summary['winrate'] = summary['wins'] / summary['closed'] * 100 if summary['closed'] else 0.0
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    from model import TradingProfile, PROFILE_PATH
+
+    parser = argparse.ArgumentParser(description="Totals of every account in one currency")
+    parser.add_argument("--currency", default=DEFAULT_CURRENCY)
+    parser.add_argument("--rates", default=RATES_PATH, help="CSV or Parquet file of daily rates")
+    args = parser.parse_args()
+
+    rates = FXRates.load(args.rates)
+    accounts = []
+    for name in pd.read_excel(PROFILE_PATH)['name']:
+        profile = TradingProfile()
+        if profile.load_account(name):
+            accounts.append((profile.currency, profile.balance, profile.trades))
+    summary = portfolio_summary(accounts, args.currency, rates)
+    print(f"{len(accounts)} accounts: balance {format_amount(summary['balance'], args.currency)}, "
+          f"P&L {format_amount(summary['pnl'], args.currency)}, {summary['closed']} closed trades, "
+          f"{summary['winrate']:.1f}% won")
+    for currency, balance in sorted(summary['by_currency'].items()):
+        print(f"  {currency}: {format_amount(balance, args.currency)}")
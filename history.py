@@ -0,0 +1,234 @@
+import os
+import json
+import threading
+import datetime
+import pandas as pd
+from trade import Trade, TradeColumns, DATE_COLUMNS
+import vault
+
+HISTORY_ROOT = "./database/history"
+
+
+def _encode_trade(trade):
+    if trade is None:
+        return None
+    data = trade.to_dict()
+    for col in DATE_COLUMNS:
+        data[col] = data[col].isoformat() if data[col] is not None else None
+    return data
+
+
+def _decode_trade(data):
+    return None if data is None else Trade.from_dict(data)
+
+
+class AccountHistory:
+    """Versioned history of an account
+
+    Every mutation is appended to a journal with the trade row before and
+    after the change. A compressed checkpoint of the whole trade store is
+    written every `checkpoint_every` versions, so restoring a version only
+    replays the journal from the nearest checkpoint. Mutations recorded with
+    background=True are written by `writer`, a BackgroundWriter.
+    """
+
+    def __init__(self, name, checkpoint_every=50, root=HISTORY_ROOT, writer=None):
+        self.name = name
+        self.writer = writer
+        self.lock = threading.Lock()
+        self.pending = []  # journal entries queued to the writer
+        self.checkpoint_every = checkpoint_every
+        self.dir = os.path.join(root, name)
+        self.journal_path = os.path.join(self.dir, "journal.jsonl")
+        self.version = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                self.version = sum(1 for line in f if line.strip())
+
+    def exists(self):
+        return os.path.exists(self.journal_path)
+
+    def _checkpoint_path(self, version):
+        return os.path.join(self.dir, f"checkpoint_{version:08d}.pkl.gz")
+
+    def _checkpoint_versions(self):
+        if not os.path.exists(self.dir):
+            return []
+        versions = []
+        for filename in os.listdir(self.dir):
+            if filename.startswith("checkpoint_") and filename.endswith(".pkl.gz"):
+                versions.append(int(filename[len("checkpoint_"):-len(".pkl.gz")]))
+        return sorted(versions)
+
+    def wait(self):
+        """Block until the entries and checkpoints queued to the writer are written"""
+        if self.writer is not None:
+            self.writer.wait()
+
+    def read_journal(self):
+        """Return all journal entries, oldest first"""
+        self.wait()
+        if not os.path.exists(self.journal_path):
+            return []
+        return [json.loads(line) for line in vault.read_lines(self.journal_path, vault.key_for(self.name))]
+
+    def _append(self, entry, background=False):
+        if background and self.writer is not None:
+            with self.lock:
+                self.pending.append(entry)
+            # One queued job writes every entry pending when it runs
+            self.writer.submit(self.journal_path, self._write_pending)
+            return
+        # Entries queued before this one come first
+        self.wait()
+        self._write_entries([entry])
+
+    def _write_pending(self):
+        with self.lock:
+            entries, self.pending = self.pending, []
+        self._write_entries(entries)
+
+    def _write_entries(self, entries):
+        os.makedirs(self.dir, exist_ok=True)
+        # Entries of a protected account are encrypted one by one, the journal stays append only
+        key = vault.key_for(self.name)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.writelines(vault.seal_line(json.dumps(entry), key) + "\n" for entry in entries)
+
+    def _save_checkpoint(self, trades, version, background=False):
+        frame = trades.to_frame()
+        if background and self.writer is not None:
+            self.writer.submit(self._checkpoint_path(version), lambda: self._write_checkpoint(frame, version))
+        else:
+            self._write_checkpoint(frame, version)
+
+    def _write_checkpoint(self, frame, version):
+        os.makedirs(self.dir, exist_ok=True)
+        # Encrypted with the account key when the account is protected
+        with vault.open_write(self._checkpoint_path(version), vault.key_for(self.name)) as f:
+            frame.to_pickle(f, compression="gzip")
+
+    def _load_checkpoint(self, version):
+        with vault.open_read(self._checkpoint_path(version), vault.key_for(self.name)) as f:
+            return pd.read_pickle(f, compression="gzip")
+
+    def rewrite_paths(self, rename):
+        """Apply rename to the screenshot paths of every recorded version"""
+        entries = self.read_journal()
+        for entry in entries:
+            for data in (entry["before"], entry["after"]):
+                if data is None:
+                    continue
+                for col in ("before", "after"):
+                    if data.get(col):
+                        data[col] = rename(data[col])
+        vault.write_lines(self.journal_path, [json.dumps(entry) for entry in entries], vault.key_for(self.name))
+        for version in self._checkpoint_versions():
+            frame = self._load_checkpoint(version)
+            for col in ("before", "after"):
+                if col in frame.columns:
+                    frame[col] = frame[col].map(lambda path: rename(path) if isinstance(path, str) else path)
+            self._save_checkpoint(TradeColumns.from_frame(frame), version)
+
+    def write_checkpoint(self, trades, state, op="checkpoint"):
+        """Record a version holding a full copy of the trade store"""
+        self.version += 1
+        os.makedirs(self.dir, exist_ok=True)
+        self._save_checkpoint(trades, self.version)
+        self._append({
+            "version": self.version,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "op": op,
+            "trade_id": None,
+            "before": None,
+            "after": None,
+            "state": state,
+        })
+        return self.version
+
+    def record(self, op, before, after, trades, state, balances=None, background=False):
+        """Record a mutation of a single trade row
+
+        balances are the (trade_ids, balances) of the later rows whose stored
+        balance the mutation rewrote, replayed with the row by state_at. With
+        background=True the entry, and the checkpoint when one is due, are
+        written on the writer thread.
+        """
+        self.version += 1
+        trade = after if after is not None else before
+        self._append({
+            "version": self.version,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "op": op,
+            "trade_id": trade.trade_id if trade is not None else None,
+            "before": _encode_trade(before),
+            "after": _encode_trade(after),
+            "balances": [[int(trade_id), float(balance)] for trade_id, balance in zip(*balances)]
+                        if balances is not None else [],
+            "state": state,
+        }, background)
+        if self.version % self.checkpoint_every == 0:
+            self._save_checkpoint(trades, self.version, background)
+        return self.version
+
+    def starting_balance(self):
+        """Balance of the account before any trade was closed, None without history"""
+        self.wait()
+        if not self.exists():
+            return None
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            first = json.loads(vault.open_line(f.readline().rstrip("\n"), vault.key_for(self.name)))
+        # The first version is always a checkpoint (account created or imported)
+        trades = self._load_checkpoint(first["version"])
+        closed = pd.to_numeric(trades.loc[trades['status'] == 'CLOSED', 'closed_at'], errors='coerce')
+        return float(first["state"]["balance"]) - float(closed.sum())
+
+    def list_versions(self):
+        """Summary of every recorded version"""
+        return [{key: entry[key] for key in ("version", "timestamp", "op", "trade_id")}
+                for entry in self.read_journal()]
+
+    def state_at(self, version):
+        """Rebuild the trade store and profile state of a version"""
+        journal = self.read_journal()
+        if not 1 <= version <= len(journal):
+            raise ValueError(f"Unknown version {version} for {self.name}")
+        base = max(v for v in self._checkpoint_versions() if v <= version)
+        trades = TradeColumns.from_frame(self._load_checkpoint(base))
+        for entry in journal[base:version]:
+            before = _decode_trade(entry["before"])
+            after = _decode_trade(entry["after"])
+            if after is None and before is not None:
+                trades.remove(before.trade_id)
+            elif before is None and after is not None:
+                # Restored trades go back at their place, like TradingProfile.restore_trade
+                trades.insert(after)
+            elif after is not None:
+                trades.update(after)
+            # Balances of the later trades restamped by the mutation
+            stamped = [(row, balance) for row, balance in
+                       ((trades.row_of(trade_id), balance) for trade_id, balance in entry.get("balances", ()))
+                       if row is not None]
+            if stamped:
+                rows, balances = zip(*stamped)
+                trades.set_values('balance', list(rows), list(balances))
+        return trades, journal[version - 1]["state"]
+
+    def diff(self, old_version, new_version):
+        """Trades added, removed and changed between two versions"""
+        old, _ = self.state_at(old_version)
+        new, _ = self.state_at(new_version)
+        old_trades = {trade.trade_id: trade.to_dict() for trade in old}
+        new_trades = {trade.trade_id: trade.to_dict() for trade in new}
+        changed = {}
+        for trade_id in old_trades.keys() & new_trades.keys():
+            fields = {col: (old_trades[trade_id][col], new_trades[trade_id][col])
+                      for col in old_trades[trade_id]
+                      if old_trades[trade_id][col] != new_trades[trade_id][col]}
+            if fields:
+                changed[trade_id] = fields
+        return {
+            "added": sorted(new_trades.keys() - old_trades.keys()),
+            "removed": sorted(old_trades.keys() - new_trades.keys()),
+            "changed": changed,
+        }
@@ -0,0 +1,203 @@
+import os
+import json
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from PyQt5.QtGui import QImage
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice, pyqtSignal
+import vault
+
+IMAGE_POLICY_PATH = "./database/users/image_policy.json"
+EXTENSIONS = {"JPEG": ".jpg", "WEBP": ".webp", "PNG": ".png"}
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+class ImagePolicy:
+    """How trade screenshots are stored: maximum size, format and quality"""
+
+    def __init__(self, max_width=1920, max_height=1080, format="JPEG", quality=85,
+                 keep_original=False, original_dir="./assets/originals"):
+        if format not in EXTENSIONS:
+            raise ValueError(f"Unsupported image format {format}")
+        self.max_width = max_width
+        self.max_height = max_height
+        self.format = format
+        self.quality = quality
+        self.keep_original = keep_original
+        self.original_dir = original_dir
+
+    @property
+    def extension(self):
+        return EXTENSIONS[self.format]
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def load(cls, path=IMAGE_POLICY_PATH):
+        """Policy saved in path, or the default one"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except FileNotFoundError:
+            return cls()
+        except Exception as e:
+            print(f"Error loading image policy: {e}")
+            return cls()
+
+    def save(self, path=IMAGE_POLICY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def fit(self, image : QImage):
+        """Scale the image down to the maximum size, keeping its aspect ratio"""
+        if image.width() <= self.max_width and image.height() <= self.max_height:
+            return image
+        return image.scaled(self.max_width, self.max_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def _write_image(image : QImage, path, format, quality, encryption_key):
+    if encryption_key is None:
+        return image.save(path, format, quality)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, format, quality):
+        return False
+    vault.write_bytes(path, bytes(data), encryption_key)
+    return True
+
+
+def store_image(image : QImage, path, policy : ImagePolicy, format=None, encryption_key=None):
+    """Write an image following the policy, returns True on success
+
+    format overrides the policy format, used when recompressing files in place.
+    The file is encrypted when an account key is given. Safe to call outside
+    the GUI thread.
+    """
+    format = format or policy.format
+    if policy.keep_original:
+        os.makedirs(policy.original_dir, exist_ok=True)
+        name = os.path.splitext(os.path.basename(path))[0] + ".png"
+        _write_image(image, os.path.join(policy.original_dir, name), "PNG", -1, encryption_key)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    quality = -1 if format == "PNG" else policy.quality
+    return _write_image(policy.fit(image), path, format, quality, encryption_key)
+
+
+def load_image(path, encryption_key=None):
+    """QImage of a stored screenshot, decrypting it if needed (null if unreadable)"""
+    if not vault.is_encrypted(path):
+        return QImage(path)
+    try:
+        return QImage.fromData(vault.read_bytes(path, encryption_key))
+    except Exception as e:
+        print(f"Error reading image {path}: {e}")
+        return QImage()
+
+
+class _SaveSignals(QObject):
+    finished = pyqtSignal(object, str)  # key, path ("" when the save failed)
+
+
+class _SaveTask(QRunnable):
+    def __init__(self, image, path, policy, key, signals, encryption_key=None):
+        super().__init__()
+        self.image = image
+        self.path = path
+        self.policy = policy
+        self.key = key
+        self.signals = signals
+        self.encryption_key = encryption_key
+
+    def run(self):
+        try:
+            ok = store_image(self.image, self.path, self.policy, encryption_key=self.encryption_key)
+        except Exception as e:
+            print(f"Error saving image {self.path}: {e}")
+            ok = False
+        self.signals.finished.emit(self.key, self.path if ok else "")
+
+
+class ImageSaver(QObject):
+    """Encode and write screenshots on a background thread pool"""
+    finished = pyqtSignal(object, str)  # key, path ("" when the save failed)
+
+    def __init__(self, policy=None, parent=None):
+        super().__init__(parent)
+        self.policy = policy or ImagePolicy.load()
+        # Key of the account the screenshots belong to, None to write them in clear
+        self.encryption_key = None
+        self.pool = QThreadPool.globalInstance()
+        self.signals = _SaveSignals()
+        self.signals.finished.connect(self.finished.emit)
+
+    def path_for(self, base):
+        """File name of an image saved under base (path without extension)"""
+        return base + self.policy.extension
+
+    def save(self, image : QImage, base, key=None):
+        """Queue an image for writing, returns the path it will be written to"""
+        path = self.path_for(base)
+        self.pool.start(_SaveTask(image.copy(), path, self.policy, key, self.signals, self.encryption_key))
+        return path
+
+    def wait(self):
+        """Block until the queued images are written"""
+        self.pool.waitForDone()
+
+
+def _recompress_file(args):
+    path, policy_data = args
+    # The original is the file itself, copied as is below, not the decoded image
+    policy = ImagePolicy(**dict(policy_data, keep_original=False))
+    image = QImage(path)
+    if image.isNull():
+        return path, 0, 0
+    before = os.path.getsize(path)
+    # Keep the file's own format so references to it stay valid
+    suffix = os.path.splitext(path)[1].lower()
+    format = {".jpg": "JPEG", ".jpeg": "JPEG", ".webp": "WEBP"}.get(suffix, "PNG")
+    temp = path + ".tmp"
+    if not store_image(image, temp, policy, format=format):
+        return path, before, before
+    after = os.path.getsize(temp)
+    if after < before:
+        original = os.path.join(policy_data["original_dir"], os.path.basename(path))
+        if policy_data["keep_original"] and not os.path.exists(original):
+            os.makedirs(policy_data["original_dir"], exist_ok=True)
+            shutil.copyfile(path, original)
+        os.replace(temp, path)
+    else:
+        os.remove(temp)
+        after = before
+    return path, before, after
+
+
+def recompress_assets(folder="./assets", policy=None, workers=None):
+    """Apply the policy size and quality to existing screenshots, in parallel
+
+    Files keep their name and format. Returns the total bytes before and after.
+    """
+    policy = policy or ImagePolicy.load()
+    paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+             if name.lower().endswith(IMAGE_SUFFIXES)]
+    data = policy.to_dict()
+    total_before = total_after = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        for path, before, after in executor.map(_recompress_file, [(p, data) for p in paths], chunksize=8):
+            total_before += before
+            total_after += after
+    return total_before, total_after
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompress stored trade screenshots")
+    parser.add_argument("folder", nargs="?", default="./assets")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    before, after = recompress_assets(args.folder, workers=args.workers)
+    print(f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
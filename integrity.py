@@ -0,0 +1,273 @@
+import os
+import json
+import argparse
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from trade import COLUMNS, OPTIONAL_COLUMNS, TradeColumns
+from model import TradingProfile, PROFILE_PATH, file_signature, asset_prefix
+from history import AccountHistory
+from rollups import PnLRollups
+from archive import TradeArchive
+from fx import DEFAULT_CURRENCY, normalize_currency
+import vault
+
+DATABASE_DIR = "./database"
+ACCOUNTS_JSON = "./accounts.json"
+ASSETS_DIR = "./assets"
+PROFILE_COLUMNS = ['name', 'balance', 'winning_trades', 'losing_trades', 'average_winrate', 'currency']
+# Balances closer than this are considered equal
+TOLERANCE = 0.005
+
+
+class Issue:
+    """An inconsistency found in an account or in the registries"""
+    __slots__ = ('account', 'kind', 'detail', 'repaired')
+
+    def __init__(self, account, kind, detail, repaired=False):
+        self.account = account
+        self.kind = kind
+        self.detail = detail
+        self.repaired = repaired
+
+    def __repr__(self):
+        suffix = " (repaired)" if self.repaired else ""
+        return f"[{self.account}] {self.kind}: {self.detail}{suffix}"
+
+
+def _workbook_path(name):
+    return os.path.join(DATABASE_DIR, f"{name}.xlsx")
+
+
+def _fix_trade_ids(df, issues, name, repair):
+    """Report invalid and duplicated trade ids, giving them new ids when repairing"""
+    ids = pd.to_numeric(df['trade_id'], errors='coerce')
+    invalid = ids.isna() | (ids != ids.round())
+    duplicated = ids.duplicated(keep='first') & ~invalid
+    if invalid.any():
+        issues.append(Issue(name, "invalid_trade_id", f"{int(invalid.sum())} rows without a valid trade_id", repair))
+    if duplicated.any():
+        values = sorted(set(ids[duplicated].astype(int)))
+        issues.append(Issue(name, "duplicate_trade_id", f"trade_id {values} used more than once", repair))
+    bad = invalid | duplicated
+    if repair and bad.any():
+        start = int(ids[~invalid].max()) + 1 if (~invalid).any() else 1
+        ids = ids.copy()
+        ids[bad] = np.arange(start, start + int(bad.sum()))
+        df = df.assign(trade_id=ids.astype(np.int64))
+    elif bad.any():
+        df = df[~bad]
+    return df, bool(repair and bad.any())
+
+
+def check_account(name, profile_row=None, repair=False):
+    """Check one account, repairing its derived data when asked
+
+    Runs in a worker process. Returns (issues, profile counters derived from
+    the trades, image paths referenced by the trades). The image paths are
+    None when the trades could not be read.
+    """
+    issues = []
+    path = _workbook_path(name)
+    if not os.path.exists(path):
+        issues.append(Issue(name, "missing_workbook", f"{path} does not exist"))
+        return issues, None, None
+    if vault.is_encrypted(path):
+        # Workers have no access to the unlocked keys
+        issues.append(Issue(name, "encrypted", "workbook is encrypted, not checked"))
+        return issues, None, None
+    try:
+        df = pd.read_excel(path)
+    except Exception as e:
+        issues.append(Issue(name, "unreadable_workbook", str(e)))
+        return issues, None, None
+
+    missing = [col for col in COLUMNS if col not in df.columns and col not in OPTIONAL_COLUMNS]
+    if missing:
+        issues.append(Issue(name, "missing_columns", ", ".join(missing), repair))
+    if 'trade_id' not in df.columns:
+        df['trade_id'] = np.arange(1, len(df) + 1)
+    df, changed = _fix_trade_ids(df, issues, name, repair)
+    changed = changed or bool(missing and repair)
+    trades = TradeColumns.from_frame(df)
+
+    status = trades.column('status')
+    closed_at = trades.column('closed_at')
+    closed = status == 'CLOSED'
+    invalid_status = ~closed & (status != 'OPEN')
+    if invalid_status.any():
+        issues.append(Issue(name, "invalid_status", f"{int(invalid_status.sum())} trades", repair))
+    unresolved = closed & np.isnan(closed_at)
+    if unresolved.any():
+        ids = trades.column('trade_id')[unresolved].tolist()
+        issues.append(Issue(name, "closed_without_result", f"trade_id {ids}"))
+    open_with_result = (status == 'OPEN') & ~np.isnan(closed_at)
+    if open_with_result.any():
+        ids = trades.column('trade_id')[open_with_result].tolist()
+        issues.append(Issue(name, "open_with_result", f"trade_id {ids}"))
+
+    # Screenshots that were moved or deleted
+    referenced = set()
+    for trade in trades:
+        fixes = {}
+        if invalid_status[trades.row_of(trade.trade_id)]:
+            fixes['status'] = 'OPEN' if trade.closed_at is None else 'CLOSED'
+        for zone in ('before', 'after'):
+            image = getattr(trade, zone)
+            if image is None:
+                continue
+            if os.path.exists(image):
+                referenced.add(os.path.normpath(image))
+            else:
+                issues.append(Issue(name, "missing_image", f"trade {trade.trade_id} {zone}: {image}", repair))
+                fixes[zone] = None
+        if repair and fixes:
+            trades.update(trade.copy(**fixes))
+            changed = True
+
+    # Counters and balance derived from the trades and the archive totals
+    archive = TradeArchive(name)
+    archive.load()
+    both = [trade_id for trade_id in trades.column('trade_id').tolist() if trade_id in archive]
+    if both:
+        issues.append(Issue(name, "archived_in_workbook", f"trade_id {both} also in the archive"))
+    wins, losses = trades.win_loss()
+    wins += archive.totals['wins']
+    losses += archive.totals['losses']
+    pnl = float(np.nansum(trades.column('closed_at')[trades.column('status') == 'CLOSED'])) + archive.totals['pnl']
+    history = AccountHistory(name)
+    start = history.starting_balance()
+    if start is None:
+        # Without history the registry balance is the only reference
+        start = float(profile_row['balance']) - pnl if profile_row else TradingProfile().balance
+    derived = {
+        'balance': start + pnl,
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'average_winrate': wins / (wins + losses) * 100 if wins + losses else 0.0,
+    }
+
+    if profile_row is None:
+        issues.append(Issue(name, "missing_profile", "workbook has no row in the profile registry", repair))
+    else:
+        if abs(float(profile_row['balance']) - derived['balance']) > TOLERANCE:
+            issues.append(Issue(name, "balance", f"registry has {profile_row['balance']}, "
+                                                 f"trades give {derived['balance']:.2f}", repair))
+        if (int(profile_row['winning_trades']), int(profile_row['losing_trades'])) != (wins, losses):
+            issues.append(Issue(name, "counters", f"registry has {profile_row['winning_trades']}/"
+                                                  f"{profile_row['losing_trades']}, trades give {wins}/{losses}",
+                                repair))
+        elif abs(float(profile_row['average_winrate']) - derived['average_winrate']) > TOLERANCE:
+            issues.append(Issue(name, "winrate", f"registry has {profile_row['average_winrate']}", repair))
+
+    signature = file_signature(path)
+    rollups = PnLRollups()
+    rollups_path = os.path.join(DATABASE_DIR, f"{name}.rollups.json")
+    stale_rollups = not rollups.load(rollups_path, signature)
+    if stale_rollups:
+        issues.append(Issue(name, "stale_rollups", "P&L rollups do not match the workbook", repair))
+
+    if repair and (changed or stale_rollups):
+        if changed:
+            trades.to_frame().to_excel(path, index=False)
+            signature = file_signature(path)
+            # Keep the repaired store restorable like any other change
+            state = dict(derived, current_trade_id=max(trades.next_trade_id(), archive.next_trade_id()))
+            history.write_checkpoint(trades, state, op="repair")
+        rollups.rebuild(trades)
+        rollups.merge(archive.rollups.buckets)
+        rollups.save(rollups_path, signature)
+    return issues, derived, referenced
+
+
+def _read_registry():
+    if not os.path.exists(PROFILE_PATH):
+        return pd.DataFrame(columns=PROFILE_COLUMNS)
+    return pd.read_excel(PROFILE_PATH)
+
+
+def _read_accounts_json():
+    if not os.path.exists(ACCOUNTS_JSON):
+        return None
+    with open(ACCOUNTS_JSON, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def scan(repair=False, workers=None):
+    """Check every account and the registries, in parallel
+
+    With repair=True the derived data (balance, counters, winrate, P&L
+    rollups, broken screenshot paths and duplicated trade ids) is rebuilt
+    from the trades in one pass, and the registries are rewritten once.
+    Returns the list of issues found.
+    """
+    issues = []
+    registry = _read_registry()
+    registry = registry.astype({col: float for col in ('balance', 'average_winrate') if col in registry.columns})
+    if 'currency' not in registry.columns:
+        registry['currency'] = DEFAULT_CURRENCY
+    registry['currency'] = registry['currency'].map(normalize_currency)
+    duplicated = registry['name'].duplicated(keep='first')
+    for name in registry.loc[duplicated, 'name']:
+        issues.append(Issue(name, "duplicate_profile", "account listed more than once in the registry", repair))
+    if repair:
+        registry = registry[~duplicated].reset_index(drop=True)
+    rows = {row['name']: row for row in registry.to_dict('records')}
+
+    names = list(rows)
+    if os.path.exists(DATABASE_DIR):
+        names += sorted(filename[:-len(".xlsx")] for filename in os.listdir(DATABASE_DIR)
+                        if filename.endswith(".xlsx") and filename[:-len(".xlsx")] not in rows)
+
+    referenced = set()
+    unchecked = []
+    derived = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = executor.map(check_account, names, [rows.get(name) for name in names], repeat(repair))
+        for name, (account_issues, counters, images) in zip(names, results):
+            issues.extend(account_issues)
+            if images is None:
+                unchecked.append(name)
+            else:
+                referenced |= images
+            if counters is not None:
+                derived[name] = counters
+
+    # Screenshots named after an account whose trades were not read may still be in use
+    unchecked_prefixes = tuple(f"{asset_prefix(name)}_" for name in unchecked)
+    if os.path.exists(ASSETS_DIR):
+        for filename in sorted(os.listdir(ASSETS_DIR)):
+            path = os.path.normpath(os.path.join(ASSETS_DIR, filename))
+            if os.path.isfile(path) and path not in referenced and not filename.startswith(unchecked_prefixes):
+                issues.append(Issue(None, "orphan_asset", path))
+
+    accounts = _read_accounts_json()
+    if accounts is not None:
+        listed = {account.get("name") for account in accounts}
+        for name in sorted(listed - set(rows)):
+            issues.append(Issue(name, "accounts_json", "listed in accounts.json but not in the registry", repair))
+        for name in sorted(set(rows) - listed):
+            issues.append(Issue(name, "accounts_json", "missing from accounts.json", repair))
+
+    if repair:
+        for name, counters in derived.items():
+            rows[name] = dict(rows.get(name, {'currency': DEFAULT_CURRENCY}), name=name, **counters)
+        registry = pd.DataFrame(list(rows.values()), columns=PROFILE_COLUMNS)
+        registry.to_excel(PROFILE_PATH, index=False)
+        if accounts is not None:
+            with open(ACCOUNTS_JSON, "w", encoding="utf-8") as f:
+                json.dump([{"name": row['name'], "balance": float(row['balance'])} for row in rows.values()],
+                          f, indent=4)
+    return issues
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check accounts, registries and screenshots for inconsistencies")
+    parser.add_argument("--repair", action="store_true", help="rebuild derived data from the trades")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    found = scan(repair=args.repair, workers=args.workers)
+    for issue in found:
+        print(issue)
+    print(f"{len(found)} issues found")
@@ -0,0 +1,164 @@
+import numpy as np
+
+# Sort key of trades without a close date, after every dated one
+NO_DATE = np.iinfo(np.int64).max
+
+
+def close_key(date):
+    """Integer sort key of a close date (datetime or datetime64 array), NO_DATE when missing"""
+    dates = np.asarray(date, dtype='datetime64[us]')
+    keys = dates.astype(np.int64)
+    return np.where(np.isnat(dates), NO_DATE, keys)
+
+
+class BalanceLedger:
+    """Account balance as a prefix sum of closed trade P&L in close order
+
+    Closed trades own the slots of a Fenwick tree in close time order. A
+    close later than every other is appended at the tail; editing,
+    reopening or deleting a closed trade is a point update of its slot, and
+    the balance after any trade is a prefix query, all O(log n). A reopened
+    or deleted trade leaves an empty slot. A trade closed before the last
+    one (e.g. an undone reopen) is inserted at its close time position,
+    which refills the tree in O(n) and drops the empty slots. Slots changed
+    since the last stamps() call are tracked so only the balances from the
+    edit point onward are rewritten.
+    """
+
+    def __init__(self, start=0.0):
+        self.start = float(start)
+        self.reset()
+
+    def reset(self):
+        self.tree = np.zeros(17)  # 1-based Fenwick array over the capacity
+        self.amounts = np.zeros(16)
+        self.slot_ids = np.full(16, -1, dtype=np.int64)  # trade_id of each slot, -1 if empty
+        self.slot_keys = np.zeros(16, dtype=np.int64)  # close_key of each slot
+        self.slots = {}  # trade_id -> slot, closed trades only
+        self.size = 0
+        self.total = 0.0
+        self.dirty_from = None
+
+    @property
+    def balance(self):
+        return self.start + self.total
+
+    def rebuild(self, trades, balance):
+        """Rebuild from a TradeColumns store whose account balance is `balance`"""
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(trades.column('closed_at'))
+        ids = trades.column('trade_id')[closed]
+        keys = close_key(trades.close_dates()[closed])
+        order = np.lexsort((ids, keys))
+        amounts = trades.column('closed_at')[closed][order]
+        self.reset()
+        self._build(amounts, ids[order], keys[order], max(len(amounts) * 2, 16))
+        self.total = float(amounts.sum())
+        self.start = float(balance) - self.total
+        self.dirty_from = None
+
+    def _build(self, amounts, ids, keys, capacity):
+        """Fill the tree in O(n) from prefix sums: node i covers (i - lowbit(i), i]"""
+        n = len(amounts)
+        self.amounts = np.zeros(capacity)
+        self.amounts[:n] = amounts
+        self.slot_ids = np.full(capacity, -1, dtype=np.int64)
+        self.slot_ids[:n] = ids
+        self.slot_keys = np.zeros(capacity, dtype=np.int64)
+        self.slot_keys[:n] = keys
+        prefix = np.concatenate(([0.0], np.cumsum(self.amounts)))
+        index = np.arange(1, capacity + 1)
+        self.tree = np.zeros(capacity + 1)
+        self.tree[1:] = prefix[index] - prefix[index - (index & -index)]
+        self.size = n
+        self.slots = {int(t): slot for slot, t in enumerate(ids) if t >= 0}
+
+    def _add(self, slot, delta):
+        self.amounts[slot] += delta
+        self.total += delta
+        i = slot + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+        self._touch(slot)
+
+    def _touch(self, slot):
+        if self.dirty_from is None or slot < self.dirty_from:
+            self.dirty_from = slot
+
+    def prefix(self, slot):
+        """Sum of the P&L of slots 0..slot"""
+        total = 0.0
+        i = slot + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def balance_after(self, trade_id):
+        """Account balance right after a closed trade, None if it is not closed"""
+        slot = self.slots.get(int(trade_id))
+        return None if slot is None else self.start + self.prefix(slot)
+
+    def _close(self, trade_id, amount, key):
+        last = self.size - 1
+        if self.size and (key, trade_id) < (self.slot_keys[last], self.slot_ids[last]):
+            self._insert(trade_id, amount, key)
+            return
+        if self.size == len(self.amounts):
+            # Amortized O(1): double the capacity and refill the tree
+            self._build(self.amounts[:self.size], self.slot_ids[:self.size], self.slot_keys[:self.size],
+                        self.size * 2)
+        slot = self.size
+        self.size += 1
+        self.slot_ids[slot] = trade_id
+        self.slot_keys[slot] = key
+        self.slots[trade_id] = slot
+        self._add(slot, amount)
+
+    def _insert(self, trade_id, amount, key):
+        """Close a trade before the last one: refill the tree with it at its place, without the empty slots"""
+        live = self.slot_ids[:self.size] >= 0
+        ids = self.slot_ids[:self.size][live]
+        keys = self.slot_keys[:self.size][live]
+        amounts = self.amounts[:self.size][live]
+        slot = int(np.searchsorted(keys, key, side='left'))
+        slot += int(np.searchsorted(ids[slot:np.searchsorted(keys, key, side='right')], trade_id))
+        # Slots before the earlier edit point keep their balances
+        dirty = slot if self.dirty_from is None else min(slot, int(live[:self.dirty_from].sum()))
+        self._build(np.insert(amounts, slot, amount), np.insert(ids, slot, trade_id), np.insert(keys, slot, key),
+                    max(len(amounts) * 2, 16))
+        self.total += amount
+        self.dirty_from = dirty
+
+    def _release(self, trade_id):
+        slot = self.slots.pop(trade_id)
+        self.slot_ids[slot] = -1
+        self._add(slot, -self.amounts[slot])
+
+    def apply(self, before, after):
+        """Account for a trade going from `before` to `after` (either may be None)"""
+        was_closed = before is not None and before.status == 'CLOSED' and before.closed_at is not None
+        is_closed = after is not None and after.status == 'CLOSED' and after.closed_at is not None
+        if was_closed and is_closed and close_key(before.close_date) == close_key(after.close_date):
+            if after.closed_at != before.closed_at:
+                self._add(self.slots[before.trade_id], after.closed_at - before.closed_at)
+            return
+        if was_closed:
+            self._release(before.trade_id)
+        if is_closed:
+            self._close(after.trade_id, after.closed_at, int(close_key(after.close_date)))
+
+    def stamps(self):
+        """Trade ids and balances of the closed trades from the edit point onward
+
+        Clears the edit point. Returns two empty arrays when nothing changed.
+        """
+        if self.dirty_from is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        start = self.dirty_from
+        self.dirty_from = None
+        before = self.prefix(start - 1) if start > 0 else 0.0
+        balances = self.start + before + np.cumsum(self.amounts[start:self.size])
+        ids = self.slot_ids[start:self.size]
+        live = ids >= 0
+        return ids[live], balances[live]
@@ -1,22 +1,27 @@
 from PyQt5.QtWidgets import (QWidget, QPushButton, QListWidget, QListWidgetItem, 
                             QLabel, QVBoxLayout, QHBoxLayout, QDialog, QLineEdit,
-                            QMessageBox, QFrame, QApplication)
+                            QMessageBox, QFrame, QApplication, QInputDialog)
 from PyQt5.QtCore import Qt, pyqtSignal, QSize, QEvent
 from PyQt5.QtGui import QFont, QColor
 from PyQt5 import uic
 import json
 import pandas as pd
 from model import TradingProfile
+from registry import AccountRegistry, check_name
+import vault
+from fx import FXRates, DEFAULT_CURRENCY, normalize_currency, format_amount, portfolio_summary
 import os
 
 class AccountItem(QWidget):
     """Custom widget for account items in the list widget"""
     deleteClicked = pyqtSignal(QWidget)
+    renameClicked = pyqtSignal(QWidget)
     
-    def __init__(self, account_name, balance, parent_item=None):
+    def __init__(self, account_name, balance, parent_item=None, currency=DEFAULT_CURRENCY):
         super().__init__()
         self.account_name = account_name
         self.balance = balance
+        self.currency = normalize_currency(currency)
         self.parent_item = parent_item
         
         # Main layout
@@ -35,7 +40,7 @@ class AccountItem(QWidget):
         info_layout.addWidget(self.name_label)
         
         # Account balance
-        self.balance_label = QLabel(f"Balance: ${balance:.2f}")
+        self.balance_label = QLabel(f"Balance: {format_amount(balance, self.currency)}")
         self.balance_label.setFont(QFont("Arial", 10))
         self.balance_label.setStyleSheet("background-color: none;color : black")
         info_layout.addWidget(self.balance_label)
@@ -59,6 +64,25 @@ class AccountItem(QWidget):
         """)
         self.delete_button.setVisible(False)
         self.delete_button.clicked.connect(self.on_delete_clicked)
+
+        # Rename button, shown with the delete button
+        self.rename_button = QPushButton("✎")
+        self.rename_button.setFixedSize(30, 30)
+        self.rename_button.setStyleSheet("""
+            QPushButton {
+                background-color: #007ACC;
+                color: white;
+                border-radius: 15px;
+                font-weight: bold;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #1C97EA;
+            }
+        """)
+        self.rename_button.setVisible(False)
+        self.rename_button.clicked.connect(self.on_rename_clicked)
+        layout.addWidget(self.rename_button, 0)
         layout.addWidget(self.delete_button, 0)  # Stretch factor 0
         
         # Apply styling
@@ -73,11 +97,13 @@ class AccountItem(QWidget):
     def enterEvent(self, event):
         """Show delete button when mouse enters widget"""
         self.delete_button.setVisible(True)
+        self.rename_button.setVisible(True)
         super().enterEvent(event)
         
     def leaveEvent(self, event):
         """Hide delete button when mouse leaves widget"""
         self.delete_button.setVisible(False)
+        self.rename_button.setVisible(False)
         super().leaveEvent(event)
         
     def on_delete_clicked(self):
@@ -85,12 +111,17 @@ class AccountItem(QWidget):
         if self.parent_item:
             self.deleteClicked.emit(self)
 
+    def on_rename_clicked(self):
+        if self.parent_item:
+            self.renameClicked.emit(self)
+
 
 class CreateAccountDialog(QDialog):
     """Dialog for creating a new account"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, registry=None):
         super().__init__(parent)
+        self.registry = registry if registry is not None else AccountRegistry()
         self.setWindowTitle("Create New Account")
         self.setMinimumWidth(300)
         self.setup_ui()
@@ -103,7 +134,7 @@ class CreateAccountDialog(QDialog):
         layout.addWidget(QLabel("Account Name:"))
         self.name_input = QLineEdit()
         self.name_input.setPlaceholderText("Enter account name")
-        self.name_input.setText(f"Account {self.generate_default_name()}")
+        self.name_input.setText(self.registry.default_name())
         layout.addWidget(self.name_input)
         
         # Starting balance input
@@ -112,6 +143,22 @@ class CreateAccountDialog(QDialog):
         self.balance_input.setPlaceholderText("Enter starting balance")
         self.balance_input.setText("1000.00")
         layout.addWidget(self.balance_input)
+
+        # Currency the balance and trades of the account are in
+        layout.addWidget(QLabel("Currency:"))
+        self.currency_input = QLineEdit()
+        self.currency_input.setPlaceholderText("ISO code, e.g. USD")
+        self.currency_input.setText(DEFAULT_CURRENCY)
+        self.currency_input.setMaxLength(3)
+        layout.addWidget(self.currency_input)
+
+        # Encryption at rest, only offered when the cryptography package is installed
+        self.passphrase_input = QLineEdit()
+        self.passphrase_input.setEchoMode(QLineEdit.Password)
+        self.passphrase_input.setPlaceholderText("Leave empty to store the account unencrypted")
+        if vault.available():
+            layout.addWidget(QLabel("Passphrase (optional):"))
+            layout.addWidget(self.passphrase_input)
         
         # Buttons
         button_layout = QHBoxLayout()
@@ -165,11 +212,6 @@ class CreateAccountDialog(QDialog):
             }
         """)
     
-    def generate_default_name(self):
-        """Generate a default account name"""
-        import random
-        return random.randint(1000, 9999)
-    
     def validate_and_accept(self):
         """Validate inputs before accepting"""
         name = self.name_input.text().strip()
@@ -178,6 +220,11 @@ class CreateAccountDialog(QDialog):
         if not name:
             QMessageBox.warning(self, "Input Error", "Please enter an account name")
             return
+        try:
+            check_name(name)
+        except ValueError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
+            return
         
         try:
             balance = float(balance_text)
@@ -186,6 +233,11 @@ class CreateAccountDialog(QDialog):
         except ValueError:
             QMessageBox.warning(self, "Input Error", "Please enter a valid positive number for balance")
             return
+
+        currency = normalize_currency(self.currency_input.text())
+        if len(currency) != 3 or not currency.isalpha():
+            QMessageBox.warning(self, "Input Error", "Please enter a 3 letter currency code")
+            return
         
         self.accept()
     
@@ -193,7 +245,9 @@ class CreateAccountDialog(QDialog):
         """Return account name and balance"""
         return {
             "name": self.name_input.text().strip(),
-            "balance": float(self.balance_input.text().strip())
+            "balance": float(self.balance_input.text().strip()),
+            "currency": normalize_currency(self.currency_input.text()),
+            "passphrase": self.passphrase_input.text()
         }
 
 
@@ -203,10 +257,16 @@ class LoginWidget(QWidget):
     
     loginSuccessful = pyqtSignal(dict)  # Signal with account data
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, sessions=None):
         super().__init__(parent)
         self.accounts_file = "./database/users/profile.xlsx"
         self.accounts: pd.DataFrame
+        # Index of the account names, kept in step with the registry file
+        self.registry = AccountRegistry()
+        # Sessions of the open accounts, dropped when an account is renamed or deleted
+        self.sessions = sessions
+        # Rates used to show the total of accounts in different currencies
+        self.rates = FXRates.load()
         uic.loadUi("ui/login.ui", self)
         self.init_ui()
         self.load_accounts()
@@ -221,6 +281,9 @@ class LoginWidget(QWidget):
         # Buttons
         self.login_button = self.findChild(QPushButton, "login_button")
         self.create_account_button = self.findChild(QPushButton, "create_account_button")
+        # Total of every account in the default currency
+        self.portfolio_label = QLabel()
+        self.layout().insertWidget(self.layout().indexOf(self.accounts_list) + 1, self.portfolio_label)
                 
         # Initialize the controls
         self.init_controls()
@@ -315,14 +378,33 @@ class LoginWidget(QWidget):
             self.accounts = pd.read_excel(self.accounts_file)
             for index, row in self.accounts.iterrows():
                 self.add_account_to_list(row)
+        self.registry = AccountRegistry(self.accounts["name"].astype(str) if "name" in self.accounts.columns else ())
+        self.update_portfolio_total()
+
+    def update_portfolio_total(self):
+        """Show the balance of all accounts converted to the default currency"""
+        if self.accounts.empty:
+            self.portfolio_label.setText("")
+            return
+        currencies = self.accounts['currency'] if 'currency' in self.accounts.columns else [None] * len(self.accounts)
+        try:
+            summary = portfolio_summary([(currency, balance, None) for currency, balance
+                                         in zip(currencies, self.accounts['balance'])],
+                                        DEFAULT_CURRENCY, self.rates)
+        except KeyError as e:
+            # No rates for one of the currencies
+            self.portfolio_label.setText(f"Total unavailable: {e.args[0]}")
+            return
+        self.portfolio_label.setText(f"Total: {format_amount(summary['balance'], DEFAULT_CURRENCY)}")
     
     def add_account_to_list(self, account):
         """Add a single account to the list widget"""
         item = QListWidgetItem()
-        account_widget = AccountItem(account["name"], account["balance"], item)
+        account_widget = AccountItem(account["name"], account["balance"], item, account.get("currency"))
         
-        # Connect delete signal
+        # Connect delete and rename signals
         account_widget.deleteClicked.connect(self.delete_account)
+        account_widget.renameClicked.connect(self.rename_account)
         
         # Set size hint for proper display
         item.setSizeHint(QSize(self.accounts_list.width(), 70))
@@ -337,32 +419,24 @@ class LoginWidget(QWidget):
     
     def show_create_account_dialog(self):
         """Show dialog for creating a new account"""
-        dialog = CreateAccountDialog(self)
+        dialog = CreateAccountDialog(self, self.registry)
         if dialog.exec_() == QDialog.Accepted:
             account_data = dialog.get_account_data()
         else:
             return
             
-        name: str = account_data["name"]
+        # Un nom déjà pris reçoit le prochain suffixe libre (name_N)
+        name: str = self.registry.unique_name(account_data["name"])
         balance = account_data["balance"]
-
-        import re
-
-        if not self.accounts.empty:
-            # Vérifier si le nom existe déjà
-            pattern = f"^{re.escape(name)}(\_[0-9]+)?$"
-            if self.accounts["name"].str.contains(pattern, regex=True).any():
-                # Extraire les noms existants similaires
-                existing_names = self.accounts["name"][self.accounts["name"].str.startswith(name)]
-                suffixes = [int(re.search(r"_(\d+)$", n).group(1)) for n in existing_names if re.search(r"_(\d+)$", n)]
-                
-                # Déterminer le prochain suffixe disponible
-                next_suffix = max(suffixes) + 1 if suffixes else 1
-                name = f"{name}_{next_suffix}"
         # Add new account to list
         profile = TradingProfile()
         profile.balance = balance
+        profile.currency = account_data["currency"]
+        if account_data["passphrase"]:
+            # The key must exist before the first file of the account is written
+            vault.protect(name, account_data["passphrase"])
         profile.create_account(name)
+        self.registry.add(name)
 
 
         self.populate_accounts_list()        
@@ -380,9 +454,50 @@ class LoginWidget(QWidget):
             selected_row = self.accounts.loc[self.accounts["name"] == account_name]
 
             if not selected_row.empty:
+                if not self.unlock_account(account_name):
+                    return
                 account_data = selected_row.iloc[0].to_dict()  # Convertir la première ligne en dictionnaire
                 self.loginSuccessful.emit(account_data)
+
+    def unlock_account(self, account_name):
+        """Ask the passphrase of an encrypted account, True once its key is available"""
+        if not vault.is_protected(account_name) or vault.key_for(account_name) is not None:
+            return True
+        if not vault.available():
+            QMessageBox.warning(self, "Error", f"{account_name} is encrypted, install the cryptography package to open it")
+            return False
+        passphrase, ok = QInputDialog.getText(self, "Unlock account", f"Passphrase of {account_name}:",
+                                              QLineEdit.Password)
+        if not ok:
+            return False
+        if vault.unlock(account_name, passphrase) is None:
+            QMessageBox.warning(self, "Error", "Wrong passphrase")
+            return False
+        return True
     
+    def rename_account(self, AccountItem: AccountItem):
+        """Rename an account and move its files"""
+        account_name = AccountItem.account_name
+        if self.sessions is not None and not self.sessions.discard(account_name):
+            QMessageBox.warning(self, "Error", f"Close the tabs of {account_name} before renaming it")
+            return
+        new_name, ok = QInputDialog.getText(self, "Rename account", "New name:", QLineEdit.Normal, account_name)
+        new_name = new_name.strip()
+        if not ok or new_name == account_name:
+            return
+        passphrase = None
+        if vault.is_protected(account_name):
+            passphrase, ok = QInputDialog.getText(self, "Rename account", f"Passphrase of {account_name}:",
+                                                  QLineEdit.Password)
+            if not ok:
+                return
+        try:
+            if not self.registry.rename(account_name, new_name, passphrase):
+                QMessageBox.warning(self, "Error", f"Could not rename {account_name}")
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
+        self.populate_accounts_list()
+
     def delete_account(self, AccountItem: AccountItem):
         """Delete an account from the list"""
         account_name = AccountItem.account_name
@@ -401,11 +516,16 @@ class LoginWidget(QWidget):
         if reply == QMessageBox.Yes:
             # Remove from list and data
             self.accounts_list.takeItem(row)
-            if account_name in self.accounts["name"].values:
+            if account_name in self.registry:
+                if self.sessions is not None and not self.sessions.discard(account_name):
+                    QMessageBox.warning(self, "Error", f"Close the tabs of {account_name} before deleting it")
+                    self.populate_accounts_list()
+                    return
                 profile = TradingProfile()
                 profile.load_account(account_name)
                 profile.delete_account()
                 self.accounts = self.accounts[self.accounts["name"] != account_name]
+                self.registry.remove(account_name)
 
                 self.populate_accounts_list()  # Rafraîchir la liste
             
@@ -1,64 +1,125 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QStackedWidget, QWidget,QGridLayout
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QStackedWidget, QWidget,QGridLayout, QTabWidget, QShortcut
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import QTimer
 from PyQt5 import uic
-from model import TradingProfile
 from controller import TradingController
 from ui import TradingUI
 from login import LoginWidget
+from session import sessions as shared_sessions
+from memory import governor
 
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, sessions=None):
         super().__init__()
         uic.loadUi("ui/main_window.ui", self)
-        
+
         layout = QVBoxLayout()
         self.centralWidget().setLayout(layout)
         # create a layout for the central widget
         self.stacked = QStackedWidget()
-        
-        # Create model, view, and controller
-        self.profile_model = TradingProfile()
+
+        # Accounts are shared with the other windows of the application
+        self.sessions = sessions if sessions is not None else shared_sessions
+        self.controllers = {}
+        self.windows = []
 
         widget_login = QWidget()
         lay2 = QGridLayout()
         widget_login.setLayout(lay2)
         widget_login.layout().setContentsMargins(0, 0, 0, 0)
         self.stacked.addWidget(widget_login)
-        self.login_ui = LoginWidget(widget_login)
+        self.login_ui = LoginWidget(widget_login, self.sessions)
         self.login_ui.loginSuccessful.connect(lambda account : self.setup_account(account["name"]))
 
         lay2.addWidget(self.login_ui)
 
-        widget_trade = QWidget()
-        widget_trade.setStyleSheet("background-color: #f0f0f0;")  # Bleu
-        lay1 = QVBoxLayout()
-        widget_trade.setLayout(lay1)
-        widget_trade.layout().setContentsMargins(0, 0, 0, 0)
-        self.stacked.addWidget(widget_trade)
-        self.trading_ui = TradingUI(widget_trade)
-        lay1.addWidget(self.trading_ui)
-        
+        # One tab per opened account
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
+        self.stacked.addWidget(self.tabs)
+
         self.stacked.setCurrentIndex(0)
 
-        self.controller = TradingController(self.profile_model, self.trading_ui)
-        self.controller.return_signal.connect(self.init_ui)
-        
         # Add UI to main window
         self.centralWidget().layout().addWidget(self.stacked)
 
+        # Ctrl+N opens another window on the same accounts
+        new_window = QShortcut(QKeySequence.New, self)
+        new_window.activated.connect(self.open_window)
+
+        # Rows and screenshots held in memory, against the governor budget
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.show_memory_usage)
+        self.memory_timer.start(2000)
+        self.show_memory_usage()
+
+    @property
+    def controller(self):
+        """Controller of the current tab"""
+        return self.controllers.get(self.tabs.currentWidget())
+
+    @property
+    def trading_ui(self):
+        controller = self.controller
+        return controller.ui if controller is not None else None
+
+    @property
+    def profile_model(self):
+        controller = self.controller
+        return controller.profile if controller is not None else None
+
     def init_ui(self):
         self.stacked.setCurrentIndex(0)
 
+    def show_memory_usage(self):
+        self.statusBar().showMessage(governor.summary())
+
     def setup_account(self,acount_name):
-        self.controller.setup_account(acount_name)
+        widget_trade = QWidget()
+        widget_trade.setStyleSheet("background-color: #f0f0f0;")  # Bleu
+        lay1 = QVBoxLayout()
+        widget_trade.setLayout(lay1)
+        widget_trade.layout().setContentsMargins(0, 0, 0, 0)
+        trading_ui = TradingUI(widget_trade)
+        lay1.addWidget(trading_ui)
+
+        controller = TradingController(self.sessions, trading_ui)
+        if not controller.setup_account(acount_name):
+            widget_trade.deleteLater()
+            return
+        controller.return_signal.connect(self.init_ui)
+        self.controllers[widget_trade] = controller
+        self.tabs.setCurrentIndex(self.tabs.addTab(widget_trade, acount_name))
         self.stacked.setCurrentIndex(1)
-    
+
+    def close_tab(self, index):
+        widget = self.tabs.widget(index)
+        controller = self.controllers.pop(widget, None)
+        if controller is not None:
+            controller.close()
+        self.tabs.removeTab(index)
+        widget.deleteLater()
+        if self.tabs.count() == 0:
+            self.init_ui()
+
+    def open_window(self):
+        window = MainWindow(self.sessions)
+        self.windows.append(window)
+        window.show()
+
+    def closeEvent(self, event):
+        while self.tabs.count():
+            self.close_tab(0)
+        super().closeEvent(event)
+
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
@@ -0,0 +1,100 @@
+import os
+import json
+from collections import OrderedDict
+
+MEMORY_POLICY_PATH = "./database/users/memory.json"
+DEFAULT_BUDGET_MB = 128
+# Measured size of one trade list row widget (CustomListElement and its labels)
+ROW_WIDGET_BYTES = 48 * 1024
+
+
+class MemoryGovernor:
+    """Budget for the trade list rows and screenshots kept in memory
+
+    Views register what they keep resident as entries keyed (kind, owner,
+    name) with an estimated cost in bytes and a release callback. Entries
+    are kept in least recently used order; when the total goes over the
+    budget the oldest ones are released first. A release callback returns
+    False when its entry is in view and cannot be dropped now, the entry is
+    then kept and counted as recently used.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()  # key -> (cost, release)
+        self.used = 0
+        self.evictions = 0
+
+    @classmethod
+    def load(cls, path=MEMORY_POLICY_PATH):
+        """Governor with the budget saved in path, or the default one"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except FileNotFoundError:
+            return cls()
+        except Exception as e:
+            print(f"Error loading memory policy: {e}")
+            return cls()
+
+    def save(self, path=MEMORY_POLICY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"budget_mb": self.budget / (1024 * 1024)}, f, indent=4)
+
+    def add(self, key, cost, release):
+        """Register (or resize) an entry as the most recently used, then enforce the budget"""
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.used -= previous[0]
+        self.entries[key] = (cost, release)
+        self.used += cost
+        self.enforce()
+
+    def touch(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+
+    def discard(self, key):
+        """Forget an entry released by its owner"""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used -= entry[0]
+
+    def discard_owner(self, owner):
+        """Forget every entry of an owner going away"""
+        for key in [key for key in self.entries if key[1] == owner]:
+            self.discard(key)
+
+    def enforce(self):
+        """Release least recently used entries until the total fits the budget"""
+        for key in list(self.entries):
+            if self.used <= self.budget:
+                break
+            cost, release = self.entries[key]
+            if release():
+                self.discard(key)
+                self.evictions += 1
+            else:
+                self.touch(key)
+
+    def usage(self):
+        """Budget, bytes in use and evictions so far, with the count and bytes of each kind"""
+        kinds = {}
+        for (kind, _, _), (cost, _) in self.entries.items():
+            stats = kinds.setdefault(kind, {"count": 0, "bytes": 0})
+            stats["count"] += 1
+            stats["bytes"] += cost
+        return {"budget": self.budget, "used": self.used, "evictions": self.evictions, "kinds": kinds}
+
+    def summary(self):
+        """One line for the status bar"""
+        usage = self.usage()
+        kinds = ", ".join(f"{kind} {stats['count']} ({stats['bytes'] / 1e6:.1f} MB)"
+                          for kind, stats in sorted(usage["kinds"].items()))
+        return (f"Memory {usage['used'] / 1e6:.1f} / {usage['budget'] / 1e6:.0f} MB"
+                f"{' - ' + kinds if kinds else ''} - {usage['evictions']} evicted")
+
+
+# Shared by every window of the application
+governor = MemoryGovernor.load()
@@ -1,106 +1,365 @@
 import os
+import re
+import datetime
 import pandas as pd
+from trade import Trade, TradeColumns
+from history import AccountHistory
+from exposure import ExposureMonitor, rename_limits, forget_limits
+from rollups import PnLRollups
+from shared_store import SharedTradeStore
+from tags import TradeTags
+from ledger import BalanceLedger
+from archive import TradeArchive
+from analytics import DurationStats
+from fx import DEFAULT_CURRENCY, normalize_currency
+from writer import BackgroundWriter
+import vault
+
+PROFILE_PATH = './database/users/profile.xlsx'
+ASSETS_DIR = './assets'
+
+
+def asset_prefix(name):
+    """File name prefix of the screenshots of an account"""
+    return name.replace(' ', '')
+
+
+def file_signature(path):
+    """(mtime, size) of a file, used to tell our own writes from external edits"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
 
 class TradingProfile:
     def __init__(self):
         self.name = ""
         self.balance = 10000
+        self.currency = DEFAULT_CURRENCY
         self.average_winrate = 0
         self.winning_trades = 0
         self.losing_trades = 0
         self.database_path = ""
         self.current_trade_id = 1
+        self.trades = TradeColumns()
+        self.history = None
+        self.exposure = ExposureMonitor()
+        self.rollups = PnLRollups()
+        self.tags = TradeTags()
+        self.ledger = BalanceLedger()
+        self.durations = DurationStats()
+        self.archive = TradeArchive("")
+        self.shared = None
+        self.trades_signature = None
+        self.profile_signature = None
+        # Workbook writes queued by save_trades(background=True)
+        self.writer = BackgroundWriter()
 
-    def place_trade(self, trade_id, pair, position, risk, reward,date):
-        """Add a new trade to the account database"""
-        try:
-            # Try to load existing data
-            df = pd.read_excel(self.database_path)
-        except:
-            # Create a new dataframe if file doesn't exist or is empty
-            df = pd.DataFrame(columns=['trade_id', 'pair', 'position', 'risk', 'reward', 'status', 'result',"date","before","after"])
-        
-        # Add new trade
-        new_trade = {
-            'trade_id': trade_id,
-            'pair': pair,
-            'position': position,
-            'risk': risk,
-            'reward': reward,
-            'status': 'OPEN',
-            'result': None,
-            'date': date,
-            'before': None,
-            'after':None
-        }
-        
-        new_trade_df = pd.DataFrame([new_trade])
-        for col in df.columns:
-            if col in new_trade_df.columns:
-                new_trade_df[col] = new_trade_df[col].astype(df[col].dtype)
-        df = pd.concat([df, new_trade_df], ignore_index=True)
-        df.to_excel(self.database_path, index=False)
+    def place_trade(self, trade_id, pair, position, risk, reward,date, background=False):
+        """Add a new trade to the account database
+
+        With background=True the workbook is written on the writer thread
+        and the method returns as soon as the trade is in memory.
+        """
+        new_trade = Trade(trade_id, pair, position, risk, reward, status='OPEN', date=date)
+        self.trades.append(new_trade)
         self.current_trade_id = trade_id + 1
+        if background:
+            self.trade_changed("place", None, new_trade, background=True)
+            self.save_trades(background=True)
+            return new_trade
+        self.save_trades()
+        self.trade_changed("place", None, new_trade)
         return new_trade
 
-    def close_trade(self,trade):
+    def close_trade(self,trade : Trade):
         """Close an existing trade in the account database"""
-        trade_id = trade["trade_id"]
-        closed_at = trade["closed_at"]
-        result = trade["result"]
-        before = trade["before"]
-        after = trade["after"]
-
         try:
-            df = pd.read_excel(self.database_path)
-            trade = df[df['trade_id'] == trade_id].iloc[0]
-            if trade['status'] == 'OPEN':
-                # Update trade status and result
-                df.loc[df['trade_id'] == trade_id, 'status'] = 'CLOSED'
-                
-                # Either convert the column to object type first:
-                df['result'] = df['result'].astype(object)
-                df.loc[df['trade_id'] == trade_id, 'result'] = result
-
-                # Then use appropriate columns based on data type
-                if isinstance(result, (int, float)):
-                    df.loc[df['trade_id'] == trade_id, 'result'] = result
-                else:
-                    df.loc[df['trade_id'] == trade_id, 'result_type'] = result
-                
-                # Update balance based on result
-                self.balance += closed_at
-                if closed_at > 0:
-                    self.winning_trades += 1
-                else:
-                    self.losing_trades += 1
-                
-                df.loc[df['trade_id'] == trade_id, 'closed_at'] = closed_at
-                df.loc[df['trade_id'] == trade_id, 'balance'] = self.balance
-
-                if not before ==  None:
-                    if os.path.exists(before):
-                        df.loc[df['trade_id'] == trade_id, 'before'] = before
-                        
-                if not after == None:
-                    if os.path.exists(after):
-                        df.loc[df['trade_id'] == trade_id, 'after'] = after
-                    
-
-                # Save changes
-                df.to_excel(self.database_path, index=False)
-                self.calculate_winrate()
+            stored = self.trades.get(trade.trade_id)
+            if stored is not None and stored.is_open:
+                previous = stored.copy()
+                closed_at = trade.closed_at
+                stored.status = 'CLOSED'
+                stored.result = trade.result
+                stored.closed_at = closed_at
+                stored.closed_time = trade.closed_time or datetime.datetime.now()
+
+                self.count_result(stored, 1)
+
+                if trade.before is not None and os.path.exists(trade.before):
+                    stored.before = trade.before
+                if trade.after is not None and os.path.exists(trade.after):
+                    stored.after = trade.after
+
+                # The ledger sets the balance of the trade and of the account
+                self.trades.update(stored)
+                self.trade_changed("close", previous, stored)
+                self.save_trades()
                 self.save_profile_data()
                 return True
         except Exception as e:
             print(f"Error closing trade: {e}")
         return False
 
+    def set_risk_limits(self, max_total=None, max_per_pair=None, max_per_direction=None):
+        """Set and save the open risk limits checked before a trade is placed, None for no limit"""
+        self.exposure.set_limits(max_total, max_per_pair, max_per_direction)
+        return self.exposure.save_limits(self.name)
+
+    def count_result(self, trade : Trade, sign):
+        """Add (sign=1) or remove (sign=-1) a closed trade from the win/loss counters"""
+        if trade.closed_at > 0:
+            self.winning_trades += sign
+        else:
+            self.losing_trades += sign
+        self.calculate_winrate()
+
+    def reopen_trade(self, trade_id):
+        """Reopen a closed trade, reverting the balance and counters of its close"""
+        try:
+            stored = self.trades.get(trade_id)
+            if stored is None or stored.is_open or stored.closed_at is None:
+                return None
+            previous = stored.copy()
+            # Inverse of close_trade
+            self.count_result(stored, -1)
+            stored.status = 'OPEN'
+            stored.result = None
+            stored.closed_at = None
+            stored.closed_time = None
+            stored.balance = None
+
+            self.trades.update(stored)
+            self.trade_changed("reopen", previous, stored)
+            self.save_trades()
+            self.save_profile_data()
+            return stored
+        except Exception as e:
+            print(f"Error reopening trade: {e}")
+        return None
+
+    def restore_trade(self, trade : Trade):
+        """Put a deleted trade back at its place in the account"""
+        try:
+            if trade.trade_id in self.trades:
+                return False
+            self.trades.insert(trade)
+            self.current_trade_id = max(self.current_trade_id, trade.trade_id + 1)
+            closed = not trade.is_open and trade.closed_at is not None
+            if closed:
+                self.count_result(trade, 1)
+            self.trade_changed("restore", None, trade)
+            self.save_trades()
+            if closed:
+                self.save_profile_data()
+            return True
+        except Exception as e:
+            print(f"Error restoring trade: {e}")
+            return False
+
+    def set_trade_images(self, trade_id, before, after):
+        """Store the screenshot paths of a trade"""
+        trade = self.trades.get(trade_id)
+        if trade is None:
+            return False
+        previous = trade.copy()
+        trade.before = before
+        trade.after = after
+        self.trades.update(trade)
+        self.save_trades()
+        self.trade_changed("images", previous, trade)
+        return True
+
+    def save_trades(self, background=False):
+        """Write the in-memory trades to the account workbook
+
+        With background=True a snapshot of the trades and rollups is queued
+        to the writer thread; the rollups are saved with the signature of the
+        workbook once it is written.
+        """
+        if background:
+            path, rollups_path = self.database_path, self.rollups_path
+            frame, rollups, key = self.trades.to_frame(), self.rollups.copy(), vault.key_for(self.name)
+
+            def write():
+                vault.write_excel(frame, path, key)
+                signature = file_signature(path)
+                rollups.save(rollups_path, signature, key)
+                self.trades_signature = signature
+            self.writer.submit(path, write)
+            return
+        # A queued snapshot must not overwrite this one
+        self.writer.wait()
+        vault.write_excel(self.trades.to_frame(), self.database_path, vault.key_for(self.name))
+        self.trades_signature = file_signature(self.database_path)
+
+    def save_rollups(self):
+        """Save the rollups, unless a queued workbook write will save them"""
+        if not self.writer.pending(self.database_path):
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+
+    def profile_state(self):
+        """Profile counters stored with every history version"""
+        return {'balance': float(self.balance),
+                'winning_trades': int(self.winning_trades),
+                'losing_trades': int(self.losing_trades),
+                'average_winrate': float(self.average_winrate),
+                'current_trade_id': int(self.current_trade_id)}
+
+    @property
+    def rollups_path(self):
+        return f'./database/{self.name}.rollups.json'
+
+    @property
+    def tags_path(self):
+        return f'./database/{self.name}.tags.json'
+
+    def set_trade_metadata(self, trade_id, tags, note):
+        """Replace the tags and note of a trade"""
+        if trade_id not in self.trades:
+            return False
+        self.tags.set_tags(trade_id, tags)
+        self.tags.set_note(trade_id, note)
+        self.tags.save(self.tags_path, vault.key_for(self.name))
+        return True
+
+    def trades_tagged(self, *tags):
+        """Trades carrying every one of the tags, oldest first"""
+        trade_ids = self.tags.trades_with_all(tags)
+        rows = sorted(row for row in map(self.trades.row_of, trade_ids) if row is not None)
+        return [self.trades.trade_at(row) for row in rows]
+
+    def all_trades(self):
+        """Archived and current trades in one TradeColumns store, oldest segments first
+
+        Reads every archive segment, for analyses run on demand such as replays.
+        """
+        if not len(self.archive):
+            return self.trades
+        return TradeColumns.concat([self.archive.trades(), self.trades])
+
+    def tag_stats(self, prefix=""):
+        """Per tag aggregates of the closed trades, archived ones included, see TradeTags.stats"""
+        return self.tags.stats(self.trades, prefix, self.archive.tag_sums)
+
+    def archived_points(self):
+        """Daily equity points and R histogram counts of the archived trades, for the charts"""
+        x, balance = self.archive.equity(self.ledger.start - self.archive.totals['pnl'])
+        return x, balance, self.archive.r_counts
+
+    def trade_changed(self, op, before, after, persist=True, background=False):
+        """Update the derived state and the history after a trade mutation
+
+        With background=True the caller queues a workbook write next, which
+        saves the rollups on the writer thread; the history is written there
+        as well.
+        """
+        self.ledger.apply(before, after)
+        stamped = self.restamp_balances(after) if persist else None
+        self.exposure.apply(before, after)
+        self.rollups.apply(before, after)
+        self.durations.apply(before, after)
+        if persist and not background:
+            self.save_rollups()
+        if self.history is None:
+            return
+        try:
+            self.history.record(op, before, after, self.trades, self.profile_state(), stamped, background)
+        except Exception as e:
+            print(f"Error recording history: {e}")
+
+    def restamp_balances(self, trade=None):
+        """Rewrite the balance column from the last ledger edit onward
+
+        `trade`, the record just changed, gets its new balance as well.
+        Returns the (trade_ids, balances) rewritten.
+        """
+        trade_ids, balances = self.ledger.stamps()
+        if len(trade_ids):
+            rows = [self.trades.row_of(trade_id) for trade_id in trade_ids]
+            self.trades.set_values('balance', rows, balances)
+        self.balance = self.ledger.balance
+        if trade is not None:
+            trade.balance = self.ledger.balance_after(trade.trade_id)
+        return trade_ids, balances
+
+    def share_trades(self, trades=None):
+        """Publish the trades in shared memory for analytics workers
+
+        The archived trades are published as well; pass all_trades() when it
+        was already read. Returns the name workers pass to SharedTradeView.
+        The block is only rewritten when the account changed since the last call.
+        """
+        version = self.history.version if self.history is not None else 0
+        if self.shared is None:
+            self.shared = SharedTradeStore(self.name)
+        if self.shared.version != version:
+            self.shared.publish(trades if trades is not None else self.all_trades(), version)
+        return self.shared.name
+
+    def close_shared(self):
+        """Release the shared memory published by share_trades"""
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def list_versions(self):
+        """List the recorded versions of the current account"""
+        return self.history.list_versions() if self.history is not None else []
+
+    def diff_versions(self, old_version, new_version):
+        """Compare the trades of two versions of the current account"""
+        return self.history.diff(old_version, new_version)
+
+    def restore_version(self, version):
+        """Restore the current account to a recorded version"""
+        if version < self.archive.version:
+            # Its trades would come back next to their archived copies
+            print(f"Error restoring version {version}: trades were archived at version {self.archive.version}")
+            return False
+        try:
+            trades, state = self.history.state_at(version)
+            self.trades = trades
+            self.exposure.rebuild(trades)
+            self.rebuild_rollups()
+            self.durations.rebuild(trades)
+            self.balance = state['balance']
+            self.ledger.rebuild(trades, self.balance)
+            self.winning_trades = state['winning_trades']
+            self.losing_trades = state['losing_trades']
+            self.average_winrate = state['average_winrate']
+            self.current_trade_id = max(state['current_trade_id'], trades.next_trade_id(),
+                                        self.archive.next_trade_id())
+            self.save_trades()
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+            self.save_profile_data()
+            self.history.write_checkpoint(self.trades, self.profile_state(), op=f"restore {version}")
+            return True
+        except Exception as e:
+            print(f"Error restoring version {version}: {e}")
+            return False
+
+    def restore_account(self, name, version=None):
+        """Recreate an account, deleted or not, from its history"""
+        history = AccountHistory(name, writer=self.writer)
+        if not history.exists():
+            return False
+        self.name = name
+        self.database_path = f'./database/{name}.xlsx'
+        self.history = history
+        self.archive = TradeArchive(name)
+        self.archive.load()
+        return self.restore_version(version if version is not None else history.version)
+
     def calculate_winrate(self):
         """Calculate the win rate percentage based on closed trades"""
         total_trades = self.winning_trades + self.losing_trades
         if total_trades > 0:
             self.average_winrate = (self.winning_trades / total_trades) * 100
+        else:
+            self.average_winrate = 0
         return self.average_winrate
 
     def show_balance(self):
@@ -119,12 +378,25 @@ class TradingProfile:
         self.current_trade_id = 1
         self.database_path = f'./database/{self.name}.xlsx'
         
-        # Create empty trade dataframe
-        trade_df = pd.DataFrame(columns=['trade_id', 'pair', 'position', 'risk', 'reward', 'status', 'result', 'closed_at', 'balance',"date","before","after"])
-        trade_df.to_excel(self.database_path, index=False)
+        # Create empty trade store
+        self.trades = TradeColumns()
+        self.exposure.reset()
+        self.exposure.load_limits(name)
+        self.rollups.reset()
+        self.durations.reset()
+        self.ledger.rebuild(self.trades, self.balance)
+        self.tags.reset()
+        self.archive = TradeArchive(name)
+        self.save_trades()
+        self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+        self.tags.save(self.tags_path, vault.key_for(self.name))
         
         # Save profile data
         self.save_profile_data()
+
+        # Start a new version in the account history
+        self.history = AccountHistory(name, writer=self.writer)
+        self.history.write_checkpoint(self.trades, self.profile_state(), op="create")
         return True
 
     def save_profile_data(self):
@@ -134,22 +406,31 @@ class TradingProfile:
             os.makedirs("./database/users")
             
         # Open the profile file
-        profile_path = './database/users/profile.xlsx'
+        profile_path = PROFILE_PATH
         try:
             if not os.path.exists(profile_path):
-                profile_df = pd.DataFrame(columns=['name', 'balance', 'winning_trades', 'losing_trades', 'average_winrate'])
+                profile_df = pd.DataFrame(columns=['name', 'balance', 'winning_trades', 'losing_trades',
+                                                   'average_winrate', 'currency'])
             else:
                 profile_df = pd.read_excel(profile_path)
+            # Whole amounts are read back as integer columns
+            profile_df = profile_df.astype({col: float for col in ('balance', 'average_winrate')
+                                            if col in profile_df.columns})
 
             # Check if we need to add the name column as index
             if 'name' not in profile_df.columns:
                 profile_df['name'] = ''
+            # Registries written before currencies were recorded lack the column
+            if 'currency' not in profile_df.columns:
+                profile_df['currency'] = DEFAULT_CURRENCY
+            profile_df['currency'] = profile_df['currency'].map(normalize_currency).astype(object)
                 
             # Make a copy with name as normal column for manipulation
             profile_data = {'name': self.name, 'balance': self.balance, 
                         'winning_trades': self.winning_trades, 
                         'losing_trades': self.losing_trades, 
-                        'average_winrate': self.average_winrate}
+                        'average_winrate': self.average_winrate,
+                        'currency': normalize_currency(self.currency)}
             
             # Check if profile exists
             if self.name in profile_df['name'].values:
@@ -166,56 +447,196 @@ class TradingProfile:
             
             # Save profile data
             profile_df.to_excel(profile_path, index=False)
+            self.profile_signature = file_signature(profile_path)
         except Exception as e:
             print(f"Error saving profile data: {e}")
 
-    def load_account(self, name):
-        """Load account data from Excel file"""
+    def load_profile_data(self):
+        """Load the profile counters of the current account from the registry"""
+        profile_path = PROFILE_PATH
+        if os.path.exists(profile_path):
+            profile_df = pd.read_excel(profile_path)
+            self.profile_signature = file_signature(profile_path)
+            # Find the profile by name
+            profile_row = profile_df[profile_df['name'] == self.name]
+            if not profile_row.empty:
+                self.balance = profile_row['balance'].iloc[0]
+                self.winning_trades = profile_row['winning_trades'].iloc[0]
+                self.losing_trades = profile_row['losing_trades'].iloc[0]
+                self.average_winrate = profile_row['average_winrate'].iloc[0]
+                # Accounts created before currencies were recorded are in the default one
+                self.currency = normalize_currency(profile_row['currency'].iloc[0]
+                                                   if 'currency' in profile_row.columns else None)
+                return True
+        return False
+
+    def rebuild_rollups(self):
+        """Recompute the rollups from the trades and the archived totals"""
+        self.rollups.rebuild(self.trades)
+        self.rollups.merge(self.archive.rollups.buckets)
+
+    def archive_trades(self, cutoff):
+        """Move the trades closed before cutoff to the account archive
+
+        Balance, counters and rollups are unchanged: the archive keeps the
+        totals of what it holds. Returns the number of trades archived.
+        """
+        try:
+            moved = self.archive.archive(self.trades, cutoff, self.tags)
+            count = int(moved.sum())
+            if not count:
+                return 0
+            self.trades = self.trades.select(~moved)
+            self.ledger.rebuild(self.trades, self.balance)
+            self.durations.rebuild(self.trades)
+            self.save_trades()
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+            self.archive.version = self.history.write_checkpoint(self.trades, self.profile_state(), op="archive")
+            self.archive.save()
+            return count
+        except Exception as e:
+            print(f"Error archiving trades: {e}")
+            return 0
+
+    def check_results(self):
+        """Recalculate wins and losses in case profile data is corrupted
+
+        Returns True when the counters had to be corrected.
+        """
+        wins, losses = self.trades.win_loss()
+        # Archived trades count through the totals of the archive
+        wins += self.archive.totals['wins']
+        losses += self.archive.totals['losses']
+        if wins != self.winning_trades or losses != self.losing_trades:
+            self.winning_trades = wins
+            self.losing_trades = losses
+            self.calculate_winrate()
+            return True
+        return False
+
+    def load_account(self, name, archive_days=None):
+        """Load account data from Excel file
+
+        With archive_days, closed trades older than that many days are then
+        moved to the archive; the GUI passes it when it opens an account.
+        """
+        self.close_shared()
+        self.writer.wait()
         self.name = name
         self.database_path = f'./database/{name}.xlsx'
         
         try:
             # Load profile metadata if it exists
-            profile_path = './database/users/profile.xlsx'
-            if os.path.exists(profile_path):
-                profile_df = pd.read_excel(profile_path)
-                # Find the profile by name
-                profile_row = profile_df[profile_df['name'] == name]
-                if not profile_row.empty:
-                    self.balance = profile_row['balance'].iloc[0]
-                    self.winning_trades = profile_row['winning_trades'].iloc[0]
-                    self.losing_trades = profile_row['losing_trades'].iloc[0]
-                    self.average_winrate = profile_row['average_winrate'].iloc[0]
+            self.load_profile_data()
             
             # Load trade data
-            df = pd.read_excel(self.database_path)
-            
-            # Recalculate wins and losses in case profile data is corrupted
-            wins = len(df[df['result'] == 'TP'])
-            losses = len(df[df['result'] == 'SL'])
-            if wins != self.winning_trades or losses != self.losing_trades:
-                self.winning_trades = wins
-                self.losing_trades = losses
-                self.calculate_winrate()
+            self.trades = TradeColumns.from_frame(vault.read_excel(self.database_path, vault.key_for(self.name)))
+            self.trades_signature = file_signature(self.database_path)
+            self.archive = TradeArchive(name)
+            self.archive.load()
+            if self.check_results():
+                print(f"Win/loss counters of {name} did not match its trades, run integrity.py to check the account")
+            self.exposure.rebuild(self.trades)
+            self.exposure.load_limits(name)
+            self.ledger.rebuild(self.trades, self.balance)
+            self.durations.rebuild(self.trades)
+            self.tags.load(self.tags_path, vault.key_for(self.name))
+            if not self.archive.summarized:
+                self.archive.summarize(self.tags)
+            if not self.rollups.load(self.rollups_path, self.trades_signature, vault.key_for(self.name)):
+                self.rebuild_rollups()
+                self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
             
             # Get next trade ID
-            if not df.empty:
-                self.current_trade_id = df['trade_id'].max() + 1
-            else:
-                self.current_trade_id = 1
+            self.current_trade_id = max(self.trades.next_trade_id(), self.archive.next_trade_id())
+
+            # Accounts opened for the first time get a base version
+            self.history = AccountHistory(name, writer=self.writer)
+            if not self.history.exists():
+                self.history.write_checkpoint(self.trades, self.profile_state(), op="import")
+
+            if archive_days is not None:
+                self.archive_trades(datetime.datetime.now() - datetime.timedelta(days=archive_days))
                 
             return True
         except Exception as e:
             print(f"Error loading account: {e}")
             return False
 
+    def sync_trades_from_disk(self):
+        """Apply external edits of the account workbook to the loaded trades
+
+        Rows are compared by trade_id and only the differences are applied.
+        Returns the (added, removed, changed) trades.
+        """
+        if self.writer.pending(self.database_path):
+            return [], [], []  # our own write in progress
+        signature = file_signature(self.database_path)
+        if signature is None or signature == self.trades_signature:
+            return [], [], []
+        disk = TradeColumns.from_frame(vault.read_excel(self.database_path, vault.key_for(self.name)))
+        self.trades_signature = signature
+
+        added, changed = [], []
+        for trade in disk:
+            current = self.trades.get(trade.trade_id)
+            if current is None:
+                self.trades.append(trade)
+                added.append(trade)
+                self.trade_changed("external", None, trade, persist=False)
+            elif current.to_dict() != trade.to_dict():
+                self.trades.update(trade)
+                changed.append(trade)
+                self.trade_changed("external", current, trade, persist=False)
+        removed = [trade for trade in self.trades if trade.trade_id not in disk]
+        # Trades archived by another process leave the workbook without changing the totals
+        self.archive.load()
+        archived = False
+        for trade in removed:
+            self.trades.remove(trade.trade_id)
+            if trade.trade_id in self.archive:
+                archived = True
+            else:
+                self.trade_changed("external", trade, None, persist=False)
+        if archived:
+            self.ledger.rebuild(self.trades, self.ledger.balance)
+            self.durations.rebuild(self.trades)
+
+        if added or removed or changed:
+            # persist=False skips the restamp, which also sets the balance
+            self.balance = self.ledger.balance
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+            self.check_results()
+            self.current_trade_id = max(self.current_trade_id, self.trades.next_trade_id())
+        return added, removed, changed
+
+    def sync_profile_from_disk(self):
+        """Reload the profile counters if the registry was edited externally"""
+        signature = file_signature(PROFILE_PATH)
+        if signature is None or signature == self.profile_signature:
+            return False
+        if not self.load_profile_data():
+            return False
+        # A balance edited in the registry moves the starting point of the ledger
+        self.ledger.start = self.balance - self.ledger.total
+        return True
+
     def delete_account(self):
         """Delete account files"""
+        self.close_shared()
+        # A queued write would bring the workbook back
+        self.writer.wait()
         try:
             if os.path.exists(self.database_path):
                 os.remove(self.database_path)
+            for path in (self.rollups_path, self.tags_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            TradeArchive(self.name).delete()
+            forget_limits(self.name)
+            vault.forget(self.name)
             # Delete profile metadata
-            profile_path = './database/users/profile.xlsx'
+            profile_path = PROFILE_PATH
             if os.path.exists(profile_path):
                 profile_df = pd.read_excel(profile_path)
                 profile_df = profile_df[profile_df['name'] != self.name]
@@ -225,21 +646,125 @@ class TradingProfile:
             print(f"Error deleting account: {e}")
             return False
 
+    def rename_account(self, new_name):
+        """Move the account files, history, archive and screenshots to a new name
+
+        The encryption key of a protected account must already be registered
+        under new_name. Archived screenshots stay in their packs under their
+        old names.
+        """
+        self.close_shared()
+        self.writer.wait()
+        old_name = self.name
+        old_paths = [self.database_path, self.rollups_path, self.tags_path, self.history.dir, self.archive.dir]
+        self.name = new_name
+        new_paths = [f'./database/{new_name}.xlsx', self.rollups_path, self.tags_path,
+                     AccountHistory(new_name).dir, TradeArchive(new_name).dir]
+        self.name = old_name
+        moves = []
+        try:
+            taken = [path for path in new_paths if os.path.exists(path)]
+            if taken:
+                raise FileExistsError(f"{', '.join(taken)} already exists")
+            for source, target in zip(old_paths, new_paths):
+                if os.path.exists(source):
+                    os.replace(source, target)
+                    moves.append((source, target))
+        except Exception as e:
+            for source, target in reversed(moves):
+                os.replace(target, source)
+            print(f"Error renaming account {old_name}: {e}")
+            return False
+
+        # Steps to revert, in reverse order, when a later step fails
+        undo = []
+        previous = (self.name, self.database_path, self.trades, self.history, self.archive)
+        try:
+            # Screenshots are named after the account: ./assets/<prefix>_<trade_id>_<zone>.<ext>
+            pattern = re.compile(rf"^{re.escape(asset_prefix(old_name))}_(\d+_(?:before|after)\.\w+)$")
+            assets = {}
+            renamed = {}  # new path -> old path
+
+            def rename(path):
+                match = pattern.match(os.path.basename(path))
+                if match is None or os.path.normpath(os.path.dirname(path)) != os.path.normpath(ASSETS_DIR):
+                    return path
+                target = os.path.join(os.path.dirname(path), f"{asset_prefix(new_name)}_{match.group(1)}")
+                assets[os.path.normpath(path)] = os.path.normpath(target)
+                renamed[target] = path
+                return target
+
+            trades = self.trades.copy()
+            for trade in list(trades):
+                before = rename(trade.before) if trade.before else trade.before
+                after = rename(trade.after) if trade.after else trade.after
+                if (before, after) != (trade.before, trade.after):
+                    trades.update(trade.copy(before=before, after=after))
+            history = AccountHistory(new_name, writer=self.writer)
+            history.rewrite_paths(rename)
+            undo.append(lambda: history.rewrite_paths(lambda path: renamed.get(path, path)))
+            for source, target in assets.items():
+                if os.path.exists(source) and not os.path.exists(target):
+                    os.replace(source, target)
+                    undo.append(lambda source=source, target=target: os.replace(target, source))
+            self.name = new_name
+            self.database_path = new_paths[0]
+            self.trades = trades
+            self.history = history
+            self.archive = TradeArchive(new_name)
+            self.archive.load()
+            self.save_trades()
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+            rename_limits(old_name, new_name)
+            undo.append(lambda: rename_limits(new_name, old_name))
+
+            profile_df = pd.read_excel(PROFILE_PATH)
+            profile_df.loc[profile_df['name'] == old_name, 'name'] = new_name
+            profile_df.to_excel(PROFILE_PATH, index=False)
+            self.profile_signature = file_signature(PROFILE_PATH)
+            return True
+        except Exception as e:
+            print(f"Error renaming account {old_name}: {e}")
+            for step in reversed(undo):
+                step()
+            for source, target in reversed(moves):
+                os.replace(target, source)
+            self.name, self.database_path, self.trades, self.history, self.archive = previous
+            # The workbook and rollups may have been rewritten under the new name
+            self.save_trades()
+            self.rollups.save(self.rollups_path, self.trades_signature, vault.key_for(self.name))
+            return False
+
     def delete_trade(self, trade_id):
         """Delete a trade from the account database"""
         try:
-            df = pd.read_excel(self.database_path)
-            df = df[df['trade_id'] != trade_id]
-            df.to_excel(self.database_path, index=False)
+            removed = self.trades.remove(trade_id)
+            if removed is None:
+                return False
+            closed = not removed.is_open and removed.closed_at is not None
+            if closed:
+                # Later balances no longer include this trade
+                self.count_result(removed, -1)
+            self.trade_changed("delete", removed, None)
+            self.save_trades()
+            if closed:
+                self.save_profile_data()
+            if self.tags.tags_of(trade_id) or self.tags.note_of(trade_id):
+                self.tags.remove_trade(trade_id)
+                self.tags.save(self.tags_path, vault.key_for(self.name))
             return True
         except Exception as e:
             print(f"Error deleting trade: {e}")
             return False
 
+    def get_trade(self, trade_id):
+        """Get a single trade of the current account"""
+        return self.trades.get(trade_id)
+
     def get_trades(self):
         """Get all trades for the current account"""
         try:
-            return pd.read_excel(self.database_path)
+            return self.trades.to_frame()
         except Exception as e:
             print(f"Error getting trades: {e}")
-            return pd.DataFrame()
+            return TradeColumns.empty_frame()
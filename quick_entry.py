@@ -0,0 +1,73 @@
+import re
+from bisect import bisect_left
+import numpy as np
+
+# Pairs offered before an account has traded them
+DEFAULT_SYMBOLS = ("EURUSD", "GBPUSD", "USDJPY", "USDCHF", "AUDUSD", "USDCAD", "NZDUSD",
+                   "EURGBP", "EURJPY", "GBPJPY", "XAUUSD", "US30", "NAS100", "SPX500", "BTCUSD")
+SIDES = {"b": "buy", "buy": "buy", "l": "buy", "long": "buy",
+         "s": "sell", "sell": "sell", "sh": "sell", "short": "sell"}
+MAX_REWARD = 10
+
+# PAIR SIDE RISK [REWARD], e.g. "EURUSD b 50 3" or "xauusd short 25"
+COMMAND = re.compile(
+    r"^\s*(?P<pair>[A-Za-z0-9][A-Za-z0-9./_-]*)"
+    r"\s+(?P<side>" + "|".join(sorted(SIDES, key=len, reverse=True)) + r")"
+    r"\s+(?P<risk>\d+(?:\.\d*)?|\.\d+)"
+    r"(?:\s+(?:1:)?(?P<reward>\d+))?\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_command(text, default_reward=2):
+    """(pair, position, risk, reward) of a quick entry line
+
+    Raises ValueError with a message for the status line when the text does
+    not follow the grammar.
+    """
+    match = COMMAND.match(text)
+    if match is None:
+        raise ValueError("Expected: PAIR b|s RISK [REWARD], e.g. EURUSD b 50 3")
+    risk = float(match["risk"])
+    if risk <= 0:
+        raise ValueError("Risk must be positive")
+    reward = int(match["reward"]) if match["reward"] else default_reward
+    if not 1 <= reward <= MAX_REWARD:
+        raise ValueError(f"Reward must be between 1 and {MAX_REWARD}")
+    return match["pair"].upper(), SIDES[match["side"].lower()], risk, reward
+
+
+class SymbolIndex:
+    """Pairs of an account for prefix completion
+
+    Symbols are kept sorted so the candidates of a prefix are a bisect away;
+    they are offered most traded first.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = dict(counts or {})
+        for symbol in DEFAULT_SYMBOLS:
+            self.counts.setdefault(symbol, 0)
+        self.symbols = sorted(self.counts)
+
+    @classmethod
+    def from_trades(cls, trades):
+        pairs = trades.column('pair')
+        # Trades without a pair have nothing to complete
+        pairs = np.char.upper(pairs[np.not_equal(pairs, None)].astype(str))
+        symbols, counts = np.unique(pairs, return_counts=True)
+        return cls(zip(symbols.tolist(), counts.tolist()))
+
+    def add(self, symbol):
+        symbol = symbol.upper()
+        if symbol not in self.counts:
+            self.symbols.insert(bisect_left(self.symbols, symbol), symbol)
+        self.counts[symbol] = self.counts.get(symbol, 0) + 1
+
+    def complete(self, prefix, limit=10):
+        """Symbols starting with prefix, most traded first"""
+        prefix = prefix.upper()
+        start = bisect_left(self.symbols, prefix)
+        end = bisect_left(self.symbols, prefix + "\uffff", start)
+        matches = self.symbols[start:end]
+        return sorted(matches, key=lambda symbol: -self.counts[symbol])[:limit]
@@ -0,0 +1,102 @@
+import os
+import re
+import pandas as pd
+from model import TradingProfile, PROFILE_PATH
+import vault
+
+SUFFIX = re.compile(r"^(.*)_(\d+)$")
+DEFAULT_BASE = "Account"
+# Account names are used in file names
+INVALID_CHARS = set('<>:"/\\|?*')
+
+
+def split_name(name):
+    """('Account', 3) for 'Account_3', (name, 0) for a name without numeric suffix"""
+    match = SUFFIX.match(name)
+    return (match.group(1), int(match.group(2))) if match else (name, 0)
+
+
+def check_name(name):
+    """Raise ValueError when a name cannot be used for an account"""
+    if not name or name != name.strip():
+        raise ValueError("Account names cannot be empty or start or end with spaces")
+    if INVALID_CHARS & set(name) or name in (".", ".."):
+        raise ValueError(f"Account names cannot contain {' '.join(sorted(INVALID_CHARS))}")
+
+
+class AccountRegistry:
+    """Index of the account names of the profile registry
+
+    The names are kept in a set and every base name maps to the highest
+    numeric suffix in use ('Account_3' -> 'Account': 3), so uniqueness checks
+    and picking the next free 'name_N' do not scan the accounts. Suffixes are
+    not reused after an account is deleted.
+    """
+
+    def __init__(self, names=()):
+        self.names = set()
+        self.suffixes = {}  # base name -> highest suffix used
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def load(cls, path=PROFILE_PATH):
+        if not os.path.exists(path):
+            return cls()
+        return cls(pd.read_excel(path)['name'].astype(str))
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        self.names.add(name)
+        base, suffix = split_name(name)
+        if suffix > self.suffixes.get(base, 0):
+            self.suffixes[base] = suffix
+
+    def remove(self, name):
+        self.names.discard(name)
+
+    def unique_name(self, name):
+        """name, or name_N with the next suffix of name when it is taken"""
+        if name not in self.names:
+            return name
+        return f"{name}_{self.suffixes.get(name, 0) + 1}"
+
+    def default_name(self):
+        return self.unique_name(DEFAULT_BASE)
+
+    def rename(self, old_name, new_name, passphrase=None):
+        """Rename an account: workbook, derived files, history, archive, screenshots and profile row
+
+        A protected account needs its passphrase to wrap its key under the new
+        name. Raises ValueError for a name that cannot be used or a wrong
+        passphrase; returns False when the files could not be moved.
+        """
+        check_name(new_name)
+        if old_name not in self.names:
+            raise ValueError(f"No account named {old_name}")
+        if new_name in self.names:
+            raise ValueError(f"An account named {new_name} already exists")
+        protected = vault.is_protected(old_name)
+        if protected:
+            if passphrase is None:
+                raise ValueError(f"{old_name} is encrypted, its passphrase is needed")
+            if vault.key_for(old_name) is None and vault.unlock(old_name, passphrase) is None:
+                raise ValueError("Wrong passphrase")
+
+        profile = TradingProfile()
+        if not profile.load_account(old_name):
+            return False
+        if protected:
+            vault.rename_key(old_name, new_name, passphrase)
+        if not profile.rename_account(new_name):
+            if protected:
+                vault.rename_key(new_name, old_name, passphrase)
+            return False
+        self.remove(old_name)
+        self.add(new_name)
+        return True
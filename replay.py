@@ -0,0 +1,179 @@
+import argparse
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# What happens to a trade whose recorded exit is inside the new stop and target:
+# "stop" assumes it would have gone on to the new stop, "recorded" keeps its exit
+UNREACHED = ("stop", "recorded")
+
+_cache = OrderedDict()
+CACHE_SIZE = 16
+
+
+def journal_arrays(profile):
+    """Closed trades of an account and its archive as arrays, in the order they were closed
+
+    Returns {'r', 'risk', 'manual', 'day_rank'}: the R multiple, risk amount
+    and manual exit flag of each trade, and its rank among the trades opened
+    the same day (0 for the first one).
+    """
+    trades = profile.all_trades()
+    columns = {col: trades.column(col) for col in ('status', 'risk', 'closed_at', 'result', 'date')}
+    close_dates = trades.close_dates()
+    closed = ((columns['status'] == 'CLOSED') & ~np.isnan(columns['closed_at'])
+              & (columns['risk'] > 0) & ~np.isnat(columns['date']))
+
+    order = np.argsort(close_dates[closed], kind='stable')
+    risk = columns['risk'][closed][order]
+    r = columns['closed_at'][closed][order] / risk
+    opened = columns['date'][closed][order]
+
+    # Rank of each trade within its opening day, in opening order
+    by_open = np.argsort(opened, kind='stable')
+    days = opened[by_open].astype('datetime64[D]')
+    first = np.r_[True, days[1:] != days[:-1]]
+    starts = np.maximum.accumulate(np.where(first, np.arange(len(days)), 0))
+    day_rank = np.empty(len(days), dtype=np.int64)
+    day_rank[by_open] = np.arange(len(days)) - starts
+    return {'r': r, 'risk': risk, 'manual': columns['result'][closed][order] == 'MANUAL', 'day_rank': day_rank}
+
+
+def exit_r(r, manual, target=None, stop=None, unreached="stop"):
+    """R multiple of each trade under a fixed target and stop, in R
+
+    Only the exits are known, not the price path, so a trade counts as
+    reaching the target when it was closed at or above it and as stopped when
+    it was closed at or below the stop. Manual exits between the two are
+    kept; stops and targets between the two are resolved by `unreached`.
+    target=None keeps every recorded exit.
+    """
+    if target is None:
+        return r
+    stop = 1.0 if stop is None else stop
+    inside = r if unreached == "recorded" else np.where(manual, r, -stop)
+    return np.where(r >= target, target, np.where(r <= -stop, -stop, inside))
+
+
+def _max_drawdown(equity, start_balance):
+    peak = np.maximum(np.maximum.accumulate(equity, axis=-1), start_balance)
+    drawdown = peak - equity
+    return drawdown.max(axis=-1), (drawdown / peak).max(axis=-1) * 100
+
+
+def _replay_chunk(args):
+    """Replay one block of exit rules against every filter and sizing, returns the table rows"""
+    journal, rules, per_day, risk_pcts, start_balance, unreached = args
+    r, risk, manual, day_rank = journal['r'], journal['risk'], journal['manual'], journal['day_rank']
+    n = len(r)
+    outcomes = np.stack([exit_r(r, manual, target, stop, unreached) for target, stop in rules])  # rules x trades
+    limits = np.array([limit if limit else n + 1 for limit in per_day])
+    taken = day_rank[None, :] < limits[:, None]  # filters x trades
+    # rules x filters x trades, trades filtered out add nothing
+    taken_r = np.where(taken[None, :, :], outcomes[:, None, :], 0.0)
+    count = taken.sum(axis=1)
+    wins = (taken_r > 0).sum(axis=2)
+
+    rows = []
+    for risk_pct in risk_pcts:
+        if risk_pct is None:
+            # The risk amount recorded on each trade
+            equity = start_balance + np.cumsum(taken_r * risk, axis=2)
+        else:
+            # A fixed share of the current balance, compounding
+            equity = start_balance * np.cumprod(1 + taken_r * (risk_pct / 100), axis=2)
+        final = equity[:, :, -1]
+        drawdown, drawdown_pct = _max_drawdown(equity, start_balance)
+        for (i, (target, stop)), (j, limit) in itertools.product(enumerate(rules), enumerate(per_day)):
+            rows.append({
+                'target_r': target,
+                'stop_r': stop if target is not None else None,
+                'max_per_day': limit or None,
+                'risk_pct': risk_pct,
+                'trades': int(count[j]),
+                'winrate': float(wins[i, j] / count[j] * 100) if count[j] else 0.0,
+                'final_balance': float(final[i, j]),
+                'return_pct': float((final[i, j] / start_balance - 1) * 100),
+                'max_drawdown': float(drawdown[i, j]),
+                'max_drawdown_pct': float(drawdown_pct[i, j]),
+            })
+    return rows
+
+
+def replay(journal, start_balance, targets=(None,), stops=(1.0,), per_day=(None,), risk_pcts=(None,),
+           unreached="stop", workers=1, chunk_size=8):
+    """Comparison table of the journal replayed under every combination of parameters
+
+    targets and stops are exit rules in R (target None keeps the recorded
+    exits), per_day caps the trades taken each day (None for no cap) and
+    risk_pcts sizes every trade as a percentage of the balance (None keeps
+    the recorded risk amounts). Exit rules are split in chunks of
+    `chunk_size`, run across `workers` processes when workers > 1. Returns
+    a DataFrame sorted by final balance, one row per combination.
+    """
+    if unreached not in UNREACHED:
+        raise ValueError(f"unreached must be one of {UNREACHED}")
+    if len(journal['r']) == 0:
+        raise ValueError("No closed trades to replay")
+    rules = list(dict.fromkeys((target, None if target is None else stop)
+                               for target in targets for stop in stops))
+    jobs = [(journal, rules[i:i + chunk_size], list(per_day), list(risk_pcts), float(start_balance), unreached)
+            for i in range(0, len(rules), chunk_size)]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_replay_chunk, jobs))
+    else:
+        chunks = [_replay_chunk(job) for job in jobs]
+    table = pd.DataFrame([row for chunk in chunks for row in chunk])
+    return table.sort_values('final_balance', ascending=False, ignore_index=True)
+
+
+def replay_account(profile, targets=(None,), stops=(1.0,), per_day=(None,), risk_pcts=(None,),
+                   unreached="stop", workers=1):
+    """Replay the closed trades of an account from its starting balance, cached per account version"""
+    version = profile.history.version if profile.history is not None else None
+    key = (profile.name, version, tuple(targets), tuple(stops), tuple(per_day), tuple(risk_pcts), unreached)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    # Balance before the first closed trade, archived trades included
+    start_balance = profile.ledger.start - profile.archive.totals['pnl']
+    result = replay(journal_arrays(profile), start_balance, targets, stops, per_day, risk_pcts,
+                    unreached=unreached, workers=workers)
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
+
+
+if __name__ == "__main__":
+    from model import TradingProfile
+
+    def optional(cast):
+        return lambda text: None if text.lower() in ("none", "-") else cast(text)
+
+    parser = argparse.ArgumentParser(description="Replay the closed trades of an account under other exit rules")
+    parser.add_argument("name")
+    parser.add_argument("--targets", nargs="+", type=optional(float), default=[None, 1.0, 2.0, 3.0],
+                        help="take profit in R, 'none' for the recorded exits")
+    parser.add_argument("--stops", nargs="+", type=float, default=[1.0], help="stop loss in R")
+    parser.add_argument("--per-day", nargs="+", type=optional(int), default=[None, 1, 2, 3],
+                        help="most trades taken per day, 'none' for no cap")
+    parser.add_argument("--risk-pct", nargs="+", type=optional(float), default=[None, 1.0],
+                        help="risk per trade in percent of the balance, 'none' for the recorded risk")
+    parser.add_argument("--unreached", choices=UNREACHED, default="stop")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    profile = TradingProfile()
+    if not profile.load_account(args.name):
+        parser.exit(1, f"Could not load {args.name}\n")
+    table = replay_account(profile, args.targets, args.stops, args.per_day, args.risk_pct,
+                           unreached=args.unreached, workers=args.workers)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        # Compounded balances over a long journal do not fit a fixed point column
+        print(table.head(args.top).to_string(index=False, float_format=lambda value: f"{value:.6g}"))
@@ -0,0 +1,141 @@
+import os
+import datetime
+import numpy as np
+import vault
+
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket_start(date, period):
+    """First day of the day, ISO week or month bucket holding a date"""
+    day = date.date() if isinstance(date, datetime.datetime) else date
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_starts(dates, period):
+    """Vectorized bucket_start over a datetime64 array"""
+    days = dates.astype('datetime64[D]')
+    if period == 'week':
+        # 1970-01-01 was a Thursday, shift so weeks start on Monday
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    return days
+
+
+class PnLRollups:
+    """P&L, trade count and wins of closed trades per day, week and month
+
+    Buckets are updated from single trade changes and saved next to the
+    account, so range queries cost O(buckets) instead of O(trades).
+    """
+
+    def __init__(self):
+        self.buckets = {period: {} for period in PERIODS}
+
+    @staticmethod
+    def trade_date(trade):
+        # P&L is booked on the day the trade was closed
+        return trade.close_date
+
+    def reset(self):
+        self.buckets = {period: {} for period in PERIODS}
+
+    def copy(self):
+        rollups = PnLRollups()
+        rollups.buckets = {period: dict(buckets) for period, buckets in self.buckets.items()}
+        return rollups
+
+    def _add(self, trade, sign):
+        date = self.trade_date(trade)
+        if date is None or trade.closed_at is None:
+            return
+        win = 1 if trade.closed_at > 0 else 0
+        for period in PERIODS:
+            key = bucket_start(date, period).isoformat()
+            pnl, count, wins = self.buckets[period].get(key, (0.0, 0, 0))
+            count += sign
+            if count == 0:
+                self.buckets[period].pop(key, None)
+            else:
+                self.buckets[period][key] = (pnl + sign * trade.closed_at, count, wins + sign * win)
+
+    def apply(self, before, after):
+        """Account for a trade going from `before` to `after` (either may be None)"""
+        if before is not None and before.status == 'CLOSED':
+            self._add(before, -1)
+        if after is not None and after.status == 'CLOSED':
+            self._add(after, 1)
+
+    def rebuild(self, trades):
+        """Recompute every bucket from a TradeColumns store"""
+        self.reset()
+        closed = (trades.column('status') == 'CLOSED') & ~np.isnan(trades.column('closed_at'))
+        dates = self._dates(trades)[closed]
+        valid = ~np.isnat(dates)
+        dates = dates[valid]
+        pnl = trades.column('closed_at')[closed][valid]
+        for period in PERIODS:
+            keys, inverse = np.unique(_bucket_starts(dates, period), return_inverse=True)
+            sums = np.bincount(inverse, weights=pnl, minlength=len(keys))
+            counts = np.bincount(inverse, minlength=len(keys))
+            wins = np.bincount(inverse, weights=(pnl > 0), minlength=len(keys))
+            self.buckets[period] = {
+                str(key): (float(total), int(count), int(win))
+                for key, total, count, win in zip(keys, sums, counts, wins)
+            }
+
+    def merge(self, buckets, sign=1):
+        """Add (sign=1) or remove (sign=-1) the buckets of another PnLRollups"""
+        for period in PERIODS:
+            mine = self.buckets[period]
+            for key, (pnl, count, wins) in buckets[period].items():
+                total, n, won = mine.get(key, (0.0, 0, 0))
+                if n + sign * count == 0:
+                    mine.pop(key, None)
+                else:
+                    mine[key] = (total + sign * pnl, n + sign * count, won + sign * wins)
+
+    @staticmethod
+    def _dates(trades):
+        return trades.close_dates()
+
+    def query(self, period, start=None, end=None):
+        """Buckets of a period between two dates (inclusive), oldest first
+
+        Each row is (bucket start, pnl, trades, winrate in %).
+        """
+        start = bucket_start(start, period).isoformat() if start is not None else None
+        end = end.isoformat() if end is not None else None
+        rows = []
+        for key, (pnl, count, wins) in self.buckets[period].items():
+            if (start is None or key >= start) and (end is None or key <= end):
+                rows.append((datetime.date.fromisoformat(key), pnl, count, wins / count * 100))
+        return sorted(rows)
+
+    def save(self, path, signature, key=None):
+        """Write the buckets with the signature of the trade file they describe, encrypted with key"""
+        try:
+            vault.write_json({"signature": list(signature) if signature else None,
+                              "buckets": self.buckets}, path, key)
+        except Exception as e:
+            print(f"Error saving rollups: {e}")
+
+    def load(self, path, signature, key=None):
+        """Load saved buckets, False if missing or out of date"""
+        if not os.path.exists(path):
+            return False
+        try:
+            data = vault.read_json(path, key)
+        except Exception as e:
+            print(f"Error loading rollups: {e}")
+            return False
+        if signature is None or data.get("signature") != list(signature):
+            return False
+        self.buckets = {period: {key: tuple(value) for key, value in data["buckets"][period].items()}
+                        for period in PERIODS}
+        return True
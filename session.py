@@ -0,0 +1,139 @@
+import os
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, pyqtSignal
+from model import TradingProfile, PROFILE_PATH
+from archive import DEFAULT_AGE_DAYS
+from watcher import AccountWatcher
+
+
+class AccountSession(QObject):
+    """The single TradingProfile of an account, shared by every view that shows it
+
+    All writes to the account go through this profile. Views listen to the
+    signals below to stay consistent with each other.
+    """
+    trades_changed = pyqtSignal(list, list, list)  # added, removed, changed trades
+    trade_closed = pyqtSignal(object)  # Trade closed from one of the views
+    reloaded = pyqtSignal()  # the whole trade store was replaced
+    profile_changed = pyqtSignal()  # balance or counters changed
+
+    def __init__(self, profile : TradingProfile):
+        super().__init__()
+        self.profile = profile
+        self.views = 0
+
+        # Pick up edits made to the account files by other processes
+        self.watcher = AccountWatcher(self)
+        self.watcher.trades_file_changed.connect(self.sync_external_changes)
+        self.watcher.profile_file_changed.connect(self.sync_external_profile)
+
+    @property
+    def name(self):
+        return self.profile.name
+
+    def start_watching(self):
+        self.watcher.watch(self.profile.database_path, PROFILE_PATH)
+
+    def stop_watching(self):
+        self.watcher.stop()
+
+    def sync_external_changes(self):
+        """Apply rows changed in the account workbook by another process"""
+        try:
+            added, removed, changed = self.profile.sync_trades_from_disk()
+        except Exception as e:
+            print(f"Error reading external changes: {e}")
+            return
+        if added or removed or changed:
+            self.trades_changed.emit(added, removed, changed)
+
+    def sync_external_profile(self):
+        """Reload the account counters edited in the profile registry"""
+        try:
+            if self.profile.sync_profile_from_disk():
+                self.profile_changed.emit()
+        except Exception as e:
+            print(f"Error reading external profile changes: {e}")
+
+
+class AccountSessions:
+    """Open accounts of the application, one session per account
+
+    Sessions are reference counted by the views using them. When the last
+    view of an account is closed the session is kept idle, and the least
+    recently used idle sessions beyond `max_idle` are evicted from memory.
+    """
+
+    def __init__(self, max_idle=2):
+        self.max_idle = max_idle
+        self.active = {}
+        self.idle = OrderedDict()
+
+    def acquire(self, account_name):
+        """Session of an account, loading (or creating) the account if needed"""
+        session = self.active.get(account_name)
+        if session is None:
+            session = self.idle.pop(account_name, None)
+            if session is not None:
+                # Catch up with edits made while nobody was watching
+                session.sync_external_changes()
+                session.sync_external_profile()
+            else:
+                session = self._load(account_name)
+                if session is None:
+                    return None
+            self.active[account_name] = session
+            session.start_watching()
+        session.views += 1
+        return session
+
+    def _load(self, account_name):
+        profile = TradingProfile()
+        if not os.path.exists("./database"):
+            os.makedirs("./database")
+        if not os.path.exists(f"./database/{account_name}.xlsx"):
+            profile.create_account(account_name)
+        # Accounts opened in the GUI move their old closed trades to the archive
+        if not profile.load_account(account_name, archive_days=DEFAULT_AGE_DAYS):
+            return None
+        return AccountSession(profile)
+
+    def release(self, session : AccountSession):
+        """A view stopped using a session"""
+        session.views -= 1
+        if session.views > 0:
+            return
+        self.active.pop(session.name, None)
+        session.stop_watching()
+        self.idle[session.name] = session
+        while len(self.idle) > self.max_idle:
+            _, evicted = self.idle.popitem(last=False)
+            self.evict(evicted)
+
+    def discard(self, account_name):
+        """Drop the idle session of an account renamed or deleted from disk
+
+        Returns False when the account is open in a view.
+        """
+        if account_name in self.active:
+            return False
+        session = self.idle.pop(account_name, None)
+        if session is not None:
+            self.evict(session)
+        return True
+
+    def evict(self, session : AccountSession):
+        # Queued workbook writes land before the writer thread goes away
+        session.profile.writer.close()
+        session.profile.close_shared()
+        session.deleteLater()
+
+    def close_all(self):
+        for session in list(self.active.values()) + list(self.idle.values()):
+            self.evict(session)
+        self.active.clear()
+        self.idle.clear()
+
+
+# Sessions shared by every window of the application
+sessions = AccountSessions()
@@ -0,0 +1,179 @@
+import os
+import json
+import struct
+import hashlib
+import itertools
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+# Columns published to the workers and their dtype in shared memory
+NUMERIC_COLUMNS = {
+    'trade_id': np.int64,
+    'risk': np.float64,
+    'reward': np.int64,
+    'closed_at': np.float64,
+    'balance': np.float64,
+    'date': 'datetime64[us]',
+    'closed_time': 'datetime64[us]',
+}
+# Text columns are published as int32 codes into a list of categories
+CODED_COLUMNS = ('pair', 'position', 'status', 'result')
+
+HEADER_SIZE = 64 * 1024
+_HEADER = struct.Struct("qq")  # version, manifest length
+
+
+_serial = itertools.count()
+
+
+def _block_name(account_name):
+    """Name for a new header block: a hash of the account name, the pid and a serial
+
+    Names of different accounts or processes never collide, and they stay
+    within the 31 characters macOS allows for version numbered data blocks.
+    """
+    digest = hashlib.sha1(account_name.encode("utf-8")).hexdigest()[:8]
+    return f"tt_{digest}_{os.getpid()}_{next(_serial)}"
+
+
+def _attach(name):
+    """Attach to an existing block without letting this process unlink it at exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attached block with the resource tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedTradeStore:
+    """Publish the trades of an account in shared memory for worker processes
+
+    The columns are copied once into a data block. A small header block holds
+    the version counter and the layout of the current data block; publishing
+    a new version writes a new data block and bumps the counter, so attached
+    workers can tell their view is stale and re-attach.
+    """
+
+    def __init__(self, account_name):
+        while True:
+            self.name = _block_name(account_name)
+            try:
+                self.header = shared_memory.SharedMemory(name=self.name, create=True, size=HEADER_SIZE)
+                break
+            except FileExistsError:
+                # Left by an earlier process with the same pid, it is not ours to unlink
+                continue
+        self.data = None
+        self.version = None
+
+    def publish(self, trades, version):
+        """Copy a TradeColumns store into a new data block"""
+        size = len(trades)
+        columns = {}
+        categories = {}
+        arrays = {}
+        for col, dtype in NUMERIC_COLUMNS.items():
+            arrays[col] = np.ascontiguousarray(trades.column(col), dtype=dtype)
+        for col in CODED_COLUMNS:
+            values = np.array(['' if v is None else v for v in trades.column(col)], dtype=object)
+            labels, codes = np.unique(values.astype(str), return_inverse=True) if size else ([], np.empty(0))
+            categories[col] = [str(label) for label in labels]
+            arrays[col] = codes.astype(np.int32)
+
+        offset = 0
+        for col, values in arrays.items():
+            columns[col] = {"offset": offset, "dtype": str(values.dtype)}
+            offset += (values.nbytes + 7) // 8 * 8
+        data = shared_memory.SharedMemory(name=f"{self.name}_{version}", create=True, size=max(offset, 8))
+        for col, values in arrays.items():
+            start = columns[col]["offset"]
+            data.buf[start:start + values.nbytes] = values.tobytes()
+
+        manifest = json.dumps({"data": data.name, "size": size, "columns": columns,
+                               "categories": categories}).encode("utf-8")
+        if _HEADER.size + len(manifest) > HEADER_SIZE:
+            data.close()
+            data.unlink()
+            raise ValueError("Shared trade manifest too large")
+        self.header.buf[_HEADER.size:_HEADER.size + len(manifest)] = manifest
+        self.header.buf[:_HEADER.size] = _HEADER.pack(version, len(manifest))
+
+        # Workers still mapping the old block keep it until they detach
+        if self.data is not None:
+            self.data.close()
+            self.data.unlink()
+        self.data = data
+        self.version = version
+        return self.name
+
+    def close(self):
+        for block in (self.data, self.header):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.data = None
+        self.header = None
+
+
+class SharedTradeView:
+    """Read-only, zero-copy view of a published account, used in worker processes"""
+
+    def __init__(self, name):
+        self.name = name
+        self.header = _attach(name)
+        self.data = None
+        self.attach()
+
+    def published_version(self):
+        return _HEADER.unpack_from(self.header.buf, 0)[0]
+
+    def is_stale(self):
+        """True when a newer version was published since attach()"""
+        return self.published_version() != self.version
+
+    def attach(self):
+        """Map the current data block, replacing a stale one"""
+        version, length = _HEADER.unpack_from(self.header.buf, 0)
+        manifest = json.loads(bytes(self.header.buf[_HEADER.size:_HEADER.size + length]))
+        self.release_data()
+        self.data = _attach(manifest["data"])
+        self.version = version
+        self.size = manifest["size"]
+        self.categories = manifest["categories"]
+        self.columns = {}
+        for col, layout in manifest["columns"].items():
+            values = np.ndarray(self.size, dtype=np.dtype(layout["dtype"]), buffer=self.data.buf,
+                                offset=layout["offset"])
+            values.flags.writeable = False
+            self.columns[col] = values
+
+    def column(self, name):
+        """Numeric column, or int32 codes for the text columns"""
+        return self.columns[name]
+
+    def decoded(self, name):
+        """Text column as an array of strings"""
+        return np.asarray(self.categories[name], dtype=object)[self.columns[name]]
+
+    def mask(self, name, value):
+        """Boolean mask of the rows of a text column equal to value"""
+        if value not in self.categories[name]:
+            return np.zeros(self.size, dtype=bool)
+        return self.columns[name] == self.categories[name].index(value)
+
+    def release_data(self):
+        """Unmap the data block, arrays taken from column() must not be used afterwards"""
+        if self.data is not None:
+            # Drop the numpy views before closing the mapping
+            self.columns = {}
+            self.data.close()
+            self.data = None
+
+    def close(self):
+        self.release_data()
+        self.header.close()
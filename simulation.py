@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from shared_store import SharedTradeView
+
+# Percentiles reported for the equity bands and the distributions
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# The equity bands are computed from the first BAND_PATHS paths, at BAND_STEPS
+# trade counts evenly spread over the path, so they stay small for long journals
+BAND_PATHS = 20000
+BAND_STEPS = 250
+
+# Memory used by one chunk of paths: about six float64 arrays of paths x trades
+CHUNK_BYTES = 64 * 1024 * 1024
+BYTES_PER_STEP = 6 * 8
+
+_cache = OrderedDict()
+CACHE_SIZE = 16
+
+
+def r_multiples(trades):
+    """R multiples (closed_at / risk) of the closed trades of a trade DataFrame"""
+    if trades.empty:
+        return np.empty(0)
+    closed = trades[(trades['status'] == 'CLOSED') & (trades['risk'] > 0)]
+    r = closed['closed_at'].to_numpy(dtype=float) / closed['risk'].to_numpy(dtype=float)
+    return r[~np.isnan(r)]
+
+
+def _shared_r_multiples(name):
+    """R multiples read from an account published with TradingProfile.share_trades"""
+    view = SharedTradeView(name)
+    try:
+        closed = view.mask('status', 'CLOSED') & (view.column('risk') > 0)
+        r = view.column('closed_at')[closed] / view.column('risk')[closed]
+        return r[~np.isnan(r)]
+    finally:
+        view.close()
+
+
+def _percentiles(values):
+    return {p: float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _simulate_chunk(args):
+    """Run one block of paths, returns per path final balance, drawdowns, ruin and the band equity"""
+    r, seed, n_paths, n_trades, start_balance, risk_per_trade, ruin_balance, keep_paths, steps = args
+    if isinstance(r, str):
+        r = _shared_r_multiples(r)
+    rng = np.random.default_rng(seed)
+    samples = r[rng.integers(0, len(r), size=(n_paths, n_trades))]
+    equity = start_balance + np.cumsum(samples * risk_per_trade, axis=1)
+
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), start_balance)
+    drawdown = peak - equity
+    max_drawdown = drawdown.max(axis=1)
+    max_drawdown_pct = (drawdown / peak).max(axis=1) * 100
+    ruined = equity.min(axis=1) <= ruin_balance
+    # A view of the last column would keep the whole chunk alive
+    return (equity[:, -1].copy(), max_drawdown, max_drawdown_pct, ruined,
+            equity[:keep_paths, steps].astype(np.float32) if keep_paths else None)
+
+
+def simulate(r, start_balance, risk_per_trade, n_paths=100000, n_trades=None,
+             ruin_balance=0.0, seed=None, workers=1, chunk_size=None, shared_name=None,
+             chunk_bytes=CHUNK_BYTES):
+    """Bootstrap the R multiple history into n_paths equity curves
+
+    Each path resamples n_trades R multiples with replacement (by default as
+    many trades as the history) and risks `risk_per_trade` on each of them.
+    Paths are run in chunks of `chunk_size` paths, by default as many as fit
+    in `chunk_bytes` for the path length, across `workers` processes when
+    workers > 1. Results only depend on the seed and chunk size, not on the
+    number of workers.
+    With shared_name, workers read the trades from shared memory instead of
+    receiving a pickled copy of r.
+    """
+    r = np.asarray(r, dtype=float)
+    if len(r) == 0:
+        raise ValueError("No closed trades to simulate")
+    n_trades = n_trades or len(r)
+    chunk_size = chunk_size or max(1, chunk_bytes // (n_trades * BYTES_PER_STEP))
+    steps = np.unique(np.linspace(0, n_trades - 1, min(n_trades, BAND_STEPS)).round().astype(int))
+
+    sizes = [chunk_size] * (n_paths // chunk_size)
+    if n_paths % chunk_size:
+        sizes.append(n_paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    kept = 0
+    jobs = []
+    source = shared_name if shared_name is not None and workers > 1 else r
+    for size, chunk_seed in zip(sizes, seeds):
+        jobs.append((source, chunk_seed, size, n_trades, start_balance, risk_per_trade,
+                     ruin_balance, max(0, min(size, BAND_PATHS - kept)), steps))
+        kept += size
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_simulate_chunk, jobs))
+    else:
+        chunks = [_simulate_chunk(job) for job in jobs]
+
+    final_balance = np.concatenate([chunk[0] for chunk in chunks])
+    max_drawdown = np.concatenate([chunk[1] for chunk in chunks])
+    max_drawdown_pct = np.concatenate([chunk[2] for chunk in chunks])
+    ruined = np.concatenate([chunk[3] for chunk in chunks])
+    equity = np.concatenate([chunk[4] for chunk in chunks if chunk[4] is not None])
+
+    return {
+        'paths': n_paths,
+        'trades_per_path': n_trades,
+        'probability_of_ruin': float(ruined.mean()),
+        'final_balance': _percentiles(final_balance),
+        'max_drawdown': _percentiles(max_drawdown),
+        'max_drawdown_pct': _percentiles(max_drawdown_pct),
+        'drawdown_histogram': np.histogram(max_drawdown_pct, bins=50),
+        # Band values after band_steps[i] + 1 trades
+        'band_steps': steps + 1,
+        'equity_bands': dict(zip(PERCENTILES, np.percentile(equity, PERCENTILES, axis=0))),
+    }
+
+
+def simulate_account(profile, n_paths=100000, n_trades=None, risk_per_trade=None,
+                     ruin_balance=0.0, seed=0, workers=1):
+    """Simulate an account from its closed trades, archived ones included, cached per account version
+
+    risk_per_trade defaults to the average risk of the account's trades.
+    """
+    version = profile.history.version if profile.history is not None else None
+    key = (profile.name, version, n_paths, n_trades, risk_per_trade, ruin_balance, seed)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    trades = profile.all_trades()
+    r = r_multiples(trades.to_frame())
+    if risk_per_trade is None:
+        risk_per_trade = float(trades.column('risk').mean()) if len(trades) else 0.0
+    shared_name = profile.share_trades(trades) if workers > 1 else None
+    result = simulate(r, float(profile.balance), risk_per_trade, n_paths=n_paths, n_trades=n_trades,
+                      ruin_balance=ruin_balance, seed=seed, workers=workers, shared_name=shared_name)
+
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
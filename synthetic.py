@@ -0,0 +1,192 @@
+import os
+import sys
+import argparse
+import datetime
+import numpy as np
+from openpyxl import Workbook
+from trade import COLUMNS, DATE_COLUMNS, TradeColumns
+from model import TradingProfile, file_signature
+
+DEFAULT_PAIRS = {"EURUSD": 0.3, "GBPUSD": 0.2, "USDJPY": 0.15, "XAUUSD": 0.15, "US30": 0.1, "BTCUSD": 0.1}
+# Data rows of an Excel sheet, below the header
+EXCEL_MAX_ROWS = 1048575
+
+
+def _codes(rng, labels, n, weights=None):
+    """Object array of n interned labels drawn with the given weights"""
+    labels = np.array([sys.intern(label) for label in labels], dtype=object)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+        weights = weights / weights.sum()
+    return labels[rng.choice(len(labels), n, p=weights)]
+
+
+def generate_trades(n_trades, seed=0, pairs=None, win_rate=0.45, rewards=(1, 2, 3), reward_weights=None,
+                    manual_rate=0.1, risk=100.0, start_balance=10000.0,
+                    start_date=datetime.datetime(2020, 1, 1), trades_per_day=3.0, open_trades=0,
+                    mean_hold_hours=6.0):
+    """TradeColumns store of reproducible synthetic trades
+
+    The same seed and parameters always give the same account. Trades reach
+    their reward (TP) with probability win_rate and lose 1R (SL) otherwise;
+    a manual_rate share is closed by hand anywhere between -1R and the reward.
+    Every trade risks the same amount and is held for an exponentially
+    distributed time around mean_hold_hours. The last open_trades stay open.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(n_trades)
+    pairs = pairs or DEFAULT_PAIRS
+
+    pair = _codes(rng, list(pairs), n, list(pairs.values()))
+    position = _codes(rng, ["buy", "sell"], n)
+    reward = rng.choice(np.asarray(rewards, dtype=np.int64), n,
+                        p=None if reward_weights is None else np.asarray(reward_weights) / np.sum(reward_weights))
+
+    # Outcome of each trade in R
+    win = rng.random(n) < win_rate
+    manual = rng.random(n) < manual_rate
+    r = np.where(win, reward, -1.0)
+    r = np.where(manual, rng.uniform(-1.0, reward), r)
+    result = np.where(manual, "MANUAL", np.where(win, "TP", "SL")).astype(object)
+
+    risk = np.full(n, float(risk))
+    closed_at = np.round(risk * r, 2)
+
+    status = np.full(n, sys.intern("CLOSED"), dtype=object)
+    n_open = min(int(open_trades), n)
+    if n_open:
+        status[n - n_open:] = sys.intern("OPEN")
+        result[n - n_open:] = None
+        closed_at[n - n_open:] = np.nan
+    result[:n - n_open] = [sys.intern(value) for value in result[:n - n_open]]
+
+    gaps = rng.exponential(86400.0 / trades_per_day, n).astype('timedelta64[s]')
+    date = np.datetime64(start_date, 's') + np.cumsum(gaps)
+    held = rng.exponential(mean_hold_hours * 3600.0, n).astype('timedelta64[s]')
+    closed_time = date + held
+    closed_time[n - n_open:] = np.datetime64('NaT')
+
+    # Balances follow the close order, like the account ledger
+    order = np.argsort(closed_time[:n - n_open], kind='stable')
+    balance = np.full(n, np.nan)
+    balance[order] = start_balance + np.cumsum(closed_at[order])
+
+    return TradeColumns.from_columns({
+        'trade_id': np.arange(1, n + 1, dtype=np.int64),
+        'pair': pair,
+        'position': position,
+        'risk': risk,
+        'reward': reward,
+        'status': status,
+        'result': result,
+        'closed_at': closed_at,
+        'balance': balance,
+        'date': date.astype('datetime64[us]'),
+        'closed_time': closed_time.astype('datetime64[us]'),
+    })
+
+
+def add_screenshots(trades, account_name, count, seed=0, size=(1280, 720), policy=None):
+    """Write generated before/after screenshots for the last count trades"""
+    from PyQt5.QtGui import QImage, QColor, QPainter
+    from images import ImagePolicy, store_image
+
+    policy = policy or ImagePolicy.load()
+    rng = np.random.default_rng(seed)
+    prefix = f"./assets/{account_name.replace(' ', '')}"
+    width, height = size
+    for row in range(max(len(trades) - count, 0), len(trades)):
+        trade = trades.trade_at(row)
+        paths = {}
+        for zone in ("before", "after"):
+            image = QImage(width, height, QImage.Format_RGB32)
+            image.fill(QColor("#131722"))
+            painter = QPainter(image)
+            # A random walk of candles so the files compress like real charts
+            closes = height / 2 + np.cumsum(rng.normal(0, height / 80, 120))
+            for i, close in enumerate(closes):
+                top = int(min(close, closes[i - 1] if i else close))
+                color = QColor("#26a69a") if i == 0 or close >= closes[i - 1] else QColor("#ef5350")
+                painter.fillRect(int(i * width / 120), top, max(int(width / 160), 1), 4 + int(rng.integers(0, 30)), color)
+            painter.end()
+            path = f"{prefix}_{trade.trade_id}_{zone}{policy.extension}"
+            store_image(image, path, policy)
+            paths[zone] = path
+        trades.update(trade.copy(**paths))
+
+
+def write_workbook(path, trades):
+    """Write a trade store straight to the workbook format, streaming the rows"""
+    if len(trades) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(trades)} trades do not fit in a workbook")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(COLUMNS))
+    columns = []
+    for col in COLUMNS:
+        values = trades.column(col)
+        if col in DATE_COLUMNS:
+            values = values.astype('datetime64[s]').astype(object)
+        else:
+            values = values.tolist()
+        columns.append(values)
+    for row in zip(*columns):
+        # NaN and None cells are left empty, like pandas writes them
+        sheet.append([None if value != value else value for value in row])
+    workbook.save(path)
+
+
+def write_account(name, trades, start_balance=10000.0, direct=False):
+    """Store a generated account so the application opens it like any other
+
+    The trades go through the TradingProfile storage layer, or straight to
+    the workbook with write_workbook when direct is True. The profile row,
+    rollups and a history checkpoint are written as well.
+    """
+    profile = TradingProfile()
+    # The creation checkpoint records the starting balance the history derives balances from
+    profile.balance = start_balance
+    profile.create_account(name)
+    profile.trades = trades
+    profile.balance = start_balance + float(np.nansum(trades.column('closed_at')))
+    profile.check_results()
+    profile.current_trade_id = trades.next_trade_id()
+    # Derived state of the returned profile, so trades can be closed on it right away
+    profile.ledger.rebuild(trades, profile.balance)
+    profile.exposure.rebuild(trades)
+    profile.rollups.rebuild(trades)
+    profile.durations.rebuild(trades)
+    if direct:
+        write_workbook(profile.database_path, trades)
+        profile.trades_signature = file_signature(profile.database_path)
+    else:
+        profile.save_trades()
+    profile.rollups.save(profile.rollups_path, profile.trades_signature)
+    profile.save_profile_data()
+    profile.history.write_checkpoint(trades, profile.profile_state(), op="import")
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic trading account")
+    parser.add_argument("name")
+    parser.add_argument("--trades", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--win-rate", type=float, default=0.45)
+    parser.add_argument("--risk", type=float, default=100.0)
+    parser.add_argument("--balance", type=float, default=10000.0, help="starting balance")
+    parser.add_argument("--per-day", type=float, default=3.0, help="average trades per day")
+    parser.add_argument("--open", type=int, default=0, help="number of trades left open")
+    parser.add_argument("--screenshots", type=int, default=0, help="trades given generated screenshots")
+    parser.add_argument("--direct", action="store_true", help="stream the workbook instead of using pandas")
+    args = parser.parse_args()
+
+    trades = generate_trades(args.trades, seed=args.seed, win_rate=args.win_rate,
+                             risk=args.risk, start_balance=args.balance, trades_per_day=args.per_day,
+                             open_trades=args.open)
+    if args.screenshots:
+        from PyQt5.QtGui import QGuiApplication
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        app = QGuiApplication(sys.argv[:1])
+        add_screenshots(trades, args.name, args.screenshots, seed=args.seed)
+    write_account(args.name, trades, start_balance=args.balance, direct=args.direct)
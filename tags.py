@@ -0,0 +1,179 @@
+import os
+import numpy as np
+import vault
+
+
+def normalize_tag(tag):
+    """Tags are matched case-insensitively, 'Setup: Breakout' -> 'setup:breakout'"""
+    return ":".join(part.strip() for part in str(tag).split(":")).strip().lower()
+
+
+def parse_tags(text):
+    """Tags typed as a comma separated list"""
+    return [tag for tag in (normalize_tag(part) for part in text.split(",")) if tag]
+
+
+class TradeTags:
+    """Tags and notes attached to the trades of an account
+
+    Tag names are stored once in a tag table and trades refer to them by id.
+    An inverted index maps each tag id to its trade ids, so "all trades tagged
+    X" is a dictionary lookup. Setup and session metadata are plain tags with
+    a prefix, e.g. "setup:breakout" or "session:london".
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.tag_ids = {}  # name -> tag id
+        self.names = []  # tag id -> name
+        self.trade_tags = {}  # trade_id -> set of tag ids
+        self.index = {}  # tag id -> set of trade_ids
+        self.notes = {}  # trade_id -> note
+
+    def _tag_id(self, name):
+        tag_id = self.tag_ids.get(name)
+        if tag_id is None:
+            tag_id = len(self.names)
+            self.tag_ids[name] = tag_id
+            self.names.append(name)
+        return tag_id
+
+    def tags_of(self, trade_id):
+        """Sorted tag names of a trade"""
+        return sorted(self.names[tag_id] for tag_id in self.trade_tags.get(int(trade_id), ()))
+
+    def set_tags(self, trade_id, tags):
+        """Replace the tags of a trade"""
+        trade_id = int(trade_id)
+        new = {self._tag_id(tag) for tag in (normalize_tag(tag) for tag in tags) if tag}
+        old = self.trade_tags.get(trade_id, set())
+        for tag_id in old - new:
+            self.index[tag_id].discard(trade_id)
+            if not self.index[tag_id]:
+                del self.index[tag_id]
+        for tag_id in new - old:
+            self.index.setdefault(tag_id, set()).add(trade_id)
+        if new:
+            self.trade_tags[trade_id] = new
+        else:
+            self.trade_tags.pop(trade_id, None)
+
+    def add_tag(self, trade_id, tag):
+        self.set_tags(trade_id, self.tags_of(trade_id) + [tag])
+
+    def remove_tag(self, trade_id, tag):
+        tag = normalize_tag(tag)
+        self.set_tags(trade_id, [name for name in self.tags_of(trade_id) if name != tag])
+
+    def note_of(self, trade_id):
+        return self.notes.get(int(trade_id), "")
+
+    def set_note(self, trade_id, note):
+        note = (note or "").strip()
+        if note:
+            self.notes[int(trade_id)] = note
+        else:
+            self.notes.pop(int(trade_id), None)
+
+    def remove_trade(self, trade_id):
+        """Forget the tags and note of a deleted trade"""
+        self.set_tags(trade_id, [])
+        self.set_note(trade_id, "")
+
+    def trades_with(self, tag):
+        """Set of the trade ids carrying a tag"""
+        tag_id = self.tag_ids.get(normalize_tag(tag))
+        return set(self.index.get(tag_id, ())) if tag_id is not None else set()
+
+    def trades_with_all(self, tags):
+        """Trade ids carrying every one of the tags"""
+        postings = sorted((self.trades_with(tag) for tag in tags), key=len)
+        if not postings:
+            return set()
+        result = postings[0]
+        for posting in postings[1:]:
+            result &= posting
+        return result
+
+    def tag_counts(self, prefix=""):
+        """Number of trades per tag, for the tags starting with prefix"""
+        return {self.names[tag_id]: len(trade_ids) for tag_id, trade_ids in self.index.items()
+                if self.names[tag_id].startswith(prefix)}
+
+    def sums(self, trades, prefix=""):
+        """Trades, closed trades, wins, P&L and total R of each tag in a TradeColumns store
+
+        Returns {tag: [trades, closed, wins, pnl, r]}. Sums of several stores
+        add up, the archive keeps the sums of its trades.
+        """
+        closed_at = trades.column('closed_at')
+        risk = trades.column('risk')
+        closed_rows = trades.column('status') == 'CLOSED'
+        sums = {}
+        for tag_id, trade_ids in self.index.items():
+            name = self.names[tag_id]
+            if not name.startswith(prefix):
+                continue
+            rows = np.fromiter((row for row in map(trades.row_of, trade_ids) if row is not None), dtype=np.int64)
+            count = len(rows)
+            rows = rows[closed_rows[rows] & ~np.isnan(closed_at[rows])]
+            pnl = closed_at[rows]
+            r = np.divide(pnl, risk[rows], out=np.zeros(len(rows)), where=risk[rows] > 0)
+            sums[name] = [count, len(rows), int((pnl > 0).sum()), float(pnl.sum()), float(r.sum())]
+        return sums
+
+    @staticmethod
+    def merge_sums(sums, other):
+        """Add the tag sums of `other` to `sums`"""
+        for name, values in other.items():
+            sums[name] = [a + b for a, b in zip(sums.get(name, [0, 0, 0, 0.0, 0.0]), values)]
+        return sums
+
+    def stats(self, trades, prefix="", archived=None):
+        """Aggregates of the closed trades of each tag in a TradeColumns store
+
+        archived holds the sums of the archived trades, added to those of
+        the store. Returns {tag: {'trades', 'closed', 'wins', 'winrate',
+        'pnl', 'avg_r'}}.
+        """
+        sums = self.sums(trades, prefix)
+        if archived:
+            self.merge_sums(sums, {name: values for name, values in archived.items() if name.startswith(prefix)})
+        return {name: {
+            'trades': count,
+            'closed': closed,
+            'wins': wins,
+            'winrate': wins / closed * 100 if closed else 0.0,
+            'pnl': pnl,
+            'avg_r': r / closed if closed else 0.0,
+        } for name, (count, closed, wins, pnl, r) in sums.items()}
+
+    def save(self, path, key=None):
+        """Write the tag table, the trade tags and the notes, encrypted with key"""
+        try:
+            vault.write_json({"tags": self.names,
+                              "trades": {str(t): sorted(ids) for t, ids in self.trade_tags.items()},
+                              "notes": {str(t): note for t, note in self.notes.items()}}, path, key)
+        except Exception as e:
+            print(f"Error saving tags: {e}")
+
+    def load(self, path, key=None):
+        """Load saved tags and rebuild the inverted index"""
+        self.reset()
+        if not os.path.exists(path):
+            return False
+        try:
+            data = vault.read_json(path, key)
+        except Exception as e:
+            print(f"Error loading tags: {e}")
+            return False
+        self.names = list(data.get("tags", []))
+        self.tag_ids = {name: tag_id for tag_id, name in enumerate(self.names)}
+        for trade_id, tag_ids in data.get("trades", {}).items():
+            self.trade_tags[int(trade_id)] = set(tag_ids)
+            for tag_id in tag_ids:
+                self.index.setdefault(tag_id, set()).add(int(trade_id))
+        self.notes = {int(t): note for t, note in data.get("notes", {}).items()}
+        return True
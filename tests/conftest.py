@@ -0,0 +1,23 @@
+import os
+import sys
+import pytest
+
+# The modules live at the root of the repository and use paths relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Empty ./database and ./assets folders for the accounts of a test"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("database/users")
+    os.makedirs("assets")
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    from PyQt5.QtGui import QGuiApplication
+    return QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
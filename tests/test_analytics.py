@@ -0,0 +1,46 @@
+import datetime
+import numpy as np
+from analytics import DurationStats, account_duration_stats, duration_stats
+from model import TradingProfile
+from trade import Trade
+
+
+def _close(profile, trade_id, pnl, opened, hours):
+    return profile.close_trade(Trade(trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result="MANUAL",
+                                     closed_time=opened + datetime.timedelta(hours=hours)))
+
+
+def _assert_same(stats, expected):
+    for grid in ('holding', 'hours', 'sessions'):
+        for key in ('count', 'pnl', 'winrate'):
+            assert np.allclose(stats[grid][key], expected[grid][key])
+    assert stats['holding']['median_hold'] == expected['holding']['median_hold']
+
+
+def test_duration_stats_follow_trade_changes(workdir):
+    profile = TradingProfile()
+    profile.create_account("Durations")
+    opened = datetime.datetime(2024, 3, 4, 9, 30)
+    for hours, pnl in ((1, 20), (30, -10), (5, 15)):
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, opened)
+        _close(profile, trade.trade_id, pnl, opened, hours)
+    profile.reopen_trade(2)
+    profile.delete_trade(3)
+    _assert_same(account_duration_stats(profile), duration_stats(profile.trades))
+
+    before = account_duration_stats(profile)
+    profile.place_trade(profile.current_trade_id, "EURUSD", "sell", 10, 2, opened)
+    _assert_same(account_duration_stats(profile), before)
+    assert account_duration_stats(profile)['holding']['count'].sum() == 1
+
+
+def test_duration_sums_merge_and_round_trip():
+    opened = np.array(['2024-03-04T09:30', '2024-03-05T15:00', '2024-03-06T02:00'], dtype='datetime64[us]')
+    stats = DurationStats()
+    stats._add(opened, np.array([10.0, -5.0, 3.0]), np.array([600.0, np.nan, 7200.0]), 1)
+    copy = DurationStats.from_dict(stats.to_dict())
+    copy.merge(stats)
+    copy.merge(stats, -1)
+    _assert_same(copy.stats(), stats.stats())
+    assert stats.stats()['holding']['median_hold'] == (10 + 120) * 30
+    assert stats.stats()['hours']['count'].sum() == 3
@@ -0,0 +1,91 @@
+import datetime
+import numpy as np
+import pytest
+import vault
+from analytics import account_duration_stats
+from archive import DEFAULT_AGE_DAYS
+from images import ImagePolicy, store_image
+from model import TradingProfile
+from trade import Trade
+
+
+def _account_with_screenshot(name, qt_app):
+    from PyQt5.QtGui import QImage, QColor
+    profile = TradingProfile()
+    profile.create_account(name)
+    trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, datetime.datetime(2024, 1, 1))
+    image = QImage(64, 48, QImage.Format_RGB32)
+    image.fill(QColor("#26a69a"))
+    path = f"./assets/{name}_{trade.trade_id}_before.png"
+    assert store_image(image, path, ImagePolicy(format="PNG"), encryption_key=vault.key_for(name))
+    profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=20, result="TP",
+                              closed_time=datetime.datetime(2024, 1, 2), before=path))
+    return profile, path
+
+
+@pytest.mark.skipif(not vault.available(), reason="needs the cryptography package")
+def test_archived_screenshots_of_encrypted_account_are_readable(workdir, qt_app):
+    from PyQt5.QtGui import QImage
+    vault.protect("Enc", "pass phrase")
+    profile, path = _account_with_screenshot("Enc", qt_app)
+    assert vault.is_encrypted(path)
+
+    assert profile.archive_trades(datetime.datetime(2024, 6, 1)) == 1
+    loaded = TradingProfile()
+    assert loaded.load_account("Enc")
+    data = loaded.archive.image_bytes(path)
+    assert not data.startswith(vault.MAGIC)
+    image = QImage.fromData(data)
+    assert not image.isNull() and image.width() == 64
+    # Archive files, manifest included, are encrypted like the rest of the account
+    assert all(vault.is_encrypted(file) for file in loaded.archive.files())
+
+
+def test_archiving_on_load_is_explicit_and_keeps_stats(workdir):
+    profile = TradingProfile()
+    profile.create_account("Aged")
+    now = datetime.datetime.now()
+    for days, pnl, result in ((200, 20, "TP"), (150, -10, "SL"), (1, 30, "TP")):
+        opened = now - datetime.timedelta(days=days)
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, opened)
+        profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result=result,
+                                  closed_time=opened + datetime.timedelta(hours=2)))
+        profile.set_trade_metadata(trade.trade_id, ["setup:breakout"], "")
+    expected = {'tags': profile.tag_stats(), 'durations': account_duration_stats(profile)}
+
+    plain = TradingProfile()
+    assert plain.load_account("Aged")
+    assert len(plain.archive) == 0 and len(plain.trades) == 3
+
+    loaded = TradingProfile()
+    assert loaded.load_account("Aged", archive_days=DEFAULT_AGE_DAYS)
+    assert len(loaded.archive) == 2 and len(loaded.trades) == 1
+    # Statistics come from the manifest, no segment is read
+    loaded.archive.segment = None
+    assert loaded.tag_stats() == expected['tags']
+    durations = account_duration_stats(loaded)
+    for grid in ('holding', 'hours', 'sessions'):
+        for key in ('count', 'pnl', 'winrate'):
+            assert np.allclose(durations[grid][key], expected['durations'][grid][key])
+    x, balance, r_counts = loaded.archived_points()
+    assert list(balance) == [10020, 10010] and sum(r_counts.values()) == 2
+
+
+def test_manifests_without_sums_are_summarized_on_load(workdir):
+    profile = TradingProfile()
+    profile.create_account("Old")
+    opened = datetime.datetime.now() - datetime.timedelta(days=200)
+    trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, opened)
+    profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=20, result="TP",
+                              closed_time=opened + datetime.timedelta(hours=2)))
+    profile.set_trade_metadata(trade.trade_id, ["setup:breakout"], "")
+    assert profile.archive_trades(opened + datetime.timedelta(days=1)) == 1
+    data = vault.read_json(profile.archive.manifest_path)
+    for key in ("durations", "tags", "r_counts"):
+        del data[key]
+    vault.write_json(data, profile.archive.manifest_path)
+
+    loaded = TradingProfile()
+    assert loaded.load_account("Old")
+    assert loaded.tag_stats()["setup:breakout"]['pnl'] == 20
+    assert "durations" in vault.read_json(loaded.archive.manifest_path)
@@ -0,0 +1,82 @@
+import datetime
+from commands import CommandLog, PlaceTradeCommand, CloseTradeCommand, DeleteTradeCommand
+from model import TradingProfile
+from trade import Trade
+
+NOW = datetime.datetime(2024, 1, 1)
+
+
+def _account(name):
+    profile = TradingProfile()
+    profile.balance = 1000
+    profile.create_account(name)
+    return profile
+
+
+def _close(trade_id, pnl):
+    return Trade(trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result="TP",
+                 closed_time=NOW + datetime.timedelta(hours=trade_id))
+
+
+def test_undo_and_redo_place_close_delete(workdir):
+    profile = _account("Undo")
+    log = CommandLog()
+    added, _, _ = log.execute(PlaceTradeCommand("EURUSD", "buy", 10, 2, NOW), profile)
+    trade_id = added[0].trade_id
+    log.execute(CloseTradeCommand(_close(trade_id, 20)), profile)
+    assert profile.balance == 1020
+
+    command, changes = log.undo(profile)
+    assert isinstance(command, CloseTradeCommand)
+    assert profile.get_trade(trade_id).is_open and profile.balance == 1000
+    log.redo(profile)
+    assert not profile.get_trade(trade_id).is_open and profile.balance == 1020
+
+    log.execute(DeleteTradeCommand(trade_id), profile)
+    assert profile.get_trade(trade_id) is None and profile.balance == 1000
+    log.undo(profile)
+    assert profile.get_trade(trade_id).closed_at == 20 and profile.balance == 1020
+
+    # Undo everything back to the empty account, then replay it
+    log.undo(profile)
+    log.undo(profile)
+    assert profile.get_trade(trade_id) is None and log.undo(profile) == (None, None)
+    for _ in range(3):
+        log.redo(profile)
+    assert profile.get_trade(trade_id) is None and profile.balance == 1000
+
+
+def test_delete_undo_brings_back_tags_and_note(workdir):
+    profile = _account("Tags")
+    log = CommandLog()
+    trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, NOW)
+    profile.set_trade_metadata(trade.trade_id, ["breakout"], "clean entry")
+    log.execute(DeleteTradeCommand(trade.trade_id), profile)
+    assert profile.tags.tags_of(trade.trade_id) == []
+    log.undo(profile)
+    assert profile.tags.tags_of(trade.trade_id) == ["breakout"]
+    assert profile.tags.note_of(trade.trade_id) == "clean entry"
+
+
+def test_trade_changed_elsewhere_is_not_undone(workdir):
+    profile = _account("Stale")
+    log = CommandLog()
+    added, _, _ = log.execute(PlaceTradeCommand("EURUSD", "buy", 10, 2, NOW), profile)
+    # Closed outside the log, e.g. from another view
+    profile.close_trade(_close(added[0].trade_id, 5))
+    command, changes = log.undo(profile)
+    assert changes is None
+    assert profile.get_trade(added[0].trade_id).closed_at == 5
+    assert not log.undo_stack and not log.redo_stack
+
+
+def test_new_command_clears_redo_and_limit_drops_oldest(workdir):
+    profile = _account("Limit")
+    log = CommandLog(limit=2)
+    for _ in range(3):
+        log.execute(PlaceTradeCommand("EURUSD", "buy", 10, 2, NOW), profile)
+    assert len(log.undo_stack) == 2
+    log.undo(profile)
+    assert len(log.redo_stack) == 1
+    log.execute(PlaceTradeCommand("GBPUSD", "sell", 10, 2, NOW), profile)
+    assert not log.redo_stack
@@ -0,0 +1,53 @@
+from exposure import ExposureMonitor, read_limits
+from trade import Trade, TradeColumns
+
+
+def _open(trade_id, pair, position, risk):
+    return Trade(trade_id, pair, position, risk, 2)
+
+
+def _store(trades):
+    store = TradeColumns()
+    for trade in trades:
+        store.append(trade)
+    return store
+
+
+def test_apply_matches_rebuild():
+    trades = [_open(1, "EURUSD", "buy", 10), _open(2, "EURUSD", "sell", 5),
+              _open(3, "GBPUSD", "buy", 20), _open(4, None, None, 7)]
+    applied = ExposureMonitor()
+    for trade in trades:
+        applied.apply(None, trade)
+    rebuilt = ExposureMonitor()
+    rebuilt.rebuild(_store(trades))
+    assert dict(rebuilt.per_pair) == dict(applied.per_pair) == {"EURUSD": 15, "GBPUSD": 20, None: 7}
+    assert dict(rebuilt.per_direction) == dict(applied.per_direction)
+    assert rebuilt.total == applied.total == 42
+    assert rebuilt.open_trades == applied.open_trades == 4
+
+
+def test_close_after_rebuild_empties_buckets():
+    trades = [_open(1, "EURUSD", "buy", 10), _open(2, None, None, 7)]
+    monitor = ExposureMonitor()
+    monitor.rebuild(_store(trades))
+    for trade in trades:
+        closed = Trade(trade.trade_id, trade.pair, trade.position, trade.risk, 2,
+                       status='CLOSED', closed_at=5, result="MANUAL")
+        monitor.apply(trade, closed)
+    assert not monitor.per_pair and not monitor.per_direction
+    assert monitor.total == 0 and monitor.open_trades == 0
+
+
+def test_check_and_saved_limits(tmp_path):
+    path = str(tmp_path / "limits.json")
+    monitor = ExposureMonitor(max_total=50, max_per_pair=20)
+    monitor.apply(None, _open(1, "EURUSD", "buy", 15))
+    assert monitor.check("GBPUSD", "buy", 10) == []
+    assert len(monitor.check("EURUSD", "buy", 10)) == 1
+    assert len(monitor.check("EURUSD", "buy", 40)) == 2
+    assert monitor.save_limits("demo", path)
+    assert read_limits(path)["demo"]["max_per_pair"] == 20
+    other = ExposureMonitor()
+    other.load_limits("demo", path)
+    assert other.limits() == monitor.limits()
@@ -0,0 +1,61 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from fx import FXRates, format_amount, portfolio_summary
+from trade import Trade, TradeColumns
+
+
+def _rates():
+    rates = FXRates()
+    rates.set_frame(pd.DataFrame({'date': ["2024-01-05", "2024-01-01", "2024-01-03"],
+                                  'EUR': [1.2, 1.0, np.nan], 'gbp': [1.3, 1.5, 1.4]}))
+    return rates
+
+
+def test_missing_days_are_interpolated():
+    rates = _rates()
+    dates = np.array(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-05"], dtype='datetime64[D]')
+    assert rates.rate("EUR", dates) == pytest.approx([1.0, 1.05, 1.1, 1.2])
+    assert rates.rate("GBP", dates) == pytest.approx([1.5, 1.45, 1.4, 1.3])
+    assert rates.currencies == ["EUR", "GBP", "USD"]
+
+
+def test_dates_outside_the_file_and_undated_values():
+    rates = _rates()
+    dates = np.array(["2023-12-01", "2024-02-01", "NaT"], dtype='datetime64[D]')
+    assert rates.rate("EUR", dates) == pytest.approx([1.0, 1.2, 1.2])
+    assert rates.rate("eur") == 1.2
+    with pytest.raises(KeyError):
+        rates.rate("CHF")
+
+
+def test_convert_between_currencies():
+    rates = _rates()
+    day = np.array(["2024-01-05"], dtype='datetime64[D]')
+    assert rates.convert([100], "EUR", "GBP", day) == pytest.approx([100 * 1.2 / 1.3])
+    assert rates.convert([100], None, "EUR", day) == pytest.approx([100 / 1.2])
+    assert rates.convert([100], "GBP", "gbp").tolist() == [100.0]
+    assert format_amount(12.5, "EUR") == "€12.50"
+    assert format_amount(12.5, "CHF") == "12.50 CHF"
+
+
+def test_portfolio_summary_converts_pnl_at_close_date():
+    rates = _rates()
+    trades = TradeColumns()
+    trades.append(Trade(1, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=10, result="TP",
+                        closed_time=datetime.datetime(2024, 1, 1)))
+    trades.append(Trade(2, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=-10, result="SL",
+                        closed_time=datetime.datetime(2024, 1, 5)))
+    summary = portfolio_summary([("EUR", 100, trades), ("USD", 50, None)], "USD", rates)
+    assert summary['balance'] == pytest.approx(170)
+    assert summary['pnl'] == pytest.approx(10 - 12)
+    assert summary['closed'] == 2 and summary['winrate'] == 50.0
+    assert summary['by_currency'] == pytest.approx({"EUR": 120, "USD": 50})
+
+
+def test_load_missing_or_csv_file(tmp_path):
+    assert FXRates.load(str(tmp_path / "missing.csv")).currencies == ["USD"]
+    path = tmp_path / "rates.csv"
+    path.write_text("date,EUR\n2024-01-01,1.1\n")
+    assert FXRates.load(str(path)).rate("EUR") == 1.1
@@ -0,0 +1,68 @@
+import datetime
+from model import TradingProfile
+from trade import Trade
+
+
+def _closed_account(name, results):
+    """Account with one trade per result, closed in order"""
+    profile = TradingProfile()
+    profile.balance = 1000
+    profile.create_account(name)
+    now = datetime.datetime(2024, 1, 1)
+    for i, closed_at in enumerate(results):
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, now)
+        close_time = now + datetime.timedelta(hours=i + 1)
+        profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=closed_at,
+                                  result="TP" if closed_at > 0 else "SL", closed_time=close_time))
+    return profile
+
+
+def _balances(trades):
+    return dict(zip(trades.column('trade_id').tolist(), trades.column('balance').tolist()))
+
+
+def test_state_at_follows_restamped_balances_after_delete(workdir):
+    profile = _closed_account("Hist", [-10, -10, 20])
+    profile.delete_trade(1)
+    assert _balances(profile.trades) == {2: 990.0, 3: 1010.0}
+
+    trades, state = profile.history.state_at(profile.history.version)
+    assert _balances(trades) == _balances(profile.trades)
+    assert state['balance'] == profile.balance
+
+
+def test_state_at_follows_restamped_balances_after_edit(workdir):
+    profile = _closed_account("Edit", [-10, 20, 20])
+    profile.reopen_trade(1)
+    profile.close_trade(Trade(1, "EURUSD", "buy", 10, 2, closed_at=20, result="TP",
+                              closed_time=datetime.datetime(2024, 1, 1, 1)))
+    live = _balances(profile.trades)
+    assert live == {1: 1020.0, 2: 1040.0, 3: 1060.0}
+
+    assert _balances(profile.history.state_at(profile.history.version)[0]) == live
+    # Reopened: the later trades no longer include trade 1
+    reopened, _ = profile.history.state_at(profile.history.version - 1)
+    assert {k: v for k, v in _balances(reopened).items() if k != 1} == {2: 1020.0, 3: 1040.0}
+
+
+def test_restore_version_keeps_restamped_balances(workdir):
+    profile = _closed_account("Restore", [-10, -10, 20])
+    profile.delete_trade(1)
+    deleted_version = profile.history.version
+    live = _balances(profile.trades)
+    profile.place_trade(profile.current_trade_id, "GBPUSD", "sell", 10, 2, datetime.datetime(2024, 1, 2))
+
+    assert profile.restore_version(deleted_version)
+    assert _balances(profile.trades) == live
+    assert profile.history.diff(deleted_version, profile.history.version)["changed"] == {}
+
+
+def test_state_at_puts_restored_trades_back_in_place(workdir):
+    profile = _closed_account("Order", [10, -10, 20])
+    removed = profile.get_trade(2)
+    profile.delete_trade(2)
+    profile.restore_trade(removed)
+
+    trades, _ = profile.history.state_at(profile.history.version)
+    assert trades.column('trade_id').tolist() == profile.trades.column('trade_id').tolist() == [1, 2, 3]
+    assert _balances(trades) == _balances(profile.trades)
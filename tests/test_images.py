@@ -0,0 +1,21 @@
+import os
+from images import ImagePolicy, _recompress_file
+
+
+def test_recompress_keeps_the_untouched_original(workdir, qt_app):
+    from PyQt5.QtGui import QImage, QColor
+    image = QImage(800, 600, QImage.Format_RGB32)
+    image.fill(QColor("#26a69a"))
+    path = "./assets/Acc_1_before.jpg"
+    assert image.save(path, "JPEG", 100)
+    with open(path, "rb") as f:
+        source = f.read()
+
+    policy = ImagePolicy(max_width=200, max_height=150, quality=50, keep_original=True,
+                         original_dir="./assets/originals")
+    _, before, after = _recompress_file((path, policy.to_dict()))
+    assert after < before
+    assert os.listdir("./assets/originals") == ["Acc_1_before.jpg"]
+    with open("./assets/originals/Acc_1_before.jpg", "rb") as f:
+        assert f.read() == source
+    assert QImage(path).width() == 200
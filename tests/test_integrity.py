@@ -0,0 +1,47 @@
+import os
+import datetime
+import pytest
+import integrity
+import vault
+from model import TradingProfile
+from trade import Trade
+
+
+def _close(profile, pnl, result):
+    trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, datetime.datetime(2024, 1, 1))
+    profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result=result,
+                              closed_time=datetime.datetime(2024, 1, 2)))
+
+
+def test_manual_closes_count_by_their_pnl(workdir):
+    profile = TradingProfile()
+    profile.create_account("Manual")
+    for pnl, result in ((15, "MANUAL"), (20, "TP"), (-10, "SL")):
+        _close(profile, pnl, result)
+    assert (profile.winning_trades, profile.losing_trades) == (2, 1)
+
+    issues = integrity.scan(repair=True, workers=1)
+    assert [issue.kind for issue in issues if issue.kind in ("counters", "winrate", "balance")] == []
+    loaded = TradingProfile()
+    assert loaded.load_account("Manual")
+    assert (loaded.winning_trades, loaded.losing_trades) == (2, 1)
+    assert not loaded.check_results()
+
+    assert loaded.archive_trades(datetime.datetime(2024, 6, 1)) == 3
+    assert (loaded.archive.totals['wins'], loaded.archive.totals['losses']) == (2, 1)
+    assert not loaded.check_results()
+
+
+@pytest.mark.skipif(not vault.available(), reason="needs the cryptography package")
+def test_screenshots_of_unchecked_accounts_are_not_orphans(workdir):
+    vault.protect("Locked", "pass phrase")
+    profile = TradingProfile()
+    profile.create_account("Locked")
+    for path in ("./assets/Locked_1_before.png", "./assets/stray.png"):
+        with open(path, "wb") as f:
+            f.write(b"png")
+
+    issues = integrity.scan(workers=1)
+    assert "encrypted" in [issue.kind for issue in issues if issue.account == "Locked"]
+    assert [issue.detail for issue in issues if issue.kind == "orphan_asset"] == [
+        os.path.normpath("./assets/stray.png")]
@@ -0,0 +1,62 @@
+import datetime
+import numpy as np
+from ledger import BalanceLedger
+from model import TradingProfile
+from trade import Trade, TradeColumns
+
+START = datetime.datetime(2024, 1, 1)
+
+
+def _closed(trade_id, pnl, hours):
+    return Trade(trade_id, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=pnl, result="MANUAL",
+                 date=START, closed_time=START + datetime.timedelta(hours=hours))
+
+
+def _rebuilt_balances(trades, balance):
+    ledger = BalanceLedger()
+    ledger.rebuild(trades, balance)
+    return {trade.trade_id: ledger.balance_after(trade.trade_id) for trade in trades if not trade.is_open}
+
+
+def test_prefix_balances_in_close_order():
+    trades = TradeColumns()
+    # Closed out of trade_id order
+    for trade_id, pnl, hours in ((1, 10, 3), (2, -5, 1), (3, 20, 2)):
+        trades.append(_closed(trade_id, pnl, hours))
+    ledger = BalanceLedger()
+    ledger.rebuild(trades, 1025)
+    assert ledger.start == 1000
+    assert [ledger.balance_after(t) for t in (2, 3, 1)] == [995, 1015, 1025]
+
+    # Appending past the initial capacity keeps the prefix sums
+    for trade_id in range(4, 40):
+        ledger.apply(None, _closed(trade_id, 1, trade_id))
+    assert ledger.balance == 1025 + 36
+    ids, balances = ledger.stamps()
+    assert ids.tolist() == list(range(4, 40)) and balances[-1] == ledger.balance
+
+
+def test_reopen_and_reclose_match_a_rebuild(workdir):
+    profile = TradingProfile()
+    profile.balance = 1000
+    profile.create_account("Ledger")
+    for i, pnl in enumerate((10, -20, 30, -5, 15)):
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, START)
+        profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result="MANUAL",
+                                  closed_time=START + datetime.timedelta(hours=i + 1)))
+    # Undoing a reopen closes the trade again at its old close time
+    closing = profile.get_trade(2).copy()
+    profile.reopen_trade(2)
+    profile.close_trade(closing)
+    removed = profile.get_trade(4)
+    profile.delete_trade(4)
+    profile.restore_trade(removed)
+    profile.reopen_trade(5)
+    profile.close_trade(Trade(5, "EURUSD", "buy", 10, 2, closed_at=40, result="TP",
+                              closed_time=START + datetime.timedelta(minutes=30)))
+
+    expected = _rebuilt_balances(profile.trades, profile.balance)
+    live = dict(zip(profile.trades.column('trade_id').tolist(), profile.trades.column('balance').tolist()))
+    assert live == expected
+    assert {t: profile.ledger.balance_after(t) for t in expected} == expected
+    assert np.isclose(profile.balance, 1000 + 10 - 20 + 30 - 5 + 40)
@@ -0,0 +1,32 @@
+import pytest
+from quick_entry import SymbolIndex, parse_command
+from trade import Trade, TradeColumns
+
+
+def test_parse_command():
+    assert parse_command("EURUSD b 50 3") == ("EURUSD", "buy", 50.0, 3)
+    assert parse_command("  xauusd short .5 ") == ("XAUUSD", "sell", 0.5, 2)
+    assert parse_command("us30 long 25 1:4", default_reward=1) == ("US30", "buy", 25.0, 4)
+    assert parse_command("btc/usd S 10")[1] == "sell"
+
+
+@pytest.mark.parametrize("text", ["", "EURUSD", "EURUSD up 50", "EURUSD b -5", "EURUSD b 0",
+                                  "EURUSD b 50 0", "EURUSD b 50 11", "EURUSD b 50 3 extra"])
+def test_rejected_commands(text):
+    with pytest.raises(ValueError):
+        parse_command(text)
+
+
+def test_symbols_complete_most_traded_first():
+    trades = TradeColumns()
+    for trade_id, pair in enumerate(["gbpjpy", "GBPUSD", "GBPUSD", None], start=1):
+        trades.append(Trade(trade_id, pair, "buy", 10, 2))
+    index = SymbolIndex.from_trades(trades)
+    assert index.complete("gb") == ["GBPUSD", "GBPJPY"]
+    assert "NONE" not in index.symbols
+    index.add("gbpaud")
+    index.add("GBPAUD")
+    index.add("GBPAUD")
+    assert index.complete("GBP")[0] == "GBPAUD"
+    assert index.complete("EURU") == ["EURUSD"]
+    assert index.complete("ZZ") == []
@@ -0,0 +1,60 @@
+import os
+import datetime
+import pytest
+import model
+from model import TradingProfile
+from registry import AccountRegistry, split_name, check_name
+from trade import Trade
+
+
+def _account_with_screenshot(name):
+    profile = TradingProfile()
+    profile.create_account(name)
+    path = f"./assets/{name}_1_before.png"
+    with open(path, "wb") as f:
+        f.write(b"png")
+    trade = profile.place_trade(1, "EURUSD", "buy", 10, 2, datetime.datetime(2024, 1, 1))
+    profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=20, result="TP",
+                              closed_time=datetime.datetime(2024, 1, 2), before=path))
+    return profile, path
+
+
+def test_unique_and_default_names():
+    registry = AccountRegistry(["Account", "Account_2", "Swing"])
+    assert split_name("Account_12") == ("Account", 12) and split_name("Swing") == ("Swing", 0)
+    assert registry.unique_name("Account") == "Account_3"
+    assert registry.unique_name("Scalp") == "Scalp"
+    registry.remove("Account_2")
+    # Suffixes are not reused
+    assert registry.default_name() == "Account_3"
+    with pytest.raises(ValueError):
+        check_name("a/b")
+
+
+def test_rename_moves_files_and_screenshots(workdir):
+    _account_with_screenshot("Old")
+    registry = AccountRegistry.load()
+    assert registry.rename("Old", "New")
+    assert "New" in registry and "Old" not in registry
+    loaded = TradingProfile()
+    assert loaded.load_account("New")
+    assert loaded.get_trade(1).before == os.path.join("./assets", "New_1_before.png")
+    assert os.path.exists(loaded.get_trade(1).before) and not os.path.exists("./database/Old.xlsx")
+
+
+def test_failed_rename_is_rolled_back(workdir, monkeypatch):
+    profile, path = _account_with_screenshot("Old")
+
+    def fail(old_name, new_name):
+        raise OSError("disk full")
+    monkeypatch.setattr(model, "rename_limits", fail)
+    assert not profile.rename_account("New")
+
+    assert profile.name == "Old" and profile.get_trade(1).before == path
+    assert os.path.exists(path) and not os.path.exists("./assets/New_1_before.png")
+    assert not os.path.exists("./database/New.xlsx") and not os.path.exists(profile.history.dir.replace("Old", "New"))
+    loaded = TradingProfile()
+    assert loaded.load_account("Old")
+    assert loaded.get_trade(1).before == path
+    assert loaded.history.read_journal()[-1]["after"]["before"] == path
+    assert loaded.rollups.load(loaded.rollups_path, loaded.trades_signature)
@@ -0,0 +1,57 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from model import TradingProfile
+from replay import exit_r, journal_arrays, replay, replay_account
+from trade import Trade
+
+DAY = datetime.datetime(2024, 1, 1, 9)
+
+
+def test_exit_r_under_target_and_stop():
+    r = np.array([3.0, 1.5, 0.5, -0.5, -2.0])
+    manual = np.array([False, False, True, False, False])
+    assert exit_r(r, manual).tolist() == r.tolist()
+    assert exit_r(r, manual, target=2.0, stop=1.0).tolist() == [2.0, -1.0, 0.5, -1.0, -1.0]
+    assert exit_r(r, manual, target=2.0, stop=1.0, unreached="recorded").tolist() == [2.0, 1.5, 0.5, -0.5, -1.0]
+
+
+def test_journal_is_in_close_order_with_day_ranks(workdir):
+    profile = TradingProfile()
+    profile.balance = 1000
+    profile.create_account("Replay")
+    # (opened hours after DAY, closed hours after DAY, pnl)
+    for opened, closed, pnl in ((0, 5, 20), (1, 2, -10), (24, 25, 5), (2, 30, -10)):
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2,
+                                    DAY + datetime.timedelta(hours=opened))
+        profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl,
+                                  result="MANUAL" if pnl == 5 else "TP" if pnl > 0 else "SL",
+                                  closed_time=DAY + datetime.timedelta(hours=closed)))
+    profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, DAY)
+
+    journal = journal_arrays(profile)
+    assert journal['r'].tolist() == [-1.0, 2.0, 0.5, -1.0]
+    assert journal['day_rank'].tolist() == [1, 0, 0, 2]
+    assert journal['manual'].tolist() == [False, False, True, False]
+
+    table = replay_account(profile, targets=(None,), per_day=(None, 1))
+    capped = table[table['max_per_day'] == 1].iloc[0]
+    assert capped['trades'] == 2 and capped['final_balance'] == 1025
+    uncapped = table[table['max_per_day'].isna()].iloc[0]
+    assert uncapped['final_balance'] == profile.balance == 1005
+
+
+def test_replay_table_does_not_depend_on_chunks():
+    rng = np.random.default_rng(0)
+    n = 50
+    journal = {'r': rng.normal(0.2, 1.5, n), 'risk': np.full(n, 10.0),
+               'manual': rng.random(n) < 0.3, 'day_rank': rng.integers(0, 3, n)}
+    args = dict(targets=(None, 1.0, 2.0, 3.0), stops=(0.5, 1.0), per_day=(None, 1), risk_pcts=(None, 1.0))
+    single = replay(journal, 1000, chunk_size=1, **args)
+    whole = replay(journal, 1000, chunk_size=16, **args)
+    pd.testing.assert_frame_equal(single, whole)
+    # target None ignores the stops, 7 exit rules x 2 caps x 2 sizings
+    assert len(whole) == 28
+    with pytest.raises(ValueError):
+        replay(journal, 1000, unreached="nearest")
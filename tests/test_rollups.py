@@ -0,0 +1,71 @@
+import datetime
+from rollups import PnLRollups, bucket_start
+from trade import Trade, TradeColumns
+
+# A Wednesday
+START = datetime.datetime(2024, 1, 31, 10)
+
+
+def _closed(trade_id, pnl, days):
+    return Trade(trade_id, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=pnl, result="MANUAL",
+                 date=START, closed_time=START + datetime.timedelta(days=days))
+
+
+def _trades():
+    return [_closed(1, 10, 0), _closed(2, -5, 0), _closed(3, 20, 1), _closed(4, 7, 6)]
+
+
+def test_bucket_starts():
+    assert bucket_start(START, 'day') == datetime.date(2024, 1, 31)
+    assert bucket_start(START, 'week') == datetime.date(2024, 1, 29)
+    assert bucket_start(START, 'month') == datetime.date(2024, 1, 1)
+
+
+def test_apply_matches_rebuild():
+    store = TradeColumns()
+    applied = PnLRollups()
+    for trade in _trades():
+        store.append(trade)
+        applied.apply(None, trade)
+    store.append(Trade(5, "EURUSD", "buy", 10, 2))
+    rebuilt = PnLRollups()
+    rebuilt.rebuild(store)
+    assert rebuilt.buckets == applied.buckets
+    assert rebuilt.buckets['day']['2024-01-31'] == (5.0, 2, 1)
+    assert rebuilt.buckets['week'] == {'2024-01-29': (25.0, 3, 2), '2024-02-05': (7.0, 1, 1)}
+    assert rebuilt.buckets['month'] == {'2024-01-01': (5.0, 2, 1), '2024-02-01': (27.0, 2, 2)}
+
+    # Reopening a trade empties the buckets it was alone in
+    applied.apply(_trades()[3], Trade(4, "EURUSD", "buy", 10, 2))
+    assert '2024-02-05' not in applied.buckets['week']
+
+
+def test_merge_adds_and_removes_buckets():
+    first, second = PnLRollups(), PnLRollups()
+    for trade in _trades()[:2]:
+        first.apply(None, trade)
+    for trade in _trades()[2:]:
+        second.apply(None, trade)
+    total = first.copy()
+    total.merge(second.buckets)
+    every = PnLRollups()
+    for trade in _trades():
+        every.apply(None, trade)
+    assert total.buckets == every.buckets
+    total.merge(second.buckets, sign=-1)
+    assert total.buckets == first.buckets
+
+
+def test_query_and_saved_signature(tmp_path):
+    rollups = PnLRollups()
+    for trade in _trades():
+        rollups.apply(None, trade)
+    rows = rollups.query('day', datetime.date(2024, 2, 1), datetime.date(2024, 2, 6))
+    assert rows == [(datetime.date(2024, 2, 1), 20.0, 1, 100.0), (datetime.date(2024, 2, 6), 7.0, 1, 100.0)]
+
+    path = str(tmp_path / "rollups.json")
+    rollups.save(path, (1.0, 100))
+    loaded = PnLRollups()
+    assert not loaded.load(path, (2.0, 100))
+    assert loaded.load(path, (1.0, 100))
+    assert loaded.buckets == rollups.buckets
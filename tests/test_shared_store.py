@@ -0,0 +1,52 @@
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from shared_store import SharedTradeStore, SharedTradeView
+from simulation import _shared_r_multiples
+from trade import Trade, TradeColumns
+
+
+def _store(count):
+    trades = TradeColumns()
+    for trade_id in range(1, count + 1):
+        closed = trade_id % 2 == 0
+        trades.append(Trade(trade_id, "EURUSD" if trade_id % 3 else None, "buy", 10, 2,
+                            status='CLOSED' if closed else 'OPEN', closed_at=trade_id * 5 if closed else None,
+                            result="TP" if closed else None, date=datetime.datetime(2024, 1, trade_id)))
+    return trades
+
+
+def test_published_columns_read_back_in_a_view():
+    trades = _store(6)
+    store = SharedTradeStore("Shared")
+    try:
+        view = SharedTradeView(store.publish(trades, 1))
+        try:
+            assert view.size == 6 and not view.is_stale()
+            assert view.column('trade_id').tolist() == trades.column('trade_id').tolist()
+            np.testing.assert_array_equal(view.column('closed_at'), trades.column('closed_at'))
+            np.testing.assert_array_equal(view.column('date'), trades.column('date'))
+            assert view.decoded('pair').tolist() == ["EURUSD", "EURUSD", "", "EURUSD", "EURUSD", ""]
+            assert view.mask('status', 'CLOSED').tolist() == [False, True] * 3
+            assert not view.mask('status', 'MISSING').any()
+            assert not view.column('risk').flags.writeable
+
+            store.publish(_store(8), 2)
+            assert view.is_stale()
+            view.attach()
+            assert view.version == 2 and view.size == 8
+        finally:
+            view.close()
+    finally:
+        store.close()
+
+
+def test_workers_read_the_published_trades():
+    store = SharedTradeStore("Worker")
+    try:
+        name = store.publish(_store(6), 3)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            r = executor.submit(_shared_r_multiples, name).result()
+        assert r.tolist() == [1.0, 2.0, 3.0]
+    finally:
+        store.close()
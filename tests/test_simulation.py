@@ -0,0 +1,29 @@
+import datetime
+import numpy as np
+from model import TradingProfile
+from simulation import simulate, simulate_account
+from trade import Trade
+
+
+def test_simulation_counts_archived_trades(workdir):
+    profile = TradingProfile()
+    profile.create_account("Sim")
+    now = datetime.datetime.now()
+    for days, pnl in ((300, 20), (200, -10), (100, 30), (1, -10)):
+        opened = now - datetime.timedelta(days=days)
+        trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, opened)
+        profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=pnl, result="MANUAL",
+                                  closed_time=opened + datetime.timedelta(hours=1)))
+    assert profile.archive_trades(now - datetime.timedelta(days=90)) == 3
+
+    result = simulate_account(profile, n_paths=200, seed=1)
+    assert result['trades_per_path'] == 4
+
+
+def test_simulation_is_deterministic_across_chunks():
+    r = np.array([2.0, -1.0, -1.0, 0.5])
+    first = simulate(r, 1000.0, 10.0, n_paths=500, n_trades=40, seed=3, chunk_size=100)
+    second = simulate(r, 1000.0, 10.0, n_paths=500, n_trades=40, seed=3, chunk_size=100)
+    assert first['final_balance'] == second['final_balance']
+    assert 0.0 <= first['probability_of_ruin'] <= 1.0
+    assert first['equity_bands'][50].shape == (40,)
@@ -0,0 +1,22 @@
+import datetime
+from model import TradingProfile
+from trade import Trade
+
+
+def test_sync_takes_the_balance_of_trades_closed_elsewhere(workdir):
+    now = datetime.datetime(2024, 1, 1)
+    profile = TradingProfile()
+    profile.balance = 1000
+    profile.create_account("Sync")
+    profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, now)
+
+    other = TradingProfile()
+    other.load_account("Sync")
+    other.close_trade(Trade(1, "EURUSD", "buy", 10, 2, closed_at=25, result="TP",
+                            closed_time=now + datetime.timedelta(hours=1)))
+    other.writer.wait()
+
+    added, removed, changed = profile.sync_trades_from_disk()
+    assert [trade.trade_id for trade in changed] == [1]
+    assert profile.balance == other.balance == 1025
+    assert profile.ledger.balance_after(1) == 1025
@@ -0,0 +1,32 @@
+import datetime
+import integrity
+from model import TradingProfile
+from trade import Trade
+from synthetic import generate_trades, write_account
+
+
+def test_write_account_keeps_start_balance(workdir):
+    trades = generate_trades(200, seed=1, start_balance=5000.0)
+    profile = write_account("Synth", trades, start_balance=5000.0)
+
+    issues = [issue for issue in integrity.scan(workers=1) if issue.account == "Synth"]
+    assert [issue.kind for issue in issues if issue.kind in ("balance", "counters", "winrate")] == []
+
+    loaded = TradingProfile()
+    assert loaded.load_account("Synth")
+    assert abs(loaded.balance - profile.balance) < 1e-6
+    assert loaded.history.starting_balance() == 5000.0
+
+
+def test_returned_profile_closes_on_top_of_generated_trades(workdir):
+    trades = generate_trades(100, seed=2, start_balance=7000.0, open_trades=1)
+    profile = write_account("Synth", trades, start_balance=7000.0)
+    balance = profile.balance
+    trade = next(trade for trade in profile.trades if trade.is_open)
+    assert profile.close_trade(Trade(trade.trade_id, trade.pair, trade.position, trade.risk, trade.reward,
+                                     closed_at=25.0, result="TP", closed_time=datetime.datetime.now()))
+    assert abs(profile.balance - (balance + 25.0)) < 1e-6
+    assert abs(profile.get_trade(trade.trade_id).balance - profile.balance) < 1e-6
+
+    issues = [issue for issue in integrity.scan(workers=1) if issue.account == "Synth"]
+    assert [issue.kind for issue in issues if issue.kind in ("balance", "counters", "winrate")] == []
@@ -0,0 +1,53 @@
+from tags import TradeTags, normalize_tag, parse_tags
+from trade import Trade, TradeColumns
+
+
+def test_parse_and_normalize():
+    assert normalize_tag(" Setup : Breakout ") == "setup:breakout"
+    assert parse_tags("London, setup:Pullback,, ") == ["london", "setup:pullback"]
+
+
+def test_index_follows_tag_edits():
+    tags = TradeTags()
+    tags.set_tags(1, ["A", "setup:x"])
+    tags.set_tags(2, ["a"])
+    tags.add_tag(3, "setup:x")
+    assert tags.trades_with("A") == {1, 2}
+    assert tags.trades_with_all(["a", "setup:x"]) == {1}
+    assert tags.tag_counts("setup:") == {"setup:x": 2}
+
+    tags.remove_tag(1, "a")
+    tags.remove_trade(3)
+    assert tags.trades_with("a") == {2}
+    assert tags.trades_with("setup:x") == {1}
+    assert tags.trades_with("missing") == set()
+    assert tags.tags_of(3) == []
+
+
+def test_stats_add_archived_sums():
+    trades = TradeColumns()
+    trades.append(Trade(1, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=20, result="TP"))
+    trades.append(Trade(2, "EURUSD", "buy", 10, 2, status='CLOSED', closed_at=-10, result="SL"))
+    trades.append(Trade(3, "EURUSD", "buy", 10, 2))
+    tags = TradeTags()
+    for trade_id in (1, 2, 3):
+        tags.set_tags(trade_id, ["x"])
+    assert tags.sums(trades) == {"x": [3, 2, 1, 10.0, 1.0]}
+
+    stats = tags.stats(trades, archived={"x": [1, 1, 1, 30.0, 3.0], "y": [1, 1, 0, -5.0, -0.5]})
+    assert stats["x"] == {'trades': 4, 'closed': 3, 'wins': 2, 'winrate': 2 / 3 * 100,
+                          'pnl': 40.0, 'avg_r': 4 / 3}
+    assert stats["y"]["pnl"] == -5.0
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "tags.json")
+    tags = TradeTags()
+    tags.set_tags(1, ["a", "b"])
+    tags.set_note(1, " note ")
+    tags.save(path)
+    loaded = TradeTags()
+    assert loaded.load(path)
+    assert loaded.tags_of(1) == ["a", "b"]
+    assert loaded.note_of(1) == "note"
+    assert loaded.trades_with("b") == {1}
@@ -0,0 +1,60 @@
+import datetime
+import pytest
+import vault
+from model import TradingProfile
+from trade import Trade
+
+pytestmark = pytest.mark.skipif(not vault.available(), reason="needs the cryptography package")
+
+
+def _fill(profile):
+    # Recent enough to stay out of the archive when the account is loaded
+    opened = datetime.datetime.now() - datetime.timedelta(days=2)
+    trade = profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, opened)
+    profile.close_trade(Trade(trade.trade_id, "EURUSD", "buy", 10, 2, closed_at=20, result="TP",
+                              closed_time=opened + datetime.timedelta(days=1)))
+    profile.set_trade_metadata(trade.trade_id, ["setup:breakout"], "secret note")
+
+
+def _sidecars(profile):
+    return (profile.rollups_path, profile.tags_path, profile.history.journal_path)
+
+
+def _contents(profile):
+    return b"".join(open(path, "rb").read() for path in _sidecars(profile))
+
+
+def test_protected_account_sidecars_are_encrypted(workdir):
+    vault.protect("Enc", "pass phrase")
+    profile = TradingProfile()
+    profile.create_account("Enc")
+    _fill(profile)
+
+    contents = _contents(profile)
+    for text in (b"EURUSD", b"secret note", b"breakout", b"buckets"):
+        assert text not in contents
+
+    loaded = TradingProfile()
+    assert loaded.load_account("Enc")
+    assert loaded.tags.note_of(1) == "secret note"
+    assert loaded.rollups.buckets == profile.rollups.buckets
+    trades, _ = loaded.history.state_at(loaded.history.version)
+    assert trades.get(1).pair == "EURUSD"
+
+
+def test_encrypt_and_decrypt_account_cover_sidecars(workdir):
+    profile = TradingProfile()
+    profile.create_account("Plain")
+    _fill(profile)
+    assert b"secret note" in _contents(profile)
+
+    vault.encrypt_account("Plain", "pass phrase")
+    assert b"secret note" not in _contents(profile) and b"EURUSD" not in _contents(profile)
+    loaded = TradingProfile()
+    assert loaded.load_account("Plain")
+    assert loaded.tags.note_of(1) == "secret note"
+    assert len(loaded.history.read_journal()) == loaded.history.version
+
+    vault.lock("Plain")
+    assert vault.decrypt_account("Plain", "pass phrase")
+    assert b"secret note" in _contents(profile) and b"EURUSD" in _contents(profile)
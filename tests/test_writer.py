@@ -0,0 +1,50 @@
+import datetime
+import threading
+from history import AccountHistory
+from model import TradingProfile
+from rollups import PnLRollups
+
+
+def test_background_placement_saves_rollups_on_writer_thread(workdir, monkeypatch):
+    profile = TradingProfile()
+    profile.create_account("Fast")
+    threads = []
+    save = PnLRollups.save
+
+    def record(self, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return save(self, *args, **kwargs)
+    monkeypatch.setattr(PnLRollups, "save", record)
+
+    profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, datetime.datetime.now(), background=True)
+    profile.writer.wait()
+    assert threads and all(name.startswith("writer") for name in threads)
+
+    loaded = TradingProfile()
+    assert loaded.load_account("Fast")
+    assert loaded.rollups.load(loaded.rollups_path, loaded.trades_signature)
+
+
+def test_background_placement_writes_history_on_writer_thread(workdir, monkeypatch):
+    profile = TradingProfile()
+    profile.create_account("Journal")
+    profile.history.checkpoint_every = 3
+    threads = []
+    for method in ("_write_entries", "_write_checkpoint"):
+        original = getattr(AccountHistory, method)
+
+        def record(self, *args, original=original, method=method):
+            threads.append((method, threading.current_thread().name))
+            return original(self, *args)
+        monkeypatch.setattr(AccountHistory, method, record)
+
+    for _ in range(4):
+        profile.place_trade(profile.current_trade_id, "EURUSD", "buy", 10, 2, datetime.datetime.now(),
+                            background=True)
+    # Reading the history waits for the queued entries
+    assert [entry["op"] for entry in profile.history.read_journal()] == ["create"] + ["place"] * 4
+    assert {method for method, _ in threads} == {"_write_entries", "_write_checkpoint"}
+    assert all(name.startswith("writer") for _, name in threads)
+    trades, _ = profile.history.state_at(profile.history.version)
+    assert len(trades) == 4
+    assert len(profile.history.state_at(3)[0]) == 2
@@ -0,0 +1,343 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Column order of the account workbooks
+COLUMNS = ('trade_id', 'pair', 'position', 'risk', 'reward', 'status', 'result',
+           'closed_at', 'balance', 'date', 'closed_time', 'before', 'after')
+
+# Storage type of each column in a TradeColumns store
+DTYPES = {
+    'trade_id': np.int64,
+    'pair': object,
+    'position': object,
+    'risk': np.float64,
+    'reward': np.int64,
+    'status': object,
+    'result': object,
+    'closed_at': np.float64,
+    'balance': np.float64,
+    'date': 'datetime64[us]',
+    'closed_time': 'datetime64[us]',
+    'before': object,
+    'after': object,
+}
+
+DATE_COLUMNS = ('date', 'closed_time')
+# Columns added after the first workbooks were written, absent from older files
+OPTIONAL_COLUMNS = ('closed_time',)
+
+# Low-cardinality text columns, stored as interned strings
+INTERNED_COLUMNS = ('pair', 'position', 'status', 'result')
+
+
+def _clean_text(value):
+    """Return a string or None for empty cells ('', NaN, 'None', 'nan')"""
+    if value is None:
+        return None
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    value = str(value)
+    if value in ('', 'None', 'nan', 'NaN'):
+        return None
+    return value
+
+
+def _intern(value):
+    value = _clean_text(value)
+    return sys.intern(value) if value is not None else None
+
+
+def _clean_float(value):
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _clean_date(value):
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).to_pydatetime()
+
+
+class Trade:
+    """Single trade record shared by the model, the controller and the views"""
+    __slots__ = COLUMNS
+
+    def __init__(self, trade_id, pair, position, risk, reward, status='OPEN', result=None,
+                 closed_at=None, balance=None, date=None, closed_time=None, before=None, after=None):
+        self.trade_id = int(trade_id)
+        self.pair = _intern(pair)
+        self.position = _intern(position)
+        self.risk = float(risk)
+        self.reward = int(reward)
+        self.status = _intern(status) or 'OPEN'
+        self.result = _intern(result)
+        self.closed_at = _clean_float(closed_at)
+        self.balance = _clean_float(balance)
+        self.date = _clean_date(date)
+        self.closed_time = _clean_date(closed_time)
+        self.before = _clean_text(before)
+        self.after = _clean_text(after)
+
+    def __getitem__(self, key):
+        # Dict-style access for callers that still use trade["..."]
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"Trade({self.trade_id}, {self.pair!r}, {self.position!r}, {self.status!r})"
+
+    @property
+    def is_open(self):
+        return self.status == 'OPEN'
+
+    @property
+    def close_date(self):
+        """When the trade was closed, its open date for trades closed before close times were recorded"""
+        return self.closed_time if self.closed_time is not None else self.date
+
+    def display_status(self):
+        """Status text shown in the trade list"""
+        if self.status == 'CLOSED' and self.result is not None:
+            return f"CLOSED ({self.result})"
+        return self.status
+
+    def copy(self, **changes):
+        """Return a copy of the trade with some fields replaced"""
+        fields = self.to_dict()
+        fields.update(changes)
+        return Trade(**fields)
+
+    def to_dict(self):
+        return {col: getattr(self, col) for col in COLUMNS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{col: data.get(col) for col in COLUMNS if col in data})
+
+
+class TradeColumns:
+    """Struct-of-arrays store for the trades of an account
+
+    Numeric fields live in NumPy arrays and the text fields in object arrays
+    of interned strings. Rows are kept in insertion order and indexed by trade_id.
+    """
+
+    def __init__(self, capacity=16):
+        self._size = 0
+        self._data = {col: self._empty(col, max(capacity, 1)) for col in COLUMNS}
+        self._rows = {}
+
+    @staticmethod
+    def _empty(col, capacity):
+        if col in DATE_COLUMNS:
+            return np.full(capacity, np.datetime64('NaT'), dtype=DTYPES[col])
+        if DTYPES[col] is object:
+            return np.full(capacity, None, dtype=object)
+        if DTYPES[col] is np.float64:
+            return np.full(capacity, np.nan)
+        return np.zeros(capacity, dtype=DTYPES[col])
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield self.trade_at(row)
+
+    def __contains__(self, trade_id):
+        return int(trade_id) in self._rows
+
+    def _grow(self, needed):
+        capacity = len(self._data['trade_id'])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for col in COLUMNS:
+            grown = self._empty(col, capacity)
+            grown[:self._size] = self._data[col][:self._size]
+            self._data[col] = grown
+
+    def _write_row(self, row, trade):
+        data = self._data
+        data['trade_id'][row] = trade.trade_id
+        data['pair'][row] = trade.pair
+        data['position'][row] = trade.position
+        data['risk'][row] = trade.risk
+        data['reward'][row] = trade.reward
+        data['status'][row] = trade.status
+        data['result'][row] = trade.result
+        data['closed_at'][row] = np.nan if trade.closed_at is None else trade.closed_at
+        data['balance'][row] = np.nan if trade.balance is None else trade.balance
+        data['date'][row] = np.datetime64('NaT') if trade.date is None else np.datetime64(trade.date, 'us')
+        data['closed_time'][row] = (np.datetime64('NaT') if trade.closed_time is None
+                                    else np.datetime64(trade.closed_time, 'us'))
+        data['before'][row] = trade.before
+        data['after'][row] = trade.after
+
+    def column(self, name):
+        """Read-only view over the live part of a column"""
+        view = self._data[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def set_values(self, name, rows, values):
+        """Write values into a column at the given rows"""
+        self._data[name][rows] = values
+
+    def close_dates(self):
+        """Close time of every row, the open date where no close time was recorded"""
+        closed_time = self.column('closed_time')
+        return np.where(np.isnat(closed_time), self.column('date'), closed_time)
+
+    def win_loss(self):
+        """(wins, losses) of the closed trades, counted by the sign of their P&L like the profile counters"""
+        closed_at = self.column('closed_at')
+        closed = (self.column('status') == 'CLOSED') & ~np.isnan(closed_at)
+        wins = int((closed_at[closed] > 0).sum())
+        return wins, int(closed.sum()) - wins
+
+    def row_of(self, trade_id):
+        return self._rows.get(int(trade_id))
+
+    def trade_at(self, row):
+        data = self._data
+        return Trade(
+            trade_id=data['trade_id'][row],
+            pair=data['pair'][row],
+            position=data['position'][row],
+            risk=data['risk'][row],
+            reward=data['reward'][row],
+            status=data['status'][row],
+            result=data['result'][row],
+            closed_at=data['closed_at'][row],
+            balance=data['balance'][row],
+            date=data['date'][row],
+            closed_time=data['closed_time'][row],
+            before=data['before'][row],
+            after=data['after'][row],
+        )
+
+    def get(self, trade_id):
+        """Return the Trade with this id or None"""
+        row = self.row_of(trade_id)
+        return None if row is None else self.trade_at(row)
+
+    def append(self, trade):
+        if trade.trade_id in self._rows:
+            raise ValueError(f"Duplicate trade_id {trade.trade_id}")
+        self._grow(self._size + 1)
+        self._write_row(self._size, trade)
+        self._rows[trade.trade_id] = self._size
+        self._size += 1
+
+    def insert(self, trade):
+        """Add a trade at its place in trade_id order (appends for new ids)"""
+        if trade.trade_id in self._rows:
+            raise ValueError(f"Duplicate trade_id {trade.trade_id}")
+        row = int(np.searchsorted(self._data['trade_id'][:self._size], trade.trade_id))
+        if row == self._size:
+            self.append(trade)
+            return row
+        self._grow(self._size + 1)
+        for col in COLUMNS:
+            values = self._data[col]
+            values[row + 1:self._size + 1] = values[row:self._size]
+        self._size += 1
+        self._write_row(row, trade)
+        for shifted in range(row, self._size):
+            self._rows[int(self._data['trade_id'][shifted])] = shifted
+        return row
+
+    def update(self, trade):
+        """Overwrite the stored row of an existing trade"""
+        row = self.row_of(trade.trade_id)
+        if row is None:
+            raise KeyError(trade.trade_id)
+        self._write_row(row, trade)
+
+    def remove(self, trade_id):
+        """Remove a trade and return it, or None if it does not exist"""
+        row = self.row_of(trade_id)
+        if row is None:
+            return None
+        trade = self.trade_at(row)
+        last = self._size - 1
+        for col in COLUMNS:
+            values = self._data[col]
+            values[row:last] = values[row + 1:last + 1]
+            values[last:last + 1] = self._empty(col, 1)
+        self._size = last
+        del self._rows[int(trade_id)]
+        for shifted in range(row, self._size):
+            self._rows[int(self._data['trade_id'][shifted])] = shifted
+        return trade
+
+    def next_trade_id(self):
+        if self._size == 0:
+            return 1
+        return int(self._data['trade_id'][:self._size].max()) + 1
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a store from a trade DataFrame read from an account workbook"""
+        store = cls(capacity=len(df))
+        n = len(df)
+        for col in COLUMNS:
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy()
+            if col in INTERNED_COLUMNS:
+                store._data[col][:n] = [_intern(v) for v in values]
+            elif DTYPES[col] is object:
+                store._data[col][:n] = [_clean_text(v) for v in values]
+            elif col in DATE_COLUMNS:
+                store._data[col][:n] = pd.to_datetime(values, errors='coerce').to_numpy(dtype='datetime64[us]')
+            elif DTYPES[col] is np.float64:
+                store._data[col][:n] = pd.to_numeric(values, errors='coerce')
+            else:
+                numbers = pd.to_numeric(values, errors='coerce')
+                store._data[col][:n] = np.nan_to_num(numbers.astype(np.float64)).astype(DTYPES[col])
+        store._size = n
+        store._rows = {int(t): row for row, t in enumerate(store._data['trade_id'][:n])}
+        return store
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a store from arrays already in the column dtypes, without cleaning
+
+        Missing columns are left empty. Used for bulk loads of generated data.
+        """
+        n = len(columns['trade_id'])
+        store = cls(capacity=n)
+        for col, values in columns.items():
+            store._data[col][:n] = values
+        store._size = n
+        store._rows = dict(zip(store._data['trade_id'][:n].tolist(), range(n)))
+        return store
+
+    @classmethod
+    def concat(cls, stores):
+        """New store holding the rows of several stores one after the other"""
+        return cls.from_columns({col: np.concatenate([store._data[col][:store._size] for store in stores])
+                                 for col in COLUMNS})
+
+    def copy(self):
+        """Independent copy of the store"""
+        return TradeColumns.from_columns({col: self._data[col][:self._size].copy() for col in COLUMNS})
+
+    def select(self, mask):
+        """New store holding the rows where mask is True, in the same order"""
+        rows = np.flatnonzero(mask)
+        return TradeColumns.from_columns({col: self._data[col][rows] for col in COLUMNS})
+
+    def to_frame(self):
+        """DataFrame copy of the store in workbook column order"""
+        return pd.DataFrame({col: self._data[col][:self._size].copy() for col in COLUMNS},
+                            columns=list(COLUMNS))
+
+    @staticmethod
+    def empty_frame():
+        return pd.DataFrame(columns=list(COLUMNS))
@@ -1,24 +1,35 @@
-from PyQt5.QtWidgets import QWidget, QListWidget, QListWidgetItem, QLabel, QSizePolicy, QFrame, QLineEdit, QPushButton, QMessageBox, QSpinBox,QStackedWidget
+from PyQt5.QtWidgets import QWidget, QListWidget, QListWidgetItem, QLabel, QSizePolicy, QFrame, QLineEdit, QPushButton, QMessageBox, QSpinBox,QStackedWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QShortcut, QCompleter, QDialog, QDialogButtonBox, QDoubleSpinBox, QFormLayout
 from PyQt5 import uic
-from PyQt5.QtCore import QSize, pyqtSignal
+from PyQt5.QtCore import QSize, QPoint, QTimer, pyqtSignal, Qt, QStringListModel
+from PyQt5.QtGui import QKeySequence
 import datetime
 import os
 from clipboard import ImageViewer
+from trade import Trade
+from charts import ChartPanel
+from images import ImageSaver
+from tags import parse_tags
+from fx import DEFAULT_CURRENCY, format_amount
+from quick_entry import SymbolIndex, parse_command
+from memory import governor, ROW_WIDGET_BYTES
+
+# Row widgets are created for the rows in view and released to the memory governor
+# by pages of trade ids; rows kept around the visible ones for smooth scrolling
+ROWS_PER_PAGE = 50
+ROW_MARGIN = 10
 
 class CustomListElement(QWidget):
     """Custom list item widget for displaying trade information"""
-    def __init__(self, parent, trade_id, pair, position, status, risk, reward,date) -> None:
+    def __init__(self, parent, trade : Trade) -> None:
         super().__init__(parent)
         uic.loadUi("./ui/listelement.ui", self)
-        self.trade_id = trade_id
-        self.pair = pair
-        self.position = position
-        self.status = status
-        self.risk = risk
-        self.reward = reward
-        self.date = date
+        self.trade = trade
         
         self.init_ui()
+
+    @property
+    def trade_id(self):
+        return self.trade.trade_id
     
     def init_ui(self):
         self.pair_label : QLabel = self.findChild(QLabel, "pair")
@@ -27,13 +38,17 @@ class CustomListElement(QWidget):
         self.date_label : QLabel = self.findChild(QLabel, "date")
 
 
-        self.pair_label.setText(self.pair)
-        self.status_label.setText(self.status)
-        bg_color = "#f0bcb9" if self.position == "sell" else "#bcf0b9"
+        self.refresh()
+
+    def refresh(self):
+        """Show the current values of the trade record"""
+        self.pair_label.setText(self.trade.pair)
+        self.status_label.setText(self.trade.display_status())
+        bg_color = "#f0bcb9" if self.trade.position == "sell" else "#bcf0b9"
         self.position_label.setStyleSheet(f"background-color: {bg_color}; color: #ffffff;font-weight:bold;")
-        self.position_label.setText(self.position)
+        self.position_label.setText(self.trade.position)
         current_data = datetime.datetime.now()
-        temp = current_data - self.date
+        temp = current_data - (self.trade.date or current_data)
 
         if temp.days == 0:
             date_text = "Today"
@@ -44,15 +59,51 @@ class CustomListElement(QWidget):
 
         self.date_label.setText(date_text)
 
+    def set_trade(self, trade : Trade):
+        """Refresh the element from an updated trade record"""
+        self.trade = trade
+        self.refresh()
+
+
+
+class RiskLimitsDialog(QDialog):
+    """Edit the open risk limits of an account, 0 for no limit"""
+    def __init__(self, parent, limits) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("Risk limits")
+        layout = QFormLayout(self)
+        self.fields = {}
+        for name, label in (("max_total", "Total open risk"), ("max_per_pair", "Per pair"),
+                            ("max_per_direction", "Per direction")):
+            field = QDoubleSpinBox()
+            field.setRange(0, 1e9)
+            field.setDecimals(2)
+            field.setSpecialValueText("No limit")
+            field.setValue(limits.get(name) or 0)
+            layout.addRow(label, field)
+            self.fields[name] = field
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def limits(self):
+        return {name: field.value() or None for name, field in self.fields.items()}
+
 
 
 class TradingUI(QWidget):
     """Main trading interface that displays account information and trade management"""
     # Define signals for communication with controllers
     place_trade_signal = pyqtSignal(str, float, int, str)  # pair, risk, reward, position
-    close_trade_signal = pyqtSignal(dict)  # trade_id, closed_at, result
+    quick_trade_signal = pyqtSignal(str, float, int, str)  # same, typed in the quick entry line
+    close_trade_signal = pyqtSignal(object)  # Trade carrying closed_at, result and images
     delete_trade_signal = pyqtSignal(int)  # trade_id
     on_selected_signal = pyqtSignal(int)
+    metadata_signal = pyqtSignal(int, list, str)  # trade_id, tags, note
+    limits_signal = pyqtSignal(dict)  # max_total, max_per_pair, max_per_direction
+    undo_signal = pyqtSignal()
+    redo_signal = pyqtSignal()
 
     
     def __init__(self, parent) -> None:
@@ -61,6 +112,12 @@ class TradingUI(QWidget):
         self.isPaire_valid = False
         self.isRisk_valid = False
         self.selected_item = None
+        self.symbols = SymbolIndex()
+        # page -> {trade_id: item} of the rows that have their widget
+        self.row_pages = {}
+        self.rows_scheduled = False
+        # Screenshots are scaled and encoded on a background thread
+        self.image_saver = ImageSaver(parent=self)
         self.init_ui()
         self.init_controls()
         self.setup_connections()
@@ -71,6 +128,10 @@ class TradingUI(QWidget):
         self.acount_name : QLabel = self.findChild(QLabel, "account_name")
         self.balance : QLabel = self.findChild(QLabel, "balance")
         self.winrate : QLabel = self.findChild(QLabel, "winrate")
+        self.exposure : QLabel = self.findChild(QLabel, "exposure")
+        self.risk_limits = {}
+        self.limits_button : QPushButton = QPushButton("Risk limits")
+        self.exposure.parentWidget().layout().addWidget(self.limits_button, 5, 0, 1, 2)
         self.quit_button : QPushButton = self.findChild(QPushButton,"quit")
 
         self.pair : QLineEdit = self.findChild(QLineEdit, "pair")
@@ -89,6 +150,12 @@ class TradingUI(QWidget):
 
         self.stacked : QStackedWidget = self.findChild(QStackedWidget, "sta")
         self.stacked.setCurrentIndex(0)
+
+        # Account charts on the page shown when no trade is selected
+        self.empty_page : QWidget = self.findChild(QWidget, "empty")
+        QVBoxLayout(self.empty_page)
+        self.charts = ChartPanel()
+        self.empty_page.layout().addWidget(self.charts)
         
         self.label_pair : QLabel = self.findChild(QLabel, "label_pair")
         self.label_position : QLabel = self.findChild(QLabel, "position")
@@ -104,8 +171,33 @@ class TradingUI(QWidget):
         self.image_view = ImageViewer()
         self.import_wi.layout().addWidget(self.image_view)
 
+        # Tags and notes of the selected trade
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("Tags: setup:breakout, session:london")
+        self.notes_edit = QPlainTextEdit()
+        self.notes_edit.setPlaceholderText("Notes")
+        self.notes_edit.setMaximumHeight(70)
+        self.save_metadata : QPushButton = QPushButton("Save")
+        metadata = QHBoxLayout()
+        metadata.addWidget(self.tags_edit)
+        metadata.addWidget(self.save_metadata)
+        self.import_wi.layout().addLayout(metadata)
+        self.import_wi.layout().addWidget(self.notes_edit)
+
         self.delete_trade : QPushButton = self.findChild(QPushButton, "remove")
 
+        # One line trade entry: "EURUSD b 50 3", parsed only when Enter is pressed
+        self.quick_entry = QLineEdit()
+        self.quick_entry.setPlaceholderText("Quick entry (Ctrl+E): EURUSD b 50 3")
+        self.quick_status = QLabel()
+        self.symbol_model = QStringListModel(self)
+        self.symbol_completer = QCompleter(self.symbol_model, self)
+        self.symbol_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.symbol_completer.setWidget(self.quick_entry)
+        entry_box : QWidget = self.findChild(QWidget, "widget_4")
+        entry_box.layout().addWidget(self.quick_entry)
+        entry_box.layout().addWidget(self.quick_status)
+
     def init_controls(self):
         """Initialize default values for controls"""
         self.reward.setRange(1, 10)
@@ -114,6 +206,8 @@ class TradingUI(QWidget):
     def setup_connections(self):
         """Connect UI signals to handlers"""
         self.list_trades.itemClicked.connect(self.on_selected)
+        self.list_trades.verticalScrollBar().valueChanged.connect(self.schedule_visible_rows)
+        self.list_trades.verticalScrollBar().rangeChanged.connect(self.schedule_visible_rows)
         self.pair.textChanged.connect(self.on_pair_changed)
         self.risk.textChanged.connect(self.on_risk_changed)
         
@@ -127,6 +221,24 @@ class TradingUI(QWidget):
         self.delete_trade.clicked.connect(self.on_delete_trade)
         self.manual_close_value.textChanged.connect(self.on_manual_close_change)
         self.manual_close.clicked.connect(self.on_manual_close_clicked)
+        self.save_metadata.clicked.connect(self.on_save_metadata)
+        self.limits_button.clicked.connect(self.on_limits_clicked)
+        self.tags_edit.returnPressed.connect(self.on_save_metadata)
+        self.quick_entry.textEdited.connect(self.on_quick_entry_edited)
+        self.quick_entry.returnPressed.connect(self.on_quick_entry)
+        self.symbol_completer.activated[str].connect(self.on_symbol_completed)
+        focus = QShortcut(QKeySequence("Ctrl+E"), self)
+        focus.setContext(Qt.WidgetWithChildrenShortcut)
+        focus.activated.connect(self.quick_entry.setFocus)
+        clear = QShortcut(QKeySequence(Qt.Key_Escape), self.quick_entry)
+        clear.setContext(Qt.WidgetShortcut)
+        clear.activated.connect(self.quick_entry.clear)
+
+        # Undo/redo trade operations, only in the tab that has the focus
+        for keys, signal in ((QKeySequence.Undo, self.undo_signal), (QKeySequence.Redo, self.redo_signal)):
+            shortcut = QShortcut(QKeySequence(keys), self)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(signal.emit)
 
     def on_manual_close_change(self):
         """Handle manual close value changes"""
@@ -172,11 +284,20 @@ class TradingUI(QWidget):
         self.buy_button.setEnabled(True)
         self.sell_button.setEnabled(True)
         
-    def update_profile_display(self, name, balance, winrate):
+    def update_profile_display(self, name, balance, winrate, exposure=None, currency=DEFAULT_CURRENCY):
         """Update account information display"""
         self.acount_name.setText(name)
-        self.balance.setText(f"${balance:.2f}")
+        self.balance.setText(format_amount(balance, currency))
         self.winrate.setText(f"{winrate:.1f}%")
+        if exposure is not None:
+            self.exposure.setText(f"Open risk: {format_amount(exposure.total, currency)}")
+            self.exposure.setToolTip(exposure.summary())
+            self.risk_limits = exposure.limits()
+
+    def on_limits_clicked(self):
+        dialog = RiskLimitsDialog(self, self.risk_limits)
+        if dialog.exec_() == QDialog.Accepted:
+            self.limits_signal.emit(dialog.limits())
 
     def on_buy_clicked(self):
         """Handle buy button click"""
@@ -215,45 +336,81 @@ class TradingUI(QWidget):
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Could not place trade: {str(e)}")
 
-    def set_images(self, trade_id):
-        image_before = self.image_view.zone1.image_label.original_pixmap
-        image_after = self.image_view.zone2.image_label.original_pixmap
+    def set_symbols(self, symbols : SymbolIndex):
+        """Pairs offered by the quick entry completion"""
+        self.symbols = symbols
 
-        pathname_before = None
-        pathname_after = None
+    def on_quick_entry_edited(self, text):
+        """Complete the pair while it is the only word typed"""
+        if not text or " " in text:
+            self.symbol_completer.popup().hide()
+            return
+        matches = self.symbols.complete(text)
+        self.symbol_model.setStringList(matches)
+        if matches:
+            self.symbol_completer.setCompletionPrefix(text)
+            self.symbol_completer.complete()
+        else:
+            self.symbol_completer.popup().hide()
 
-        if image_before is not None:
-            pathname_before = f"./assets/{self.acount_name.text().replace(' ', '')}_{trade_id}_before.jpg"
-            image_before.save(pathname_before, "JPG")
+    def on_symbol_completed(self, symbol):
+        self.quick_entry.setText(symbol + " ")
 
-        if image_after is not None:
-            pathname_after = f"./assets/{self.acount_name.text().replace(' ', '')}_{trade_id}_after.jpg"
-            image_after.save(pathname_after, "JPG")
-        
-        return pathname_before,pathname_after
-
-    def return_trade(self,closed_at,result,info):
-        trade = {
-                "trade_id":info["trade_id"],
-                "closed_at":closed_at,
-                "result":result,
-                "before":info["before"],
-                "after":info["after"]
-            }
+    def on_quick_entry(self):
+        """Place the trade typed in the quick entry line"""
+        text = self.quick_entry.text()
+        try:
+            pair, position, risk, reward = parse_command(text, self.reward.value())
+        except ValueError as e:
+            self.quick_status.setStyleSheet("color: #ef5350;")
+            self.quick_status.setText(str(e))
+            return
+        self.quick_trade_signal.emit(pair, risk, reward, position)
+        # Ready for the next trade at once, the workbook is written in the background
+        self.quick_entry.clear()
+        self.quick_status.setStyleSheet("")
+        self.quick_status.setText(f"{position} {pair} risk {risk:g} 1:{reward}")
+
+    def image_base(self, trade_id, zone_name):
+        """Path without extension of a trade screenshot"""
+        return f"./assets/{self.acount_name.text().replace(' ', '')}_{trade_id}_{zone_name}"
+
+    def zone(self, zone_name):
+        return self.image_view.zone1 if zone_name == "before" else self.image_view.zone2
+
+    def save_zone_image(self, trade_id, zone_name):
+        """Queue the screenshot of a zone for saving, returns its path
+
+        The image saver emits finished((trade_id, zone_name), path) once written.
+        """
+        image = self.zone(zone_name).image_label.full_image()
+        if image is None:
+            return None
+        return self.image_saver.save(image, self.image_base(trade_id, zone_name), key=(trade_id, zone_name))
+
+    def image_paths(self, trade_id):
+        """Paths of the screenshots shown, as saved by save_zone_image"""
+        paths = []
+        for zone, zone_name in ((self.image_view.zone1, "before"), (self.image_view.zone2, "after")):
+            has_image = zone.image_label.original_pixmap is not None
+            paths.append(self.image_saver.path_for(self.image_base(trade_id, zone_name)) if has_image else None)
+        return tuple(paths)
+
+    def return_trade(self,closed_at,result,info : Trade):
+        trade = info.copy(closed_at=closed_at, result=result, closed_time=datetime.datetime.now())
         self.close_trade_signal.emit(trade)
         
     def get_selected_info(self):
-        custom_widget = self.list_trades.itemWidget(self.selected_item)
-        risk = custom_widget.risk
-        trade_id = custom_widget.trade_id
-        before,after = self.set_images(trade_id)
-        return {"risk":risk,"trade_id":trade_id,"before":before,"after":after}
+        trade = self.trade_of(self.selected_item)
+        # Images were saved when they were inserted
+        before,after = self.image_paths(trade.trade_id)
+        return trade.copy(before=before, after=after)
 
     def on_SL_clicked(self):
         """Close selected trade as loss"""
         if self.selected_item:
             info = self.get_selected_info()
-            close_at = self.SL_mul.value() * float(info["risk"])          
+            close_at = self.SL_mul.value() * info.risk          
             result = "SL"
             self.return_trade(close_at,result,info)
 
@@ -261,7 +418,7 @@ class TradingUI(QWidget):
         """Close selected trade as win"""
         if self.selected_item:
             info = self.get_selected_info()
-            closed_at = self.TP_mul.value() * float(info["risk"])
+            closed_at = self.TP_mul.value() * info.risk
             result = "TP"
             self.return_trade(closed_at,result,info)
 
@@ -273,69 +430,167 @@ class TradingUI(QWidget):
             result = "MANUAL"
             self.return_trade(close_at,result,info)
 
+    def show_metadata(self, tags, note):
+        """Show the tags and note of the selected trade"""
+        self.tags_edit.setText(", ".join(tags))
+        self.notes_edit.setPlainText(note)
+
+    def on_save_metadata(self):
+        if self.selected_item:
+            self.metadata_signal.emit(self.trade_of(self.selected_item).trade_id, parse_tags(self.tags_edit.text()),
+                                      self.notes_edit.toPlainText())
+
     def on_delete_trade(self):
         """Handle delete trade button click"""
         if self.selected_item:
-            custom_widget = self.list_trades.itemWidget(self.selected_item)
+            trade_id = self.trade_of(self.selected_item).trade_id
             self.image_view.reset_images()
             # Emit signal for controller to handle
-            self.delete_trade_signal.emit(custom_widget.trade_id)
+            self.delete_trade_signal.emit(trade_id)
 
     def on_selected(self, item : QListWidgetItem):
         """Handle trade selection in list"""
         self.image_view.reset_images()
+        self.show_metadata([], "")
         self.manual_close.setEnabled(False)
         if not self.selected_item == item:
             self.stacked.setCurrentIndex(2)
             self.selected_item = item
             
-        temp : CustomListElement = self.list_trades.itemWidget(item)
-        self.label_pair.setText(temp.pair)
-        self.label_position.setText(temp.position)
-        self.TP_mul.setRange(0, temp.reward)
-        self.TP_mul.setValue(temp.reward)
-        self.SL_mul.setRange(-1, temp.reward)  # Default to 1x for stop loss
+        trade = self.trade_of(item)
+        self.label_pair.setText(trade.pair)
+        self.label_position.setText(trade.position)
+        self.TP_mul.setRange(0, trade.reward)
+        self.TP_mul.setValue(trade.reward)
+        self.SL_mul.setRange(-1, trade.reward)  # Default to 1x for stop loss
         self.SL_mul.setValue(-1)
-        self.on_selected_signal.emit(temp.trade_id)
+        self.on_selected_signal.emit(trade.trade_id)
        
         # Only enable win/loss buttons if the trade is open
-        is_open = "OPEN" in temp.status
+        is_open = trade.is_open
         self.TP_button.setEnabled(is_open)
         self.SL_button.setEnabled(is_open)
         self.manual_close.setEnabled(False)
         self.manual_close_value.clear()
         # place image in the image place holder
 
+    def trade_of(self, item : QListWidgetItem):
+        """Trade shown by a row, whether its widget is created or not"""
+        return item.data(Qt.UserRole)
+
     def clear_trades(self):
         """Clear all trades from the list"""
+        self.release_rows()
         self.stacked.setCurrentIndex(0)
         self.list_trades.clear()
         self.selected_item = None
         self.stacked.setCurrentIndex(0)
 
-    def add_trade(self, trade_id, pair, position, status, risk, reward,date):
-        """Add a trade to the list"""
-        custom_widget = CustomListElement(None, trade_id, pair, position, status, risk, reward,date)
-        
-        # Create a QListWidgetItem
-        item = QListWidgetItem(self.list_trades)
+    def release_rows(self):
+        """Forget the row widgets of this list, before it is cleared"""
+        governor.discard_owner(id(self))
+        self.row_pages.clear()
+
+    def release_memory(self):
+        """Give back the rows and screenshots registered with the memory governor, when the view closes"""
+        self.release_rows()
+        self.image_view.reset_images()
+
+    def add_trade(self, trade : Trade, row=None):
+        """Add a trade to the list, at the end or at the given row
+
+        The row widget is only created once the row comes into view.
+        """
+        item = QListWidgetItem()
         item.setSizeHint(QSize(0, 50))
+        item.setData(Qt.UserRole, trade)
+        if row is None:
+            self.list_trades.addItem(item)
+        else:
+            self.list_trades.insertItem(row, item)
+
+    def insert_trade(self, trade : Trade):
+        """Add a trade to the list at its place in trade_id order"""
+        row = self.list_trades.count()
+        while row > 0 and self.trade_of(self.list_trades.item(row - 1)).trade_id > trade.trade_id:
+            row -= 1
+        self.add_trade(trade, row if row < self.list_trades.count() else None)
+        self.schedule_visible_rows()
+
+    def prepend_trades(self, trades):
+        """Insert older trades above the ones already shown, newest first"""
+        scrollbar = self.list_trades.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        self.list_trades.setUpdatesEnabled(False)
+        for trade in trades:
+            self.add_trade(trade, 0)
+        self.list_trades.setUpdatesEnabled(True)
+        # Keep the most recent trades in view while the history fills in
+        if at_bottom:
+            self.list_trades.scrollToBottom()
+        self.schedule_visible_rows()
+
+    def schedule_visible_rows(self, *args):
+        """Create the widgets of the rows in view once the list layout is updated"""
+        if not self.rows_scheduled:
+            self.rows_scheduled = True
+            QTimer.singleShot(0, self.show_visible_rows)
+
+    def visible_rows(self):
+        """Rows in view, with a margin on each side"""
+        count = self.list_trades.count()
+        if count == 0:
+            return range(0)
+        top = self.list_trades.indexAt(QPoint(0, 0)).row()
+        bottom = self.list_trades.indexAt(QPoint(0, self.list_trades.viewport().height() - 1)).row()
+        top = 0 if top < 0 else top
+        bottom = count - 1 if bottom < 0 else bottom
+        return range(max(0, top - ROW_MARGIN), min(count, bottom + ROW_MARGIN + 1))
+
+    def showEvent(self, event):
+        self.schedule_visible_rows()
+        super().showEvent(event)
+
+    def show_visible_rows(self):
+        self.rows_scheduled = False
+        grown = set()
+        for row in self.visible_rows():
+            item = self.list_trades.item(row)
+            page = self.trade_of(item).trade_id // ROWS_PER_PAGE
+            if self.list_trades.itemWidget(item) is None:
+                self.list_trades.setItemWidget(item, CustomListElement(None, self.trade_of(item)))
+                self.row_pages.setdefault(page, {})[self.trade_of(item).trade_id] = item
+                grown.add(page)
+            else:
+                governor.touch(("rows", id(self), page))
+        for page in grown:
+            governor.add(("rows", id(self), page), len(self.row_pages[page]) * ROW_WIDGET_BYTES,
+                         lambda page=page: self.release_page(page))
+
+    def release_page(self, page):
+        """Delete the row widgets of a page out of view, returns False when one is in view"""
+        items = self.row_pages.get(page, {})
+        # Every row of a hidden tab can go, they are created again when it is shown
+        visible = self.visible_rows() if self.list_trades.isVisible() else range(0)
+        for item in items.values():
+            if item is self.selected_item or self.list_trades.row(item) in visible:
+                return False
+        for item in items.values():
+            self.list_trades.removeItemWidget(item)
+        self.row_pages.pop(page, None)
+        return True
         
-        # Set the custom widget as the item widget
-        self.list_trades.setItemWidget(item, custom_widget)
-        
-        # Force the list to update its layout
-        self.list_trades.update()
-        
-    def update_trade_status(self, trade_id, new_status):
-        """Update the status of a trade in the list"""
+    def update_trade(self, trade : Trade):
+        """Update a trade in the list"""
         for i in range(self.list_trades.count()):
             item = self.list_trades.item(i)
-            widget = self.list_trades.itemWidget(item)
-            if widget.trade_id == trade_id:
-                widget.status = new_status
-                widget.status_label.setText(new_status)
-                if self.selected_item == item:
+            if self.trade_of(item).trade_id == trade.trade_id:
+                item.setData(Qt.UserRole, trade)
+                widget = self.list_trades.itemWidget(item)
+                if widget is not None:
+                    widget.set_trade(trade)
+                # A trade closed elsewhere can no longer be edited here
+                if self.selected_item == item and not trade.is_open:
                     self.stacked.setCurrentIndex(0)
                     self.selected_item = None
                 break
@@ -344,8 +599,16 @@ class TradingUI(QWidget):
         """Remove a trade from the list"""
         for i in range(self.list_trades.count()):
             item = self.list_trades.item(i)
-            widget = self.list_trades.itemWidget(item)
-            if widget.trade_id == trade_id:
+            if self.trade_of(item).trade_id == trade_id:
+                page = trade_id // ROWS_PER_PAGE
+                if self.row_pages.get(page, {}).pop(trade_id, None) is not None:
+                    key = ("rows", id(self), page)
+                    if self.row_pages[page]:
+                        governor.add(key, len(self.row_pages[page]) * ROW_WIDGET_BYTES,
+                                     lambda: self.release_page(page))
+                    else:
+                        del self.row_pages[page]
+                        governor.discard(key)
                 self.list_trades.takeItem(i)
                 if self.selected_item == item:
                     self.stacked.setCurrentIndex(0)
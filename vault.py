@@ -0,0 +1,436 @@
+import io
+import os
+import json
+import base64
+import time
+import struct
+import getpass
+import hashlib
+import secrets
+import argparse
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+except ImportError:  # Optional dependency, accounts cannot be encrypted without it
+    AESGCM = None
+    InvalidTag = ValueError
+
+KEYS_DIR = "./database/users/keys"
+MAGIC = b"TJENC1\n"
+# Lines of append-only files (the history journal) are encrypted one by one
+LINE_MAGIC = "TJENC1:"
+# Plaintext bytes per encrypted chunk, each chunk carries its own tag
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+HEADER = struct.Struct(">7sI8s")  # magic, chunk size, nonce prefix
+# scrypt cost of the passphrase key, about 0.1 s per unlock
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 15, 8, 1
+
+# Data keys of the accounts unlocked in this process
+_keys = {}
+
+
+def available():
+    return AESGCM is not None
+
+
+def key_path(name):
+    return os.path.join(KEYS_DIR, f"{name}.json")
+
+
+def is_protected(name):
+    """True when the account was set up for encryption"""
+    return os.path.exists(key_path(name))
+
+
+def key_for(name):
+    """Data key of an unlocked account, None if it is locked or not encrypted"""
+    return _keys.get(name)
+
+
+def is_encrypted(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _derive(passphrase, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return hashlib.scrypt(passphrase.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * n, dklen=32)
+
+
+def protect(name, passphrase):
+    """Give an account a new random data key, wrapped with the passphrase
+
+    The account files are written encrypted from then on. Returns the data key.
+    """
+    if not available():
+        raise RuntimeError("Encryption needs the cryptography package")
+    key = AESGCM.generate_key(bit_length=256)
+    _wrap(name, key, passphrase)
+    _keys[name] = key
+    return key
+
+
+def _wrap(name, key, passphrase):
+    # The account name is authenticated with the key, a key file only opens under its own name
+    salt = secrets.token_bytes(16)
+    nonce = secrets.token_bytes(12)
+    wrapped = AESGCM(_derive(passphrase, salt)).encrypt(nonce, key, name.encode("utf-8"))
+    os.makedirs(KEYS_DIR, exist_ok=True)
+    with open(key_path(name), "w", encoding="utf-8") as f:
+        json.dump({"salt": salt.hex(), "n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P,
+                   "nonce": nonce.hex(), "key": wrapped.hex()}, f)
+
+
+def unlock(name, passphrase):
+    """Unwrap the data key of an account, returns it or None for a wrong passphrase"""
+    if not available():
+        raise RuntimeError("Encryption needs the cryptography package")
+    try:
+        with open(key_path(name), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        kek = _derive(passphrase, bytes.fromhex(data["salt"]), data["n"], data["r"], data["p"])
+        key = AESGCM(kek).decrypt(bytes.fromhex(data["nonce"]), bytes.fromhex(data["key"]), name.encode("utf-8"))
+    except InvalidTag:
+        return None
+    except Exception as e:
+        print(f"Error unlocking {name}: {e}")
+        return None
+    _keys[name] = key
+    return key
+
+
+def lock(name):
+    _keys.pop(name, None)
+
+
+def rename_key(old_name, new_name, passphrase):
+    """Wrap the data key of an account again under a new account name"""
+    key = unlock(old_name, passphrase)
+    if key is None:
+        raise ValueError("Wrong passphrase")
+    _wrap(new_name, key, passphrase)
+    os.remove(key_path(old_name))
+    _keys.pop(old_name, None)
+    _keys[new_name] = key
+    return key
+
+
+def forget(name):
+    """Drop the key of a deleted account"""
+    lock(name)
+    if os.path.exists(key_path(name)):
+        os.remove(key_path(name))
+
+
+def _nonce(prefix, index):
+    return prefix + struct.pack(">I", index)
+
+
+def _aad(header, last):
+    # The final chunk is marked so a file cut at a chunk boundary does not verify
+    return header + (b"\x01" if last else b"\x00")
+
+
+class EncryptedWriter(io.RawIOBase):
+    """Write-only stream encrypting its data chunk by chunk with AES-GCM
+
+    Only one chunk of plaintext is held in memory. The file is complete once
+    the writer is closed.
+    """
+
+    def __init__(self, path, key, chunk_size=CHUNK_SIZE):
+        super().__init__()
+        self.aead = AESGCM(key)
+        self.chunk_size = chunk_size
+        self.header = HEADER.pack(MAGIC, chunk_size, secrets.token_bytes(8))
+        self.prefix = self.header[-8:]
+        self.file = open(path, "wb")
+        self.file.write(self.header)
+        self.buffer = bytearray()
+        self.index = 0
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def _flush_chunk(self, data, last):
+        self.file.write(self.aead.encrypt(_nonce(self.prefix, self.index), bytes(data), _aad(self.header, last)))
+        self.index += 1
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) > self.chunk_size:
+            self._flush_chunk(self.buffer[:self.chunk_size], False)
+            del self.buffer[:self.chunk_size]
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._flush_chunk(self.buffer, True)
+            self.file.close()
+        super().close()
+
+
+class EncryptedReader(io.RawIOBase):
+    """Seekable read stream over an encrypted file
+
+    Chunks are decrypted and authenticated only when a read reaches them, so
+    a reader that only needs part of a file (e.g. the index of a zip based
+    workbook) does not decrypt all of it.
+    """
+
+    def __init__(self, path, key):
+        super().__init__()
+        self.file = open(path, "rb")
+        self.header = self.file.read(HEADER.size)
+        magic, self.chunk_size, self.prefix = HEADER.unpack(self.header)
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not an encrypted file")
+        self.aead = AESGCM(key)
+        stored = os.path.getsize(path) - HEADER.size
+        self.n_chunks = max(-(-stored // (self.chunk_size + TAG_SIZE)), 1)
+        self.size = stored - self.n_chunks * TAG_SIZE
+        self.position = 0
+        self.cached_index = None
+        self.cached = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def _chunk(self, index):
+        if index != self.cached_index:
+            self.file.seek(HEADER.size + index * (self.chunk_size + TAG_SIZE))
+            data = self.file.read(self.chunk_size + TAG_SIZE)
+            last = index == self.n_chunks - 1
+            self.cached = self.aead.decrypt(_nonce(self.prefix, index), data, _aad(self.header, last))
+            self.cached_index = index
+        return self.cached
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        written = 0
+        while written < len(view) and self.position < self.size:
+            index, offset = divmod(self.position, self.chunk_size)
+            chunk = self._chunk(index)
+            count = min(len(chunk) - offset, len(view) - written)
+            view[written:written + count] = chunk[offset:offset + count]
+            written += count
+            self.position += count
+        return written
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+
+def open_read(path, key=None):
+    """Binary read stream of a file, decrypting it if it is encrypted"""
+    if not is_encrypted(path):
+        return open(path, "rb")
+    if key is None:
+        raise PermissionError(f"{path} is encrypted and its account is locked")
+    return io.BufferedReader(EncryptedReader(path, key), buffer_size=CHUNK_SIZE)
+
+
+def open_write(path, key=None):
+    """Binary write stream, encrypting when a key is given"""
+    if key is None:
+        return open(path, "wb")
+    return io.BufferedWriter(EncryptedWriter(path, key), buffer_size=CHUNK_SIZE)
+
+
+def read_bytes(path, key=None):
+    with open_read(path, key) as f:
+        return f.read()
+
+
+def write_bytes(path, data, key=None):
+    with open_write(path, key) as f:
+        f.write(data)
+
+
+def seal_line(text, key=None):
+    """One line of an append-only text file, encrypted on its own when a key is given"""
+    if key is None:
+        return text
+    nonce = secrets.token_bytes(12)
+    return LINE_MAGIC + base64.b64encode(nonce + AESGCM(key).encrypt(nonce, text.encode("utf-8"), None)).decode("ascii")
+
+
+def open_line(line, key=None):
+    """Text of a line written by seal_line"""
+    if not line.startswith(LINE_MAGIC):
+        return line
+    if key is None:
+        raise PermissionError("Encrypted line and the account is locked")
+    data = base64.b64decode(line[len(LINE_MAGIC):])
+    return AESGCM(key).decrypt(data[:12], data[12:], None).decode("utf-8")
+
+
+def read_lines(path, key=None):
+    """Non-empty lines of an append-only file, decrypted"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [open_line(line.rstrip("\n"), key) for line in f if line.strip()]
+
+
+def write_lines(path, lines, key=None):
+    """Replace an append-only file, sealing every line"""
+    temp = path + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        f.writelines(seal_line(line, key) + "\n" for line in lines)
+    os.replace(temp, path)
+
+
+def read_json(path, key=None):
+    """json.load of a file that may be encrypted"""
+    with open_read(path, key) as f:
+        return json.loads(f.read().decode("utf-8"))
+
+
+def write_json(data, path, key=None):
+    """json.dump, encrypted when a key is given"""
+    with open_write(path, key) as f:
+        f.write(json.dumps(data).encode("utf-8"))
+
+
+def read_excel(path, key=None):
+    """pd.read_excel of a workbook that may be encrypted"""
+    import pandas as pd
+    if not is_encrypted(path):
+        return pd.read_excel(path)
+    with open_read(path, key) as f:
+        return pd.read_excel(f, engine="openpyxl")
+
+
+def write_excel(df, path, key=None):
+    """DataFrame.to_excel, encrypted when a key is given"""
+    if key is None:
+        df.to_excel(path, index=False)
+        return
+    with open_write(path, key) as f:
+        df.to_excel(f, index=False, engine="openpyxl")
+
+
+def recrypt_file(path, source_key=None, target_key=None):
+    """Rewrite a file in place encrypted with target_key, or decrypted when it is None"""
+    if path.endswith(".jsonl"):
+        write_lines(path, read_lines(path, source_key), target_key)
+        return
+    temp = path + ".tmp"
+    with open_read(path, source_key) as source, open_write(temp, target_key) as target:
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                break
+            target.write(data)
+    os.replace(temp, path)
+
+
+def account_files(name):
+    """Workbook, sidecars, history, screenshots and archive files of an account"""
+    from model import TradingProfile
+    profile = TradingProfile()
+    paths = [f"./database/{name}.xlsx"]
+    if not profile.load_account(name):
+        return paths
+    paths += [path for path in (profile.rollups_path, profile.tags_path, profile.history.journal_path)
+              if os.path.exists(path)]
+    for trade in profile.trades:
+        paths += [path for path in (trade.before, trade.after) if path is not None and os.path.exists(path)]
+    history_dir = profile.history.dir
+    paths += [os.path.join(history_dir, filename) for filename in sorted(os.listdir(history_dir))
+              if filename.startswith("checkpoint_")]
+    return paths + profile.archive.files()
+
+
+def encrypt_account(name, passphrase):
+    """Protect an existing account and encrypt its files in place"""
+    paths = account_files(name)
+    key = protect(name, passphrase)
+    for path in paths:
+        if not is_encrypted(path):
+            recrypt_file(path, None, key)
+    return len(paths)
+
+
+def decrypt_account(name, passphrase):
+    """Decrypt the files of an account and remove its key, False for a wrong passphrase"""
+    key = unlock(name, passphrase)
+    if key is None:
+        return False
+    for path in account_files(name):
+        if is_encrypted(path) or path.endswith(".jsonl"):
+            recrypt_file(path, key, None)
+    forget(name)
+    return True
+
+
+def benchmark(size_mb=64, chunk_size=CHUNK_SIZE, folder="."):
+    """Throughput in MB/s of plain, encrypted and decrypted sequential I/O"""
+    data = secrets.token_bytes(1024 * 1024)
+    key = AESGCM.generate_key(bit_length=256)
+    path = os.path.join(folder, "vault_benchmark.tmp")
+    results = {}
+    try:
+        for label, key_used in (("plain", None), ("encrypted", key)):
+            start = time.perf_counter()
+            with (open(path, "wb") if key_used is None else EncryptedWriter(path, key_used, chunk_size)) as f:
+                for _ in range(size_mb):
+                    f.write(data)
+            results[f"write {label}"] = size_mb / (time.perf_counter() - start)
+            start = time.perf_counter()
+            with (open(path, "rb") if key_used is None else EncryptedReader(path, key_used)) as f:
+                while f.read(1024 * 1024):
+                    pass
+            results[f"read {label}"] = size_mb / (time.perf_counter() - start)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encrypt trading accounts at rest")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("encrypt").add_argument("name")
+    commands.add_parser("decrypt").add_argument("name")
+    bench = commands.add_parser("benchmark")
+    bench.add_argument("--size", type=int, default=64, help="MB written and read")
+    args = parser.parse_args()
+
+    if not available():
+        parser.exit(1, "The cryptography package is required\n")
+    if args.command == "benchmark":
+        for label, speed in benchmark(args.size).items():
+            print(f"{label:>16}: {speed:8.1f} MB/s")
+    elif args.command == "encrypt":
+        passphrase = getpass.getpass("New passphrase: ")
+        if passphrase != getpass.getpass("Repeat passphrase: "):
+            parser.exit(1, "Passphrases do not match\n")
+        print(f"{encrypt_account(args.name, passphrase)} files encrypted")
+    elif not decrypt_account(args.name, getpass.getpass("Passphrase: ")):
+        parser.exit(1, "Wrong passphrase\n")
@@ -0,0 +1,60 @@
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+
+class AccountWatcher(QObject):
+    """Watch the active account workbook and the profile registry for external edits"""
+    trades_file_changed = pyqtSignal()
+    profile_file_changed = pyqtSignal()
+
+    def __init__(self, parent=None, delay_ms=300):
+        super().__init__(parent)
+        self.trades_path = None
+        self.profile_path = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+
+        # Editors write in several steps, wait for the file to settle
+        self.trades_timer = self._debounce_timer(delay_ms, self.trades_file_changed)
+        self.profile_timer = self._debounce_timer(delay_ms, self.profile_file_changed)
+
+    def _debounce_timer(self, delay_ms, signal):
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(delay_ms)
+        timer.timeout.connect(self._rewatch)
+        timer.timeout.connect(signal.emit)
+        return timer
+
+    def _rewatch(self):
+        for path in (self.trades_path, self.profile_path):
+            if path is not None:
+                self._add_path(path)
+
+    def watch(self, trades_path, profile_path):
+        """Start watching a new account, replacing the previous one"""
+        self.stop()
+        self.trades_path = os.path.abspath(trades_path)
+        self.profile_path = os.path.abspath(profile_path)
+        self._add_path(self.trades_path)
+        self._add_path(self.profile_path)
+
+    def stop(self):
+        files = self.watcher.files()
+        if files:
+            self.watcher.removePaths(files)
+        self.trades_timer.stop()
+        self.profile_timer.stop()
+
+    def _add_path(self, path):
+        if os.path.exists(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+
+    def on_file_changed(self, path):
+        path = os.path.abspath(path)
+        # Files replaced on save (rename over the original) drop out of the watch list
+        self._add_path(path)
+        if path == self.trades_path:
+            self.trades_timer.start()
+        elif path == self.profile_path:
+            self.profile_timer.start()
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class BackgroundWriter:
+    """Run file writes on a background thread, one file at a time
+
+    Writes are keyed by the path they produce. While a write of a path is
+    queued, submitting the same path again replaces the queued job, so a
+    burst of saves of one workbook costs at most the write in progress plus
+    one more with the latest data.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self.lock = threading.Lock()
+        self.queued = {}  # path -> job not started yet
+        self.running = {}  # path -> number of submitted jobs not finished
+        self.futures = set()
+
+    def submit(self, path, job):
+        """Queue job() to write path, replacing a queued job of the same path"""
+        with self.lock:
+            replaced = path in self.queued
+            self.queued[path] = job
+            if replaced:
+                return
+            self.running[path] = self.running.get(path, 0) + 1
+            future = self.executor.submit(self._run, path)
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _run(self, path):
+        with self.lock:
+            job = self.queued.pop(path)
+        try:
+            job()
+        except Exception as e:
+            print(f"Error writing {path}: {e}")
+        finally:
+            with self.lock:
+                self.running[path] -= 1
+                if not self.running[path]:
+                    del self.running[path]
+
+    def _done(self, future):
+        with self.lock:
+            self.futures.discard(future)
+
+    def pending(self, path=None):
+        """True while a write (of path, or of any file) is queued or running"""
+        with self.lock:
+            return path in self.running if path is not None else bool(self.running)
+
+    def wait(self):
+        """Block until every submitted write is done"""
+        with self.lock:
+            futures = list(self.futures)
+        wait(futures)
+
+    def close(self):
+        """Finish every submitted write, then stop the writer thread"""
+        self.wait()
+        self.executor.shutdown(wait=True)